@@ -0,0 +1,75 @@
+"""
+    Local runtime for the valuation model scripts.
+
+    Runs the scripts under `valuations/` and `risk-analysis/` against an
+    on-disk fundamentals store, for one ticker or a whole universe:
+
+        from runtime import FixtureStore, run_model
+
+        store = FixtureStore("runtime/fixtures")
+        result = run_model("discounted-free-cash-flow-perpetuity", "ACME", store)
+        result.final_value  # {"value": ..., "units": "$"}
+
+    © Copyright discountingcashflows.com
+"""
+
+from .assumptions import Assumptions
+from .cache import ResultCache
+from .data import Data
+from .formula import FormulaError
+from .gradient import GradientResult, run_gradient
+from .grid import GridResult, run_grid
+from .model import Model
+from .analysis import ReadSet
+from .pointintime import PointInTimeStore
+from .profiling import Profiler
+from .quarterly import QuarterlyStore
+from .revaluation import FingerprintIndex, revalue
+from .runner import ModelResult, available_models, read_set, run_model, run_suite, run_universe
+from .session import Memo, Session
+from .shared import SharedValues
+from .simulation import SimulationResult, run_simulation
+from .solver import SolveResult, implied_discount_rates, solve, solve_universe
+from .store import ColumnarStore, FixtureStore, TickerData, open_store, write_columnar_store
+from .writers import NDJSONWriter, ParquetWriter, open_writer
+
+__all__ = [
+    "Assumptions",
+    "ColumnarStore",
+    "Data",
+    "FingerprintIndex",
+    "FixtureStore",
+    "FormulaError",
+    "GradientResult",
+    "GridResult",
+    "Memo",
+    "Model",
+    "ModelResult",
+    "NDJSONWriter",
+    "ParquetWriter",
+    "PointInTimeStore",
+    "Profiler",
+    "QuarterlyStore",
+    "ReadSet",
+    "ResultCache",
+    "Session",
+    "SharedValues",
+    "SimulationResult",
+    "SolveResult",
+    "TickerData",
+    "available_models",
+    "implied_discount_rates",
+    "open_store",
+    "open_writer",
+    "read_set",
+    "revalue",
+    "run_gradient",
+    "run_grid",
+    "run_model",
+    "run_simulation",
+    "run_suite",
+    "run_universe",
+    "solve",
+    "solve_universe",
+    "write_columnar_store",
+]
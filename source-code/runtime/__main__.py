@@ -0,0 +1,239 @@
+"""
+    Command line entry point of the local runtime.
+
+    Run from the `source-code` directory:
+
+        python -m runtime discounted-free-cash-flow-perpetuity ACME --store runtime/fixtures
+        python -m runtime weighted-average-cost-of-capital --store runtime/fixtures --workers 4
+        python -m runtime all ACME --store runtime/fixtures
+        python -m runtime all --store runtime/columnar --workers 8 --headless --output results.parquet
+        python -m runtime simple-dividend-discount-model ACME --set %discount_rate=9%
+        python -m runtime discounted-free-cash-flow-multiple ACME --grid %discount_rate=7%,8%,9% \
+            --grid exit_ebitda_multiple=8,10,12
+        python -m runtime two-stage-excess-return-model ACME --simulate distributions.json --samples 100000
+        python -m runtime discounted-free-cash-flow-multiple ACME --gradient
+        python -m runtime discounted-free-cash-flow-perpetuity --store runtime/fixtures \
+            --solve %growth_in_perpetuity --workers 4
+        python -m runtime all --store runtime/columnar --headless --fingerprints fingerprints.json \
+            --output changed.ndjson
+        python -m runtime discounted-free-cash-flow-perpetuity ACME --store runtime/fixtures --cache ~/.cache/valuations
+        python -m runtime discounted-free-cash-flow-perpetuity --store runtime/fixtures --only final_value \
+            --only "Enterprise Value"
+        python -m runtime benjamin-grahams-number ACME --store history --as-of 2020-03-31
+
+    `--trace` and `--profile` record every call of the scripts to the `data`,
+    `assumptions` and `model` objects (see profiling.py).
+
+    Results are printed as one JSON object per line, or written as they are
+    produced to the NDJSON or Parquet file given with `--output` (see
+    writers.py). With `--grid` every
+    line is the sensitivity grid of one ticker, with `--simulate` the
+    simulated distribution of the final value of one ticker (see
+    simulation.py for the format of the distributions file), with `--solve`
+    the value of the assumption implied by the market price of one ticker
+    (see solver.py), with `--gradient` the derivatives of the final value
+    of one ticker with respect to every assumption (see gradient.py).
+    With `--fingerprints`, only the models and tickers whose inputs changed
+    since the last run with the same fingerprints file are run, and the
+    file is updated once their results are written (see revaluation.py).
+    With `--cache`, the results already computed for the same script, data
+    and assumptions are read from the cache directory (see cache.py).
+    With `--only`, only the statements the final value and the given
+    results depend on are run (see slicing.py). With `--as-of`, the store is
+    a point-in-time store and the models only use the data known at the
+    given date (see pointintime.py).
+
+    © Copyright discountingcashflows.com
+"""
+
+import argparse
+import json
+import sys
+
+from .cache import ResultCache
+from .gradient import run_gradient
+from .grid import run_grid
+from .pointintime import PointInTimeStore
+from .profiling import Profiler
+from .revaluation import FingerprintIndex, revalue
+from .runner import available_models, run_universe
+from .simulation import run_simulation
+from .solver import solve_universe
+from .store import open_store
+from .writers import open_writer
+
+
+def _assumption(text):
+    key, separator, value = text.partition("=")
+    if not separator:
+        raise argparse.ArgumentTypeError(f"Expected key=value, got {text!r}")
+    return key.strip(), value.strip()
+
+
+def _grid_axis(text):
+    key, value = _assumption(text)
+    return key, [item.strip() for item in value.split(",") if item.strip()]
+
+
+def _bracket(text):
+    values = [item.strip() for item in text.split(",")]
+    if len(values) != 2 or not all(values):
+        raise argparse.ArgumentTypeError(f"Expected LOW,HIGH, got {text!r}")
+    return tuple(values)
+
+
+def _open_store(args):
+    if args.as_of:
+        return PointInTimeStore(args.store, args.as_of)
+    return open_store(args.store)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m runtime", description="Run a valuation model locally.")
+    parser.add_argument("model", help=f"model name, one of: {', '.join(available_models())}, "
+                                      f"or 'all' to run every model for each ticker")
+    parser.add_argument("tickers", nargs="*", help="tickers to value (default: every ticker in the store)")
+    parser.add_argument("--store", required=True, help="path to a fixture or columnar store directory")
+    parser.add_argument("--as-of", metavar="DATE",
+                        help="only use the data known at DATE, from a point-in-time store (for backtests)")
+    parser.add_argument("--set", dest="assumptions", type=_assumption, action="append", default=[],
+                        metavar="KEY=VALUE", help="override an assumption")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--headless", action="store_true",
+                        help="only compute the final values (no charts, tables or descriptions)")
+    parser.add_argument("--output", metavar="PATH",
+                        help="write one record per model and ticker to an NDJSON or .parquet file")
+    parser.add_argument("--append", action="store_true", help="append to the NDJSON --output file")
+    parser.add_argument("--fingerprints", metavar="PATH",
+                        help="only run the models and tickers whose inputs changed since the run that wrote PATH")
+    parser.add_argument("--only", dest="outputs", action="append", metavar="OUTPUT",
+                        help="only compute 'final_value' or the result with this label (may be repeated)")
+    parser.add_argument("--cache", metavar="DIR",
+                        help="read the results already computed from DIR, and store the new ones there")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="write a Chrome trace (Perfetto) of the calls of the scripts to PATH")
+    parser.add_argument("--profile", action="store_true",
+                        help="print the time spent per script line to standard error")
+    parser.add_argument("--grid", type=_grid_axis, action="append", default=[], metavar="KEY=V1,V2,...",
+                        help="vary an assumption over a list of values (at most twice)")
+    parser.add_argument("--gradient", action="store_true",
+                        help="compute the derivatives of the final value with respect to every assumption")
+    parser.add_argument("--simulate", metavar="PATH",
+                        help="JSON file mapping assumptions to distributions to sample from")
+    parser.add_argument("--samples", type=int, default=100000, help="number of samples with --simulate")
+    parser.add_argument("--seed", type=int, help="random seed with --simulate")
+    parser.add_argument("--solve", metavar="KEY",
+                        help="find the value of an assumption at which the final value equals the target")
+    parser.add_argument("--target", default="profile:price",
+                        help="number or store key the final value is solved for (default: profile:price)")
+    parser.add_argument("--bracket", type=_bracket, metavar="LOW,HIGH",
+                        help="range searched with --solve (default: -50%%,50%% for percentage assumptions)")
+    args = parser.parse_args(argv)
+
+    if args.solve:
+        if args.model == "all":
+            parser.error("--solve requires a single model")
+        if args.bracket is None and not args.solve.startswith("%"):
+            parser.error(f"--bracket is required to solve for {args.solve!r}")
+        try:
+            target = float(args.target)
+        except ValueError:
+            target = args.target
+        failed = False
+        for solution in solve_universe(args.model, _open_store(args), args.solve, tickers=args.tickers or None,
+                                       workers=args.workers, target=target, bracket=args.bracket,
+                                       assumptions=dict(args.assumptions)):
+            failed = failed or solution.status != "ok"
+            print(json.dumps(solution.to_dict()))
+        return 1 if failed else 0
+
+    if args.simulate:
+        with open(args.simulate, encoding="utf-8") as file:
+            distributions = json.load(file)
+        store = _open_store(args)
+        failed = False
+        for ticker in args.tickers or store.tickers():
+            try:
+                simulation = run_simulation(args.model, ticker, store, distributions, samples=args.samples,
+                                            seed=args.seed, assumptions=dict(args.assumptions))
+            except ValueError as error:
+                parser.error(str(error))
+            failed = failed or simulation.status != "ok"
+            print(json.dumps(simulation.to_dict()))
+        return 1 if failed else 0
+
+    if args.gradient:
+        store = _open_store(args)
+        failed = False
+        for ticker in args.tickers or store.tickers():
+            gradient = run_gradient(args.model, ticker, store, assumptions=dict(args.assumptions))
+            failed = failed or gradient.status != "ok"
+            print(json.dumps(gradient.to_dict()))
+        return 1 if failed else 0
+
+    if args.grid:
+        if len(args.grid) > 2:
+            parser.error("--grid can be given at most twice")
+        store = _open_store(args)
+        failed = False
+        for ticker in args.tickers or store.tickers():
+            grid = run_grid(args.model, ticker, store, *args.grid, assumptions=dict(args.assumptions))
+            failed = failed or grid.status != "ok"
+            print(json.dumps(grid.to_dict()))
+        return 1 if failed else 0
+
+    profiler = Profiler() if args.trace or args.profile else None
+    if profiler is not None and args.workers > 1:
+        parser.error("--trace and --profile require a single worker")
+    models = list(available_models()) if args.model == "all" else args.model
+    index = None
+    if args.fingerprints and args.cache:
+        parser.error("--cache cannot be combined with --fingerprints")
+    if args.outputs and (args.model == "all" or args.fingerprints):
+        parser.error("--only requires a single model and cannot be combined with --fingerprints")
+    if profiler is not None and (args.fingerprints or args.cache):
+        parser.error("--trace and --profile cannot be combined with --fingerprints or --cache")
+    if args.fingerprints:
+        index = FingerprintIndex(args.fingerprints)
+        results = revalue(models, _open_store(args), index, tickers=args.tickers or None,
+                          assumptions=dict(args.assumptions), headless=args.headless, workers=args.workers)
+    elif args.cache:
+        results = ResultCache(args.cache).run_universe(models, _open_store(args), tickers=args.tickers or None,
+                                                       assumptions=dict(args.assumptions), workers=args.workers,
+                                                       headless=args.headless, outputs=args.outputs)
+    else:
+        results = run_universe(
+            models,
+            _open_store(args),
+            tickers=args.tickers or None,
+            assumptions=dict(args.assumptions),
+            workers=args.workers,
+            headless=args.headless,
+            profiler=profiler,
+            outputs=args.outputs,
+        )
+    if args.output:
+        options = {"append": True} if args.append else {}
+        try:
+            writer = open_writer(args.output, **options)
+        except (ImportError, TypeError) as error:
+            parser.error(str(error))
+        with writer:
+            writer.write_all(results)
+        failed = writer.failed
+    else:
+        failed = False
+        for result in results:
+            failed = failed or result.status != "ok"
+            print(json.dumps(result.to_dict()))
+    if index is not None:
+        index.save()
+    if args.trace:
+        profiler.write_chrome_trace(args.trace)
+    if args.profile:
+        print(profiler.format_line_profile(), file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,464 @@
+"""
+    Static analysis of the data a model script reads.
+
+    The scripts reference their keys with literal strings, or f-strings
+    built from assumption values, e.g.
+
+        data.average(f"income:revenue:{-assumptions.get('historical_years')}->0")
+
+    `analyze` parses a script without running it and resolves those strings
+    from the `assumptions.init` defaults (or the overrides of a run) and from
+    names assigned once at the top level of the script. It reports the store
+    fields (`namespace:field`) the script can read and how many historical
+    periods before the LTM period it needs:
+
+        - `data.get` reads the LTM period, `data.compute` forecasts read the
+          periods before the first forecast year, and aggregations and
+          `render_*` calls read their ranges (or the default range)
+        - computed keys are followed back to the store fields they are
+          computed from, adding the period offsets of every formula on the
+          way (e.g. `function:growth` reads one more period)
+
+    Anything that cannot be resolved statically makes the result more
+    conservative: an unbounded range (`*`, no range before
+    `data.set_default_range`, a window assumption set by the script itself)
+    needs the whole history, and a key that cannot be resolved at all marks
+    the read set as incomplete, in which case every field has to be loaded.
+
+    A literal `forecast=0` is how the scripts write a historical block, and
+    `parse` reads it as one (no forecast) for the runner too. A forecast of
+    0 periods computed at run time, e.g. from `projection_years` set to 0,
+    computes nothing.
+
+    With `headless=True` the `render_*` calls are not counted as readers
+    (see runner.py): the read set only covers what the `data.get` calls and
+    aggregations depend on, and the computed keys nothing else depends on
+    are reported as `display_only`.
+
+    © Copyright discountingcashflows.com
+"""
+
+import ast
+import functools
+import os
+from dataclasses import dataclass
+
+from .assumptions import WINDOW_ASSUMPTIONS, parse_value
+from .data import _BOUNDS, _split_range
+from .formula import _LITERALS, PERIODIC_NAMESPACES, SCALAR_NAMESPACES, FormulaError, compile_formula
+
+STORE_NAMESPACES = PERIODIC_NAMESPACES + SCALAR_NAMESPACES
+AGGREGATIONS = ("average", "sum", "min", "max", "count", "cagr")
+RENDER_CALLS = ("render_chart", "render_table")
+RENDER = "render"
+DATA_CALLS = ("get", "compute", "set_default_range") + AGGREGATIONS
+# Values substituted for the parts of a string that cannot be resolved statically
+UNKNOWN = ("0", "1")
+UNBOUNDED = None
+
+
+@dataclass(frozen=True)
+class ReadSet:
+    """The store fields and periods a model script reads."""
+    fields: frozenset
+    history: int = None
+    forecast: int = None
+    complete: bool = True
+    # Computed keys only the `render_*` calls read (headless read sets only)
+    display_only: frozenset = frozenset()
+
+    @property
+    def periodic_fields(self):
+        return frozenset(field for field in self.fields if field.split(":")[0] in PERIODIC_NAMESPACES)
+
+    @property
+    def scalar_fields(self):
+        return frozenset(field for field in self.fields if field.split(":")[0] in SCALAR_NAMESPACES)
+
+    def load_arguments(self):
+        """Keyword arguments of `store.load` that load only what the script reads."""
+        if not self.complete:
+            return {}
+        return {"fields": self.fields, "history": self.history}
+
+
+def union(read_sets):
+    """A `ReadSet` covering everything the given read sets read."""
+    read_sets = list(read_sets)
+    histories = [read_set.history for read_set in read_sets]
+    forecasts = [read_set.forecast for read_set in read_sets]
+    return ReadSet(
+        fields=frozenset().union(*(read_set.fields for read_set in read_sets)),
+        history=None if None in histories else max(histories, default=0),
+        forecast=None if None in forecasts else max(forecasts, default=0),
+        complete=all(read_set.complete for read_set in read_sets),
+    )
+
+
+def parse(path):
+    """The syntax tree of the script at `path`, with its literal `forecast=0` blocks made historical."""
+    with open(path, encoding="utf-8") as file:
+        tree = ast.parse(file.read(), path)
+    for node in ast.walk(tree):
+        if _is_call(node, "data", ("compute",)):
+            node.keywords = [
+                keyword for keyword in node.keywords if not (keyword.arg == "forecast" and _is_zero(keyword.value))
+            ]
+            if len(node.args) > 1 and _is_zero(node.args[1]):
+                node.args[1] = ast.copy_location(ast.Constant(None), node.args[1])
+    return tree
+
+
+def _is_zero(node):
+    return isinstance(node, ast.Constant) and type(node.value) is int and node.value == 0
+
+
+class _Unknown(Exception):
+    """A value that cannot be resolved statically."""
+
+
+def _is_call(node, owner, names):
+    return (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and isinstance(node.func.value, ast.Name)
+        and node.func.value.id == owner
+        and node.func.attr in names
+    )
+
+
+class _Analyzer(ast.NodeVisitor):
+
+    def __init__(self, tree, overrides):
+        self.overrides = overrides
+        self.defaults = {}
+        self.set_keys = set()
+        self.names = {}
+        self._collect(tree)
+
+        self.fields = set()
+        self.complete = True
+        self.default_start = UNBOUNDED
+        self.forecast = 0
+        # Computed keys: key -> [(node reads, first period, last period)]
+        self.definitions = {}
+        # Consumers: (reads, first period read, reader) with None for unbounded, where the
+        # reader is None for values returned to the script, RENDER or the key of a forecast
+        self.consumers = []
+
+    # Static values
+
+    def _collect(self, tree):
+        assigned = {}
+        for statement in tree.body:
+            if isinstance(statement, ast.Assign) and len(statement.targets) == 1 \
+                    and isinstance(statement.targets[0], ast.Name):
+                name = statement.targets[0].id
+                assigned[name] = None if name in assigned else statement.value
+        self.names = {name: value for name, value in assigned.items() if value is not None}
+
+        for node in ast.walk(tree):
+            if _is_call(node, "assumptions", ("init",)) and node.args and isinstance(node.args[0], ast.Dict):
+                spec = node.args[0]
+                data = self._dict_item(spec, "data")
+                for key, value in zip((data or spec).keys, (data or spec).values):
+                    if isinstance(key, ast.Constant) and isinstance(value, ast.Constant):
+                        self.defaults[key.value] = value.value
+            elif _is_call(node, "assumptions", ("set",)) and node.args and isinstance(node.args[0], ast.Constant):
+                self.set_keys.add(node.args[0].value)
+
+    @staticmethod
+    def _dict_item(node, name):
+        for key, value in zip(node.keys, node.values):
+            if isinstance(key, ast.Constant) and key.value == name and isinstance(value, ast.Dict):
+                return value
+        return None
+
+    def _assumption(self, key):
+        if key in self.overrides:
+            value = self.overrides[key]
+        elif key in self.set_keys or key not in self.defaults:
+            raise _Unknown(key)
+        else:
+            value = self.defaults[key]
+        try:
+            value = parse_value(value)
+        except (TypeError, ValueError):
+            raise _Unknown(key)
+        if not isinstance(value, (int, float)):
+            raise _Unknown(key)
+        return value
+
+    def value(self, node, depth=0):
+        """Static value of an expression, raising `_Unknown` if it has none."""
+        if depth > 20:
+            raise _Unknown(node)
+        if isinstance(node, ast.Constant):
+            return node.value
+        if isinstance(node, ast.Name) and node.id in self.names:
+            return self.value(self.names[node.id], depth + 1)
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            return -self.value(node.operand, depth + 1)
+        if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Add, ast.Sub, ast.Mult)):
+            left, right = self.value(node.left, depth + 1), self.value(node.right, depth + 1)
+            if isinstance(node.op, ast.Add):
+                return left + right
+            return left - right if isinstance(node.op, ast.Sub) else left * right
+        if _is_call(node, "assumptions", ("get",)) and node.args and isinstance(node.args[0], ast.Constant):
+            return self._assumption(node.args[0].value)
+        if isinstance(node, (ast.JoinedStr, ast.List, ast.Tuple)):
+            texts = self.texts(node, depth + 1)
+            if texts[0] != texts[1]:
+                raise _Unknown(node)
+            return texts[0]
+        raise _Unknown(node)
+
+    def texts(self, node, depth=0):
+        """Text of a string expression, once for each `UNKNOWN` substitute of its unresolved parts."""
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            return (node.value, node.value)
+        if isinstance(node, ast.Name) and node.id in self.names and depth <= 20:
+            return self.texts(self.names[node.id], depth + 1)
+        if isinstance(node, (ast.List, ast.Tuple)):
+            parts = [self.texts(element, depth + 1) for element in node.elts]
+            return tuple(" ".join(part[index] for part in parts) for index in range(2))
+        if isinstance(node, ast.JoinedStr):
+            texts = ["", ""]
+            for part in node.values:
+                if isinstance(part, ast.FormattedValue):
+                    try:
+                        value = self.value(part.value, depth + 1)
+                        text = (str(value), str(value))
+                    except _Unknown:
+                        text = UNKNOWN
+                else:
+                    text = self.texts(part, depth + 1)
+                texts = [texts[index] + text[index] for index in range(2)]
+            return tuple(texts)
+        raise _Unknown(node)
+
+    # Reads
+
+    def _is_text(self, node, depth=0):
+        if isinstance(node, ast.Name) and node.id in self.names and depth <= 20:
+            return self._is_text(self.names[node.id], depth + 1)
+        if isinstance(node, ast.Name):
+            # Assigned more than once: it may hold a formula
+            return True
+        if isinstance(node, ast.Constant):
+            return isinstance(node.value, str)
+        return isinstance(node, (ast.JoinedStr, ast.List, ast.Tuple, ast.IfExp))
+
+    def _reads(self, text):
+        try:
+            return compile_formula(text).reads
+        except FormulaError:
+            raise _Unknown(text)
+
+    def _formula(self, node):
+        """Reads of a formula argument, the same for every substitute of its unknown parts."""
+        if not self._is_text(node):
+            # A number computed by the script
+            return ()
+        texts = self.texts(node)
+        reads = [self._reads(text) for text in texts]
+        if {key for key, _ in reads[0]} != {key for key, _ in reads[1]}:
+            raise _Unknown(node)
+        return tuple(dict.fromkeys(reads[0] + reads[1]))
+
+    def _range(self, node):
+        """Reads and first period of a `key:start->end` argument."""
+        ranges = [_split_range(text.strip()) for text in self.texts(node)]
+        (formula, has_range, start, _), (other, _, other_start, _) = ranges
+        if {key for key, _ in formula.reads} != {key for key, _ in other.reads}:
+            raise _Unknown(node)
+        reads = tuple(dict.fromkeys(formula.reads + other.reads))
+        if not has_range:
+            return reads, self.default_start
+        if start != other_start:
+            return reads, UNBOUNDED
+        return reads, start
+
+    def _add_keys(self, reads):
+        for key, _ in reads:
+            if key.split(":")[0] in STORE_NAMESPACES and key not in _LITERALS:
+                self.fields.add(key)
+
+    def visit_Attribute(self, node):
+        if isinstance(node.value, ast.Name) and node.value.id == "data" and node.attr not in DATA_CALLS:
+            # Any other use of `data` may read anything
+            self.complete = False
+        self.generic_visit(node)
+
+    def visit_Call(self, node):
+        try:
+            self._call(node)
+        except _Unknown:
+            self.complete = False
+        self.generic_visit(node)
+
+    def _keyword(self, node, name, position):
+        for keyword in node.keywords:
+            if keyword.arg == name:
+                return keyword.value
+        return node.args[position] if len(node.args) > position else None
+
+    def _call(self, node):
+        if _is_call(node, "data", ("get",)):
+            reads = self._formula(node.args[0])
+            self._add_keys(reads)
+            self.consumers.append((reads, 0, None))
+        elif _is_call(node, "data", AGGREGATIONS):
+            reads, start = self._range(node.args[0])
+            self._add_keys(reads)
+            self.consumers.append((reads, start, None))
+        elif _is_call(node, "data", ("set_default_range",)):
+            texts = self.texts(node.args[0])
+            bounds = [_BOUNDS.match(text.strip()) for text in texts]
+            starts = {match.group("start") if match else "*" for match in bounds}
+            start = starts.pop() if len(starts) == 1 else "*"
+            self.default_start = UNBOUNDED if start == "*" else int(start)
+        elif _is_call(node, "data", ("compute",)):
+            self._compute(node)
+        elif _is_call(node, "model", RENDER_CALLS) and node.args and isinstance(node.args[0], ast.Dict):
+            self._render(node.args[0])
+
+    def _compute(self, node):
+        block = node.args[0]
+        if not isinstance(block, ast.Dict) or any(key is None for key in block.keys):
+            raise _Unknown(node)
+        forecast = self._keyword(node, "forecast", 1)
+        if forecast is None or isinstance(forecast, ast.Constant) and forecast.value is None:
+            # Historical blocks cover the periods up to the LTM period
+            first, last = UNBOUNDED, 0
+        else:
+            # Forecasts cover the periods after it, none for a forecast of 0 periods
+            try:
+                last = max(int(self.value(forecast)), 0)
+            except (_Unknown, TypeError, ValueError):
+                # A forecast of unknown length
+                last = UNBOUNDED
+            first = 1
+            self.forecast = None if last is UNBOUNDED or self.forecast is UNBOUNDED else max(self.forecast, last)
+        for key, formula in zip(block.keys, block.values):
+            key = self.value(key)
+            reads = self._formula(formula)
+            self._add_keys(reads + ((key, 0),))
+            self.definitions.setdefault(key, []).append((reads, first, last))
+            if first == 1 and last != 0:
+                # The first forecast period reads the periods before it
+                self.consumers.append((reads, 1, key))
+
+    def _render(self, spec):
+        data = self._dict_item(spec, "data")
+        if data is None:
+            raise _Unknown(spec)
+        keys = tuple((self.value(key), 0) for key in data.keys)
+        self._add_keys(keys)
+        start = UNBOUNDED
+        for key, value in zip(spec.keys, spec.values):
+            if isinstance(key, ast.Constant) and key.value == "start":
+                try:
+                    start = self.value(value)
+                except _Unknown:
+                    start = UNBOUNDED
+                start = None if start in (None, "*") else int(start)
+        self.consumers.append((keys, start, RENDER))
+
+    # Window
+
+    def history(self, headless=False):
+        """Number of periods before the LTM period the script needs, or None for all."""
+        earliest = 0
+        visited = set()
+        needed = self.needed() if headless else None
+        pending = [
+            (reads, start) for reads, start, reader in self.consumers
+            if not headless or reader is None or reader != RENDER and reader in needed
+        ]
+        while pending:
+            reads, start = pending.pop()
+            if start is UNBOUNDED:
+                return None
+            for key, offset in reads:
+                period = start + offset
+                if (key, period) in visited:
+                    continue
+                visited.add((key, period))
+                if period < -1000:
+                    return None
+                if key in self.fields:
+                    earliest = min(earliest, period)
+                for definition, first, last in self.definitions.get(key, ()):
+                    # Only the definitions covering the period matter
+                    if (first is UNBOUNDED or period >= first) and (last is UNBOUNDED or period <= last):
+                        pending.append((definition, period))
+        return -earliest
+
+    def needed(self):
+        """Keys the `data.get` calls and aggregations depend on."""
+        needed = set()
+        pending = [key for reads, _, reader in self.consumers if reader is None for key, _ in reads]
+        while pending:
+            key = pending.pop()
+            if key in needed:
+                continue
+            needed.add(key)
+            for reads, _, _ in self.definitions.get(key, ()):
+                pending.extend(key for key, _ in reads)
+        return needed
+
+
+def analyze(path, assumptions=None, headless=False):
+    """The `ReadSet` of a script, with the window assumptions taken from `assumptions` if given.
+
+    A `headless` read set leaves out what only the `render_*` calls read.
+    """
+    overrides = []
+    for key in WINDOW_ASSUMPTIONS:
+        if key in (assumptions or {}):
+            value = assumptions[key]
+            overrides.append((key, value if isinstance(value, (int, float, str, type(None))) else repr(value)))
+    return _analyze(os.path.abspath(path), os.path.getmtime(path), tuple(overrides), headless)
+
+
+@functools.lru_cache(maxsize=256)
+def _analyze(path, modified, overrides, headless):
+    tree = parse(path)
+    analyzer = _Analyzer(tree, dict(overrides))
+    analyzer.visit(tree)
+    if not headless or not analyzer.complete:
+        return ReadSet(
+            fields=frozenset(analyzer.fields),
+            history=analyzer.history(),
+            forecast=analyzer.forecast,
+            complete=analyzer.complete,
+        )
+    needed = analyzer.needed()
+    return ReadSet(
+        fields=frozenset(analyzer.fields & needed),
+        history=analyzer.history(headless=True),
+        forecast=analyzer.forecast,
+        complete=True,
+        display_only=frozenset(key for key in analyzer.definitions if key not in needed),
+    )
+
+
+def assumption_keys(path):
+    """The keys of the assumptions a script initializes or sets, in the order they appear."""
+    return _assumption_keys(os.path.abspath(path), os.path.getmtime(path))
+
+
+@functools.lru_cache(maxsize=256)
+def _assumption_keys(path, modified):
+    tree = parse(path)
+    keys = []
+    for node in ast.walk(tree):
+        if _is_call(node, "assumptions", ("init",)) and node.args and isinstance(node.args[0], ast.Dict):
+            spec = node.args[0]
+            data = _Analyzer._dict_item(spec, "data")
+            keys.extend(key for key in (data or spec).keys if isinstance(key, ast.Constant))
+        elif _is_call(node, "assumptions", ("set",)) and node.args and isinstance(node.args[0], ast.Constant):
+            keys.append(node.args[0])
+    keys.sort(key=lambda key: (key.lineno, key.col_offset))
+    return tuple(dict.fromkeys(key.value for key in keys))
@@ -0,0 +1,144 @@
+"""
+    The `assumptions` object injected into the model scripts.
+
+    Every assumption has up to three values, in increasing priority:
+        - the default passed to `assumptions.init`
+        - the value computed by the model with `assumptions.set`
+        - the override supplied by the user when running the model
+
+    Percentages may be given as strings ("2.5%") and are stored as fractions.
+    An override may also be a list or array with one value per scenario
+    (see scenarios.py).
+
+    For differentiation (see gradient.py), `directions` maps keys to an
+    array of relative moves per scenario: `assumptions.get` then returns the
+    value the key would otherwise have, moved by that fraction of its size
+    (of 1 for values smaller than 1) in each scenario. The size is fixed
+    the first time the key is read. Only numbers are moved, ints included
+    (e.g. a `beta` defaulting to 1), not counts of years, flags or missing
+    values, and never past the bounds of the key.
+
+    © Copyright discountingcashflows.com
+"""
+
+import re
+
+import numpy as np
+
+from .scenarios import Scenarios
+
+_INTEGER = re.compile(r"^[-+]?\d+$")
+WINDOW_ASSUMPTIONS = ("historical_years", "projection_years", "forecast_years")
+
+
+def is_count(key):
+    """Whether an assumption is a count of years, which the scripts use as period bounds and cannot vary by scenario."""
+    return key in WINDOW_ASSUMPTIONS or key.endswith("_years")
+
+
+def parse_value(value):
+    """Convert an assumption value to an int, a float, `Scenarios` or None."""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        text = value.strip().replace(",", "")
+        if not text or text.lower() == "none":
+            return None
+        if text.endswith("%"):
+            return float(text[:-1]) / 100
+        if _INTEGER.match(text):
+            return int(text)
+        return float(text)
+    if isinstance(value, np.ndarray) and value.ndim and value.dtype.kind in "biuf":
+        return Scenarios(value)
+    if isinstance(value, (list, tuple, np.ndarray)) and np.ndim(value):
+        return Scenarios([parse_value(item) for item in np.asarray(value, dtype=object).reshape(-1)])
+    # numpy scalars and other numeric types
+    return float(value)
+
+
+class Assumptions:
+    """Assumption values, bounds and descriptions of a model run."""
+
+    def __init__(self, overrides=None, headless=False, directions=None):
+        self.defaults = {}
+        self.values = {}
+        self.bounds = {}
+        self.hierarchies = []
+        self.descriptions = {}
+        self.headless = headless
+        self.overrides = {key: parse_value(value) for key, value in (overrides or {}).items()}
+        self.directions = {key: np.asarray(value, dtype=float) for key, value in (directions or {}).items()}
+        self._sizes = {}
+
+    def init(self, spec):
+        # Both {"data": {...}, "hierarchies": [...]} and a flat dict are accepted
+        if isinstance(spec.get("data"), dict):
+            defaults = spec["data"]
+            self.hierarchies = list(spec.get("hierarchies", []))
+        else:
+            defaults = spec
+        for key, value in defaults.items():
+            self.defaults[key] = parse_value(value)
+
+    def _clamp(self, key, value):
+        if value is None or key not in self.bounds:
+            return value
+        low, high = self.bounds[key]
+        if any(isinstance(item, np.ndarray) for item in (value, low, high)):
+            # Clamp every scenario separately
+            return Scenarios(np.clip(value, -np.inf if low is None else low, np.inf if high is None else high))
+        if low is not None and value < low:
+            return low
+        if high is not None and value > high:
+            return high
+        return value
+
+    def get(self, key):
+        if key in self.overrides:
+            value = self.overrides[key]
+        elif key in self.values:
+            value = self._clamp(key, self.values[key])
+        else:
+            value = self._clamp(key, self.defaults.get(key))
+        if key in self.directions and isinstance(value, (int, float, np.ndarray)) and not isinstance(value, bool) \
+                and not is_count(key):
+            return self._move(key, value)
+        return value
+
+    def _move(self, key, value):
+        size = self._sizes.get(key)
+        if size is None:
+            size = abs(float(np.asarray(value).reshape(-1)[0]))
+            size = self._sizes[key] = size if size > 1 else 1.0
+        moved = value + size * self.directions[key]
+        low, high = self.bounds.get(key, (None, None))
+        # At a bound the value is only moved into the allowed range (a one-sided difference)
+        if low is not None:
+            moved = np.maximum(moved, np.minimum(low, value))
+        if high is not None:
+            moved = np.minimum(moved, np.maximum(high, value))
+        return Scenarios(moved)
+
+    def set(self, key, value):
+        self.values[key] = parse_value(value)
+
+    def set_bounds(self, key, low=None, high=None):
+        self.bounds[key] = (parse_value(low), parse_value(high))
+
+    def set_description(self, descriptions):
+        if not self.headless:
+            self.descriptions.update(descriptions)
+
+    def keys(self):
+        keys = list(self.defaults)
+        keys.extend(key for key in self.values if key not in self.defaults)
+        return keys
+
+    def to_dict(self):
+        """Effective value of every assumption."""
+        return {key: self.get(key) for key in self.keys()}
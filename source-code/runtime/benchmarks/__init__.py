@@ -0,0 +1,36 @@
+"""
+    Benchmarks of the local runtime.
+
+    From the `source-code` directory:
+
+        python -m runtime.benchmarks models --size small --output before.json
+        python -m runtime.benchmarks models --size small --output after.json
+        python -m runtime.benchmarks compare before.json after.json
+
+    `models` runs every model script over a synthetic universe of 100
+    (small), 10,000 (medium) or 100,000 (large) tickers, or over an existing
+    store given with `--store`. A universe can be written once with
+
+        python -m runtime.benchmarks universe --size large --output /tmp/universe
+
+    and reused with `--store /tmp/universe`. `primitives` times the `data`
+    API calls the scripts rely on over series of 10 to 10,000 periods:
+
+        python -m runtime.benchmarks primitives --output primitives.json
+
+    `compare` accepts two reports of either kind.
+
+    © Copyright discountingcashflows.com
+"""
+
+from .models import compare, run_benchmark
+from .primitives import run_primitives
+from .universe import SyntheticStore, write_universe
+
+__all__ = [
+    "SyntheticStore",
+    "compare",
+    "run_benchmark",
+    "run_primitives",
+    "write_universe",
+]
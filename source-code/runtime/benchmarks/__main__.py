@@ -0,0 +1,131 @@
+"""
+    Command line entry point of the benchmarks (see __init__.py).
+
+    © Copyright discountingcashflows.com
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+
+from ..store import open_store
+from . import primitives
+from .models import compare, run_benchmark
+from .universe import SIZES, write_universe
+
+
+def _size(text):
+    if text in SIZES:
+        return SIZES[text]
+    try:
+        return int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected a number of tickers or one of {', '.join(SIZES)}") from None
+
+
+def _write(report, path):
+    text = json.dumps(report, indent=1)
+    if path:
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+
+def _models(args):
+    def progress(name, report):
+        latency = report["latency_ms"]
+        print(f"{name:45s} {report['throughput']:10.1f} runs/s  p50 {latency.get('p50', 0):8.3f} ms  "
+              f"p99 {latency.get('p99', 0):8.3f} ms  {report['errors']} errors", file=sys.stderr)
+
+    with tempfile.TemporaryDirectory() as directory:
+        universe = None
+        if args.store:
+            store = open_store(args.store)
+        else:
+            start = time.perf_counter()
+            store = write_universe(directory, args.size, args.seed)
+            universe = {"size": args.size, "seed": args.seed, "seconds": round(time.perf_counter() - start, 3)}
+        report = run_benchmark(store, models=args.models or None, headless=args.headless, label=args.label,
+                               progress=progress)
+        report["universe"] = universe
+    _write(report, args.output)
+
+
+def _primitives(args):
+    def progress(name, length, microseconds):
+        print(f"{name:20s} {length:>6d} periods {microseconds:12.3f} us", file=sys.stderr)
+
+    unknown = [name for name in args.names if name not in primitives.PRIMITIVES]
+    if unknown:
+        raise SystemExit(f"Unknown primitives: {', '.join(unknown)}")
+    lengths = args.lengths or primitives.LENGTHS
+    _write(primitives.run_primitives(args.names, lengths, args.repeat, args.label, progress), args.output)
+
+
+def _universe(args):
+    start = time.perf_counter()
+    write_universe(args.output, args.size, args.seed)
+    print(f"Wrote {args.size} tickers to {args.output} in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+def _compare(args):
+    reports = []
+    for path in (args.before, args.after):
+        with open(path, encoding="utf-8") as file:
+            reports.append(json.load(file))
+    if reports[0].get("benchmark") == "primitives":
+        print(f"{'primitive':20s} {'length':>6s} {'time':>8s}  (after / before)")
+        for name, length, ratio in primitives.compare(*reports):
+            print(f"{name:20s} {length:>6d} {'-' if ratio is None else ratio:>8}")
+        return
+    print(f"{'model':45s} {'throughput':>10s} {'p50':>8s} {'p99':>8s}  (after / before)")
+    for name, *ratios in compare(*reports):
+        print(f"{name:45s} " + " ".join(f"{'-' if ratio is None else ratio:>{width}}"
+                                        for ratio, width in zip(ratios, (10, 8, 8))))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m runtime.benchmarks", description="Benchmark the local runtime.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    models = commands.add_parser("models", help="run every model script over a universe")
+    models.add_argument("--size", type=_size, default=SIZES["small"],
+                        help=f"synthetic universe size: a number or one of {', '.join(SIZES)} (default: small)")
+    models.add_argument("--seed", type=int, default=0, help="seed of the synthetic universe")
+    models.add_argument("--store", help="benchmark an existing store instead of a synthetic universe")
+    models.add_argument("--models", nargs="+", help="models to benchmark (default: all)")
+    models.add_argument("--headless", action="store_true", help="only compute the final values")
+    models.add_argument("--label", help="label stored in the report, e.g. a commit")
+    models.add_argument("--output", help="JSON report file (default: standard output)")
+    models.set_defaults(run=_models)
+
+    timings = commands.add_parser("primitives", help="time the data API primitives")
+    timings.add_argument("names", nargs="*", metavar="PRIMITIVE",
+                         help=f"primitives to time (default: all): {', '.join(primitives.PRIMITIVES)}")
+    timings.add_argument("--lengths", type=int, nargs="+", help="series lengths (default: 10 100 1000 10000)")
+    timings.add_argument("--repeat", type=int, default=3, help="timings per primitive, the best is kept")
+    timings.add_argument("--label", help="label stored in the report, e.g. a commit")
+    timings.add_argument("--output", help="JSON report file (default: standard output)")
+    timings.set_defaults(run=_primitives)
+
+    universe = commands.add_parser("universe", help="write a synthetic universe as a columnar store")
+    universe.add_argument("--size", type=_size, default=SIZES["small"])
+    universe.add_argument("--seed", type=int, default=0)
+    universe.add_argument("--output", required=True, help="directory of the columnar store")
+    universe.set_defaults(run=_universe)
+
+    comparison = commands.add_parser("compare", help="compare two reports")
+    comparison.add_argument("before")
+    comparison.add_argument("after")
+    comparison.set_defaults(run=_compare)
+
+    args = parser.parse_args(argv)
+    args.run(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
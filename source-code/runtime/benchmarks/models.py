@@ -0,0 +1,148 @@
+"""
+    End-to-end benchmark of the model scripts.
+
+    Every model is run for every ticker of a store, one ticker at a time,
+    and timed from loading the ticker to the end of the script. The report
+    has, per model:
+
+        - runs, ok and error counts, total seconds and throughput (runs/s)
+        - latency percentiles of a run in milliseconds
+        - the mean milliseconds per run spent in each phase: `load` (reading
+          the store), `init`, `historical` and `forecast` (`data.compute`
+          without and with `forecast=`), `render` and `script` (everything
+          else the script does, e.g. `data.get` and aggregations)
+        - the peak RSS of the process so far in megabytes
+
+    Reports are JSON documents; `compare` lines up two of them, e.g. from
+    before and after a change to the engine.
+
+    © Copyright discountingcashflows.com
+"""
+
+import datetime
+import platform
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+from ..runner import PHASES, available_models, execute, load_script, load_ticker
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+LATENCY_PERCENTILES = (50, 90, 99)
+
+
+def peak_rss():
+    """Peak resident set size of the process in megabytes, or None if unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+    }
+
+
+def benchmark_model(model, store, tickers, assumptions=None, headless=False):
+    """Benchmark one model over `tickers`, returning its report."""
+    name, path, code = load_script(model)
+    latencies = np.empty(len(tickers))
+    phases = dict.fromkeys(("load",) + PHASES, 0.0)
+    statuses = Counter()
+    started = time.perf_counter()
+    for index, ticker in enumerate(tickers):
+        start = time.perf_counter()
+        try:
+            ticker_data = load_ticker(store, ticker, path, assumptions, headless)
+        except Exception:
+            statuses["error"] += 1
+            latencies[index] = time.perf_counter() - start
+            continue
+        phases["load"] += time.perf_counter() - start
+        result = execute(name, path, code, ticker_data, assumptions, headless=headless, phases=phases)
+        latencies[index] = time.perf_counter() - start
+        statuses[result.status] += 1
+    seconds = time.perf_counter() - started
+
+    runs = len(tickers)
+    return {
+        "runs": runs,
+        "ok": statuses["ok"],
+        "errors": statuses["error"],
+        "seconds": round(seconds, 6),
+        "throughput": round(runs / seconds, 3) if seconds else None,
+        "latency_ms": _latency(latencies * 1000),
+        "phases_ms": {phase: round(total * 1000 / runs, 6) if runs else None for phase, total in phases.items()},
+        "peak_rss_mb": peak_rss(),
+    }
+
+
+def _latency(milliseconds):
+    if not milliseconds.size:
+        return {}
+    latency = {"mean": float(milliseconds.mean())}
+    for percentile, value in zip(LATENCY_PERCENTILES, np.percentile(milliseconds, LATENCY_PERCENTILES)):
+        latency[f"p{percentile}"] = float(value)
+    latency["max"] = float(milliseconds.max())
+    return {key: round(value, 6) for key, value in latency.items()}
+
+
+def run_benchmark(store, models=None, tickers=None, assumptions=None, headless=False, label=None, progress=None):
+    """Benchmark `models` (default: all of them) over the tickers of `store`, returning the report.
+
+    `progress`, if given, is called with the name and report of each model
+    as it completes.
+    """
+    models = list(models or available_models())
+    tickers = list(store.tickers() if tickers is None else tickers)
+    report = {
+        "benchmark": "models",
+        "label": label,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "environment": environment(),
+        "store": repr(store),
+        "tickers": len(tickers),
+        "headless": headless,
+        "assumptions": dict(assumptions or {}),
+        "models": {},
+    }
+    for model in models:
+        name = load_script(model)[0]
+        report["models"][name] = benchmark_model(model, store, tickers, assumptions, headless)
+        if progress is not None:
+            progress(name, report["models"][name])
+    report["peak_rss_mb"] = peak_rss()
+    return report
+
+
+def _ratio(value, reference):
+    return round(value / reference, 3) if value and reference else None
+
+
+def compare(before, after):
+    """Rows of (model, throughput ratio, p50 ratio, p99 ratio) of two reports; ratios are after / before."""
+    rows = []
+    for name, old in before.get("models", {}).items():
+        new = after.get("models", {}).get(name)
+        if new is None:
+            continue
+        rows.append((
+            name,
+            _ratio(new["throughput"], old["throughput"]),
+            _ratio(new["latency_ms"].get("p50"), old["latency_ms"].get("p50")),
+            _ratio(new["latency_ms"].get("p99"), old["latency_ms"].get("p99")),
+        ))
+    return rows
@@ -0,0 +1,145 @@
+"""
+    Microbenchmarks of the `data` API primitives the scripts rely on.
+
+    Each primitive is timed on a `Data` object whose series have `length`
+    periods (10 to 10,000 by default), so the cost of the expression and
+    range query paths shows up on its own and as a function of the length
+    of the series:
+
+        - `get`: an arithmetic expression of the LTM values
+        - `compute`: ratios and a growth rate over the whole history
+        - `compute_forecast`: a revenue recurrence, a margin and a discount
+          over `length` forecast periods
+        - `discount` and `discount_varying`: `function:discount` over
+          `length` forecast periods, at a constant rate and at a rate that
+          varies by period
+        - `average`: `%returnOnEquity:-10->0`, `average_all` over the whole
+          history
+        - `sum`: `discountedFreeCashFlow:1->*`
+        - `count`: the dividends other than None and 0
+        - `cagr` and `min` over the whole history
+
+    A timing is the best of `repeat` runs of as many calls as fit in 0.2s,
+    reported in microseconds per call.
+
+    © Copyright discountingcashflows.com
+"""
+
+import datetime
+import timeit
+
+import numpy as np
+
+from ..data import Data
+from ..store import TickerData
+from .models import _ratio, environment
+
+LENGTHS = (10, 100, 1000, 10000)
+
+HISTORICAL = {
+    "%netMargin": "income:netIncome / income:revenue",
+    "%returnOnEquity": "income:netIncome / balance:totalStockholdersEquity:-1",
+    "%revenueGrowthRate": "function:growth:income:revenue",
+}
+FORECAST = {
+    "income:revenue": "income:revenue:-1 * (1 + 0.05)",
+    "flow:freeCashFlow": "income:revenue * 0.12",
+    "discountedFreeCashFlow": "function:discount:flow:freeCashFlow rate:0.08 continuous:true",
+}
+DISCOUNT = {"discountedFreeCashFlow": "function:discount:flow:freeCashFlow rate:0.08 continuous:true"}
+DISCOUNT_VARYING = {
+    "%costOfEquity": "0.08 + 0.0001 * #index",
+    "discountedFreeCashFlow": "function:discount:flow:freeCashFlow rate:%costOfEquity continuous:true",
+}
+
+
+def ticker_data(length, seed=0):
+    """Fundamentals of a ticker with `length` periods, a few of them missing."""
+    rng = np.random.default_rng([seed, length])
+    revenue = 1e9 * np.cumprod(1 + rng.normal(0.04, 0.05, length))
+    net_income = revenue * rng.normal(0.1, 0.05, length)
+    dividend = np.maximum(net_income, 0) / 1e8 * (rng.random(length) > 0.1)
+    series = {
+        "income:revenue": revenue,
+        "income:netIncome": net_income,
+        "income:eps": net_income / 1e8,
+        "balance:totalStockholdersEquity": revenue * rng.uniform(0.4, 0.6, length),
+        "flow:freeCashFlow": net_income * rng.uniform(0.8, 1.2, length),
+        "dividend:adjDividend": dividend,
+    }
+    for values in series.values():
+        values[rng.random(length) < 0.02] = np.nan
+    return TickerData("BENCH", series, {"treasury:year10": 0.0425}, length - 1)
+
+
+def _historical(data, length):
+    data.compute(HISTORICAL)
+
+
+def _forecast(data, length):
+    data.compute(FORECAST, forecast=length)
+
+
+# name -> (setup, call), each taking the `Data` object and the length of its series
+PRIMITIVES = {
+    "get": (None, lambda data, length: data.get("income:netIncome / income:revenue * 100 + flow:freeCashFlow:-1 - 2")),
+    "compute": (None, _historical),
+    "compute_forecast": (None, _forecast),
+    "discount": (None, lambda data, length: data.compute(DISCOUNT, forecast=length)),
+    "discount_varying": (
+        lambda data, length: data.compute({"#index": "#index:-1 + 1"}, forecast=length),
+        lambda data, length: data.compute(DISCOUNT_VARYING, forecast=length),
+    ),
+    "average": (_historical, lambda data, length: data.average("%returnOnEquity:-10->0")),
+    "average_all": (_historical, lambda data, length: data.average(f"%returnOnEquity:{1 - length}->0")),
+    "sum": (_forecast, lambda data, length: data.sum("discountedFreeCashFlow:1->*")),
+    "count": (None, lambda data, length: data.count(
+        "dividend:adjDividend:*", properties={"except_values": [None, 0]})),
+    "cagr": (None, lambda data, length: data.cagr(f"income:revenue:{1 - length}->0")),
+    "min": (None, lambda data, length: data.min(f"income:eps:{1 - length}->0")),
+}
+
+
+def measure(name, length, repeat=3):
+    """Microseconds per call of a primitive on series of `length` periods."""
+    setup, call = PRIMITIVES[name]
+    data = Data(ticker_data(length))
+    if setup is not None:
+        setup(data, length)
+    timer = timeit.Timer(lambda: call(data, length))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number * 1e6
+
+
+def run_primitives(primitives=None, lengths=LENGTHS, repeat=3, label=None, progress=None):
+    """Time `primitives` (default: all of them) for every length, returning the report.
+
+    `progress`, if given, is called with the name, length and microseconds
+    of each timing.
+    """
+    report = {
+        "benchmark": "primitives",
+        "label": label,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "environment": environment(),
+        "lengths": list(lengths),
+        "primitives": {},
+    }
+    for name in primitives or PRIMITIVES:
+        timings = report["primitives"][name] = {}
+        for length in lengths:
+            timings[str(length)] = round(measure(name, length, repeat), 3)
+            if progress is not None:
+                progress(name, length, timings[str(length)])
+    return report
+
+
+def compare(before, after):
+    """Rows of (primitive, length, time ratio) of two reports; ratios are after / before."""
+    rows = []
+    for name, timings in before.get("primitives", {}).items():
+        for length, value in timings.items():
+            other = after.get("primitives", {}).get(name, {}).get(length)
+            if other is not None:
+                rows.append((name, int(length), _ratio(other, value)))
+    return rows
@@ -0,0 +1,156 @@
+"""
+    Deterministic synthetic universes of tickers for the benchmarks.
+
+    `SyntheticStore` behaves like a `FixtureStore` whose ticker documents
+    are generated on the fly: the same size and seed always give the same
+    fundamentals. The tickers are built to exercise the same paths as real
+    data:
+
+        - histories of 4 to 12 yearly records, the last one being the LTM
+          period (a half year after the last fiscal year end)
+        - revenue growing at a random rate, margins varying around a
+          per-ticker level, so some tickers have losses and negative EPS
+        - about a third of the tickers paying no dividends (no `dividend`
+          records at all) and some paying irregularly
+        - a few percent of the values missing (`None`)
+
+    `write_universe` writes a universe to disk as a columnar store, the
+    format used for large runs.
+
+    © Copyright discountingcashflows.com
+"""
+
+import numpy as np
+
+from ..store import TickerData, write_columnar_store
+
+SIZES = {"small": 100, "medium": 10000, "large": 100000}
+MARKET = {
+    "treasury": {"year10": 0.0425},
+    "risk": {"totalEquityRiskPremium": 0.046, "corporateTaxRate": 0.21},
+}
+LAST_FISCAL_YEAR = 2024
+# Share of values missing, of tickers paying no dividends and of payers skipping a year
+GAP_RATE = 0.02
+NO_DIVIDEND_RATE = 0.35
+SKIPPED_DIVIDEND_RATE = 0.1
+
+
+def _records(rng, fields):
+    """Yearly records from columns of values, with `GAP_RATE` of the values missing."""
+    length = len(fields["date"])
+    records = [{"date": fields["date"][period]} for period in range(length)]
+    for name, values in fields.items():
+        if name == "date":
+            continue
+        gaps = rng.random(length) < GAP_RATE
+        for record, value, gap in zip(records, values.tolist(), gaps.tolist()):
+            record[name] = None if gap else round(value, 4)
+    return records
+
+
+def document(index, seed=0):
+    """The JSON document of the ticker at `index` of a universe."""
+    rng = np.random.default_rng([seed, index])
+    length = int(rng.integers(4, 13))
+    dates = [f"{year}-12-31" for year in range(LAST_FISCAL_YEAR - length + 2, LAST_FISCAL_YEAR + 1)]
+    dates.append(f"{LAST_FISCAL_YEAR + 1}-06-30")
+
+    growth = rng.normal(rng.normal(0.05, 0.04), 0.08, length - 1)
+    revenue = rng.lognormal(21, 1.5) * np.concatenate(([1.0], np.cumprod(1 + growth)))
+    gross_margin = np.clip(rng.uniform(0.2, 0.7) + rng.normal(0, 0.02, length), 0.05, 0.95)
+    operating_margin = rng.normal(0.12, 0.1) + rng.normal(0, 0.03, length)
+    depreciation = revenue * rng.uniform(0.02, 0.06)
+    operating_income = revenue * operating_margin
+    debt = revenue * rng.uniform(0, 0.8)
+    interest = debt * rng.uniform(0.02, 0.07)
+    income_before_tax = operating_income - interest
+    tax = np.maximum(income_before_tax, 0) * rng.uniform(0.15, 0.28)
+    net_income = income_before_tax - tax
+    shares = rng.lognormal(19, 1) * (1 - rng.uniform(-0.01, 0.03)) ** np.arange(length)
+    eps = net_income / shares
+    operating_cash_flow = net_income + depreciation + revenue * rng.normal(0, 0.02, length)
+    capital_expenditure = -revenue * rng.uniform(0.03, 0.08)
+    current_assets = revenue * rng.uniform(0.3, 0.6)
+    current_liabilities = revenue * rng.uniform(0.2, 0.5)
+    non_current_assets = revenue * rng.uniform(0.5, 1.5)
+    cash = revenue * rng.uniform(0.05, 0.3)
+
+    pe = rng.uniform(8, 35)
+    price = pe * eps[-1] if eps[-1] > 0 else rng.uniform(5, 100)
+    returns = np.maximum(1 + rng.normal(0.05, 0.2, length - 1), 0.3)
+    close = price / np.concatenate((np.cumprod(returns[::-1])[::-1], [1.0]))
+
+    result = {
+        "profile": {"beta": round(rng.uniform(0.5, 1.8), 2), "price": round(price, 2),
+                    "mktCap": round(price * shares[-1], 2)},
+        "ratio": {"priceEarningsRatio": round(price / eps[-1], 4) if eps[-1] > 0 else None},
+        "income": _records(rng, {
+            "date": dates,
+            "revenue": revenue,
+            "costOfRevenue": revenue * (1 - gross_margin),
+            "grossProfit": revenue * gross_margin,
+            "operatingIncome": operating_income,
+            "ebitda": operating_income + depreciation,
+            "interestExpense": interest,
+            "incomeBeforeTax": income_before_tax,
+            "incomeTaxExpense": tax,
+            "netIncome": net_income,
+            "weightedAverageShsOut": shares,
+            "eps": eps,
+        }),
+        "balance": _records(rng, {
+            "date": dates,
+            "cashAndCashEquivalents": cash,
+            "cashAndShortTermInvestments": cash * rng.uniform(1, 1.5),
+            "longTermDebt": debt * 0.85,
+            "shortTermDebt": debt * 0.15,
+            "totalDebt": debt,
+            "totalCurrentAssets": current_assets,
+            "totalCurrentLiabilities": current_liabilities,
+            "totalNonCurrentAssets": non_current_assets,
+            "totalStockholdersEquity": current_assets + non_current_assets - current_liabilities - debt * 0.85,
+        }),
+        "flow": _records(rng, {
+            "date": dates,
+            "capitalExpenditure": capital_expenditure,
+            "depreciationAndAmortization": depreciation,
+            "freeCashFlow": operating_cash_flow + capital_expenditure,
+            "netCashProvidedByOperatingActivities": operating_cash_flow,
+            "operatingCashFlow": operating_cash_flow,
+        }),
+        "quote": _records(rng, {"date": dates, "close": close}),
+    }
+    if rng.random() >= NO_DIVIDEND_RATE:
+        dividend = np.maximum(eps, 0) * rng.uniform(0.2, 0.6)
+        dividend[rng.random(length) < SKIPPED_DIVIDEND_RATE] = 0
+        result["dividend"] = _records(rng, {"date": dates, "adjDividend": dividend})
+    return result
+
+
+class SyntheticStore:
+    """Store of `size` generated tickers, named `T000000`, `T000001`, ..."""
+
+    def __init__(self, size, seed=0):
+        self.size = int(SIZES.get(size, size))
+        self.seed = seed
+        self.market = MARKET
+
+    def __repr__(self):
+        return f"SyntheticStore({self.size!r}, seed={self.seed!r})"
+
+    def tickers(self):
+        return [f"T{index:06d}" for index in range(self.size)]
+
+    def load(self, ticker, fields=None, history=None):
+        index = int(ticker[1:]) if ticker[:1] == "T" and ticker[1:].isdigit() else -1
+        if not 0 <= index < self.size:
+            raise KeyError(f"Ticker {ticker!r} not found in {self!r}")
+        ticker_data = TickerData.from_json(ticker, document(index, self.seed), self.market, fields, history)
+        ticker_data.snapshot = ("synthetic", self.seed, ticker)
+        return ticker_data
+
+
+def write_universe(root, size, seed=0):
+    """Write a synthetic universe of `size` tickers as a columnar store at `root`."""
+    return write_columnar_store(SyntheticStore(size, seed), root)
@@ -0,0 +1,155 @@
+"""
+    Persistent cache of model results.
+
+    A `ResultCache` keeps the `ModelResult` of every model and ticker it ran
+    in a directory, one JSON file per result, under a key hashing the
+    source of the model script, the snapshot of the ticker's data (see
+    `TickerData.snapshot`) and the normalized assumption overrides (see
+    revaluation.py). Looking a result up only reads the script's version
+    and the versions of the ticker's files, not the data itself, so the
+    results viewed again and again are answered without running anything:
+
+        cache = ResultCache(os.path.expanduser("~/.cache/valuations"))
+        result = cache.run_model("discounted-free-cash-flow-perpetuity", "ACME", store)
+
+    A new version of the script or of the data is a new key. Results are
+    evicted from the least recently used once the files take more than
+    `max_bytes`. Only successful runs are kept, and runs with scenario
+    overrides (see scenarios.py) are not cached, as their values would come
+    back as lists.
+
+    © Copyright discountingcashflows.com
+"""
+
+import hashlib
+import json
+import os
+
+from .revaluation import normalized, source_hash
+from .runner import ModelResult, _run, parallel_map, resolve_model
+from .scenarios import size_of
+
+DEFAULT_MAX_BYTES = 256 * 2 ** 20
+# Evict down to this fraction of `max_bytes`, so the directory is not scanned on every store
+EVICT_TO = 0.9
+
+
+class ResultCache:
+    """Model results in the directory `root`, at most `max_bytes` of them (see the module docstring)."""
+
+    def __init__(self, root, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = os.fspath(root)
+        self.max_bytes = max_bytes
+        os.makedirs(self.root, exist_ok=True)
+        self.size = sum(entry.stat().st_size for entry in self._entries())
+
+    def __repr__(self):
+        return f"ResultCache({self.root!r})"
+
+    def __getstate__(self):
+        return {"root": self.root, "max_bytes": self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(state["root"], state["max_bytes"])
+
+    def _entries(self):
+        for directory in os.scandir(self.root):
+            if directory.is_dir():
+                yield from (entry for entry in os.scandir(directory) if entry.name.endswith(".json"))
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def key(self, path, snapshot, assumptions=None, headless=False, outputs=None):
+        """The key of the result of the script at `path` for a data `snapshot`."""
+        outputs = None if outputs is None else sorted(outputs)
+        text = json.dumps([source_hash(path), repr(snapshot), normalized(assumptions), headless, outputs])
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def get(self, key):
+        """The `ModelResult` stored under `key`, or None."""
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as file:
+                document = json.load(file)
+            # The modification time orders the results for eviction
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            return None
+        return ModelResult(**document)
+
+    def put(self, key, result):
+        """Store `result` under `key`, evicting the least recently used results if the cache is full."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        text = json.dumps(result.to_dict())
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            file.write(text)
+        os.replace(temporary, path)
+        self.size += len(text.encode())
+        if self.size > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Remove the least recently used results until they take at most `EVICT_TO` of `max_bytes`."""
+        entries = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                # Evicted by another process
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        entries.sort()
+        self.size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self.size <= self.max_bytes * EVICT_TO:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.size -= size
+
+    def _run(self, arguments):
+        models, ticker, store, assumptions, headless, outputs = arguments
+        if size_of((assumptions or {}).values()):
+            return _run(arguments)
+        try:
+            snapshot = store.snapshot(ticker)
+        except Exception as error:
+            message = f"{type(error).__name__}: {error}"
+            return [ModelResult(model=model, ticker=ticker, status="error", error=message) for model in models]
+        results = {}
+        missing = {}
+        for model in models:
+            key = self.key(resolve_model(model), snapshot, assumptions, headless, outputs)
+            result = self.get(key)
+            if result is None:
+                missing[model] = key
+            else:
+                results[model] = result
+        if missing:
+            for model, result in zip(missing, _run((tuple(missing), ticker, store, assumptions, headless, outputs))):
+                if result.status == "ok":
+                    self.put(missing[model], result)
+                results[model] = result
+        return [results[model] for model in models]
+
+    def run_model(self, model, ticker, store, assumptions=None, headless=False, outputs=None):
+        """The `ModelResult` of `run_model`, from the cache if it has it."""
+        return self._run(((model,), ticker, store, assumptions, headless, outputs))[0]
+
+    def run_universe(self, model, store, tickers=None, assumptions=None, workers=1, headless=False, outputs=None):
+        """`run_universe` answered from the cache, running only the models and tickers it does not have."""
+        models = (model,) if isinstance(model, str) else tuple(model)
+        for name in models:
+            resolve_model(name)
+        if outputs is not None and len(models) > 1:
+            raise ValueError("Outputs can only be selected for a single model")
+        if tickers is None:
+            tickers = store.tickers()
+        jobs = ((models, ticker, store, assumptions, headless, outputs) for ticker in tickers)
+        for results in (map(self._run, jobs) if workers <= 1 else parallel_map(self._run, jobs, workers)):
+            yield from results
@@ -0,0 +1,354 @@
+"""
+    The `data` object injected into the model scripts.
+
+    Values are stored per key as float64 columns on a period axis running
+    from the oldest historical period (negative) through the LTM period (0)
+    to the last forecast period. Missing values are NaN internally and are
+    returned to the scripts as `None`.
+
+    In a scenario run (see scenarios.py) the columns that depend on a
+    scenario assumption have a second axis with one value per scenario, and
+    the values returned to the scripts for them are `Scenarios` arrays.
+
+    The float64 arrays of the ticker's data are used as they are, not
+    copied: a column is only copied the first time the script writes to it
+    (`data.compute` of a store key, e.g. the forecast of `income:revenue`).
+    The models run for the same ticker (see `runner.run_suite`) thus share
+    one copy of its data, read-only (see `TickerData.frozen`), and none of
+    them sees the values another one computed. Columns are only extended
+    over the forecast periods when they are written to; reading past the end
+    of a column gives NaN.
+
+    © Copyright discountingcashflows.com
+"""
+
+import functools
+import re
+import warnings
+
+import numpy as np
+
+from . import engine, scenarios
+from .formula import compile_formula, normalize
+from .scenarios import Scenarios, tolist
+from .shared import MISSING
+
+_RANGE = re.compile(r"^(?P<key>.+?)(?::(?P<range>\*|(?P<start>-?\d+|\*)->(?P<end>-?\d+|\*)))?$", re.DOTALL)
+_BOUNDS = re.compile(r"^(?P<start>-?\d+|\*)->(?P<end>-?\d+|\*)$")
+
+
+def _period(text):
+    return None if text is None or text == "*" else int(text)
+
+
+@functools.lru_cache(maxsize=1024)
+def _split_range(text):
+    """Split `key:start->end` into the compiled key formula and the range bounds.
+
+    Returns (formula, has_range, start, end) where missing bounds are None.
+    """
+    match = _RANGE.match(text.strip())
+    formula = compile_formula(match.group("key").strip())
+    if match.group("range") == "*":
+        return formula, True, None, None
+    if match.group("range"):
+        return formula, True, _period(match.group("start")), _period(match.group("end"))
+    return formula, False, None, None
+
+
+def scalar(value):
+    """Convert a single evaluated value to a float, or None if missing."""
+    value = float(value)
+    return None if value != value else value
+
+
+def _result(values):
+    """Convert the values of one period to a float, or to `Scenarios` if they vary by scenario."""
+    if np.size(values) > 1:
+        return Scenarios(values)
+    return scalar(np.asarray(values).flat[0])
+
+
+def _reduce(function, values, default):
+    """Reduce the present values over the period axis, per scenario for 2-D values."""
+    if values.ndim == 2 and values.shape[1] == 1:
+        values = values[:, 0]
+    if values.ndim == 1:
+        values = values[~np.isnan(values)]
+        return float(function(values)) if values.size else default
+    with warnings.catch_warnings():
+        # Scenarios without any present value reduce to NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        reduced = function(values, axis=0)
+    return Scenarios(reduced)
+
+
+class Data:
+    """Per-ticker data frame exposing the `data.*` API of the model scripts."""
+
+    def __init__(self, ticker_data, memo=None, scenarios=None, shared=None, skip=frozenset()):
+        self.ticker = ticker_data.ticker
+        self.first = -ticker_data.history
+        self.last = 0
+        self.year_fraction = ticker_data.year_fraction
+        # Lists (None for missing values) or arrays, e.g. rows of a memory-mapped store
+        self.columns = {}
+        # Keys of the columns created by this object, the others are copied before being written
+        self.owned = set()
+        for key, values in ticker_data.series.items():
+            self.columns[key] = np.asarray(values, dtype=float)
+            if not isinstance(values, np.ndarray):
+                self.owned.add(key)
+        self.scalars = dict(ticker_data.scalars)
+        self.default_range = None
+        # Number of scenarios of a scenario run, None otherwise
+        self.scenarios = scenarios
+        # Memoization of data.compute steps across runs (see session.py)
+        self.memo = memo
+        self.versions = {}
+        # LTM values shared with other models of the same ticker (see shared.py)
+        self.shared = shared
+        self.snapshot = getattr(ticker_data, "snapshot", None)
+        self.computed = set()
+        # Computed keys left out of a headless run (see analysis.py)
+        self.skip = skip
+
+    # Period axis
+
+    @property
+    def length(self):
+        return self.last - self.first + 1
+
+    def _extend(self, last):
+        self.last = max(self.last, last)
+
+    def _own(self, key):
+        """The column of `key`, copied if it was not created by this object and padded to the period axis."""
+        column = self.columns[key]
+        if key not in self.owned or len(column) < self.length:
+            padding = np.full((self.length - len(column),) + column.shape[1:], np.nan)
+            column = self.columns[key] = np.concatenate((column, padding))
+            self.owned.add(key)
+        return column
+
+    def value(self, key, period):
+        """Value of `key` at `period`, or None if missing."""
+        return scalar(np.asarray(engine.read(self, key, period, period + 1)).flat[0])
+
+    def resolve_period_range(self, start=None, end=None):
+        """Clamp a `start`/`end` pair (ints, None or "*") to the period axis."""
+        start = self.first if start in (None, "*") else max(int(start), self.first)
+        end = self.last if end in (None, "*") else min(int(end), self.last)
+        return start, end
+
+    def _range(self, text):
+        """Compiled key formula and clamped period range of `key:start->end`."""
+        formula, has_range, start, end = _split_range(normalize(text))
+        if not has_range and self.default_range is not None:
+            start, end = self.default_range
+        start, end = self.resolve_period_range(start, end)
+        return formula, start, end
+
+    def _bind(self, formula, params=None):
+        """Bind the parameters of a formula, including the active scenario arrays."""
+        bindings = scenarios.current()
+        if bindings:
+            params = {**bindings, **params} if params else bindings
+        return formula.bind(params)
+
+    def _values(self, text):
+        formula, start, end = self._range(text)
+        if end < start:
+            return np.empty(0)
+        return engine.evaluate(formula.node, self, start, end + 1, self._bind(formula))
+
+    def _write(self, key, low, high, values):
+        """Store evaluated values into a column, adding a scenario axis if needed."""
+        column = self._own(key)
+        if np.ndim(values) == 2:
+            if values.shape[1] == 1:
+                values = values[:, 0]
+            elif column.ndim == 1:
+                column = self.columns[key] = np.repeat(column[:, None], values.shape[1], axis=1)
+        column[low:high] = values
+
+    def series(self, key, start=None, end=None):
+        """List of (period, value) pairs of a key between two periods.
+
+        Values that vary by scenario are arrays with one value per scenario.
+        """
+        start, end = self.resolve_period_range(start, end)
+        values = engine.read(self, key, start, end + 1)
+        if np.ndim(values) == 2 and values.shape[1] == 1:
+            values = values[:, 0]
+        if np.ndim(values) == 2:
+            values = list(np.array(values))
+        else:
+            values = tolist(values) if np.ndim(values) else [scalar(values)] * (end + 1 - start)
+        return list(zip(range(start, end + 1), values))
+
+    # Model API
+
+    def set_default_range(self, text):
+        match = _BOUNDS.match(str(text).strip())
+        if match is None:
+            raise ValueError(f"Invalid range {text!r}, expected 'start->end'")
+        self.default_range = (_period(match.group("start")), _period(match.group("end")))
+
+    def get(self, formula, default=None, params=None):
+        """Value of a formula at the LTM period, with `$name` parameters bound from `params`."""
+        formula = compile_formula(formula)
+        bound = self._bind(formula, params)
+        key = self._shared_key(formula, bound)
+        value = MISSING if key is None else self.shared.get(key)
+        if value is MISSING:
+            value = _result(engine.evaluate(formula.node, self, 0, 1, bound)[0])
+            if key is not None:
+                self.shared.put(key, value)
+        return default if value is None else value
+
+    def _shared_key(self, formula, bound):
+        """Key of a formula value in the shared cache, or None if it cannot be shared."""
+        if self.shared is None or self.snapshot is None or self.scenarios:
+            return None
+        if any(key in self.computed for key, _ in formula.reads):
+            return None
+        key = (self.snapshot, formula.plan.text, tuple(bound.items()))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def compute(self, formulas_by_key, forecast=None, params=None):
+        """Compute keys from formulas for the historical periods, or for the
+        `forecast` periods after the LTM period. `params` binds the `$name`
+        parameters of every formula in the block."""
+        if self.skip:
+            formulas_by_key = {key: formula for key, formula in formulas_by_key.items() if key not in self.skip}
+        keys = tuple(formulas_by_key)
+        compiled = tuple(compile_formula(formula) for formula in formulas_by_key.values())
+        bound = tuple(self._bind(formula, params) for formula in compiled)
+        if forecast is not None:
+            # A forecast of no periods computes nothing
+            forecast = max(int(forecast), 0)
+            self._extend(forecast)
+            start, stop = 1, forecast + 1
+        else:
+            start, stop = self.first, 1
+        self.computed.update(keys)
+        for key in keys:
+            if key not in self.columns:
+                self.columns[key] = np.full(self.length, np.nan)
+                self.owned.add(key)
+
+        for step in engine.schedule(keys, tuple(formula.plan for formula in compiled)):
+            mode, indices = step
+            if self.memo is None:
+                self._compute_step(step, keys, compiled, bound, start, stop)
+            elif mode == "column":
+                # Memoize column steps key by key
+                for index in indices:
+                    self._compute_memoized((mode, (index,)), keys, compiled, bound, start, stop)
+            else:
+                self._compute_memoized(step, keys, compiled, bound, start, stop)
+
+    def _compute_step(self, step, keys, compiled, bound, start, stop):
+        mode, indices = step
+        if mode == "column":
+            low = start - self.first
+            for index in indices:
+                values = engine.evaluate(compiled[index].node, self, start, stop, bound[index])
+                self._write(keys[index], low, low + stop - start, values)
+            return
+        for period in range(start, stop):
+            low = period - self.first
+            for index in indices:
+                values = engine.evaluate(compiled[index].node, self, period, period + 1, bound[index])
+                self._write(keys[index], low, low + 1, values)
+
+    # Memoization
+
+    def _version(self, key):
+        version = self.versions.get(key)
+        if version is None:
+            version = self.versions[key] = self.memo.version(("base", self.ticker, key))
+        return version
+
+    def _signature(self, step, keys, compiled, bound, start, stop):
+        """Everything the values computed by a step depend on."""
+        mode, indices = step
+        inputs = {keys[index] for index in indices}
+        for index in indices:
+            inputs.update(key for key, _ in compiled[index].reads)
+        signature = (
+            mode, start, stop,
+            tuple((keys[index], compiled[index].plan.text, tuple(bound[index].items())) for index in indices),
+            tuple(sorted((key, self._version(key)) for key in inputs)),
+        )
+        try:
+            hash(signature)
+        except TypeError:
+            return None
+        return signature
+
+    def _compute_memoized(self, step, keys, compiled, bound, start, stop):
+        mode, indices = step
+        low, high = start - self.first, stop - self.first
+        signature = self._signature(step, keys, compiled, bound, start, stop)
+        if signature is None:
+            self._compute_step(step, keys, compiled, bound, start, stop)
+            for index in indices:
+                self.versions[keys[index]] = self.memo.unique_version()
+            return
+
+        version = self.memo.version(signature)
+        values = self.memo.get(version)
+        if values is None:
+            self._compute_step(step, keys, compiled, bound, start, stop)
+            values = tuple(self.columns[keys[index]][low:high].copy() for index in indices)
+            self.memo.put(version, [keys[index] for index in indices], values)
+        else:
+            for index, column in zip(indices, values):
+                self._write(keys[index], low, high, column)
+        for index in indices:
+            key = keys[index]
+            self.versions[key] = self.memo.version(("write", self._version(key), version, key))
+
+    def average(self, text, default=None):
+        return _reduce(np.nanmean, self._values(text), default)
+
+    def sum(self, text, default=None):
+        return _reduce(np.nansum, self._values(text), default)
+
+    def min(self, text, default=None):
+        return _reduce(np.nanmin, self._values(text), default)
+
+    def max(self, text, default=None):
+        return _reduce(np.nanmax, self._values(text), default)
+
+    def count(self, text, properties=None):
+        excluded = (properties or {}).get("except_values", [None])
+        values = self._values(text)
+        counted = ~np.isnan(values) if None in excluded else np.ones(values.shape, dtype=bool)
+        excluded_values = [item for item in excluded if item is not None]
+        if excluded_values:
+            counted &= ~np.isin(values, excluded_values)
+        if counted.ndim == 2 and counted.shape[1] > 1:
+            return Scenarios(counted.sum(axis=0))
+        return int(counted.sum())
+
+    def cagr(self, text, default=None):
+        formula, start, end = self._range(text)
+        if end <= start:
+            return default
+        values = engine.evaluate(formula.node, self, start, end + 1, self._bind(formula))
+        first, last = values[0], values[-1]
+        if np.size(first) > 1 or np.size(last) > 1:
+            with np.errstate(all="ignore"):
+                growth = (last / first) ** (1 / (end - start)) - 1
+            return Scenarios(np.where((first > 0) & (last >= 0), growth, np.nan))
+        first, last = np.asarray(first).flat[0], np.asarray(last).flat[0]
+        if not (first > 0 and last >= 0):
+            return default
+        return float((last / first) ** (1 / (end - start)) - 1)
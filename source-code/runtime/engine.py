@@ -0,0 +1,242 @@
+"""
+    Vectorized evaluation of compiled formulas.
+
+    A formula is evaluated for a whole range of periods at once: every key
+    reference becomes a slice of a float64 column (NaN for missing values)
+    and the arithmetic runs on NumPy arrays.
+
+    When a model is run for several assumption scenarios at once (see
+    scenarios.py), values get a second axis with one entry per scenario:
+    columns are read as (periods, 1) and `$name` parameters bound to a
+    scenario array as (1, scenarios), so every formula broadcasts to
+    (periods, scenarios).
+
+    `function:discount` and `function:compound` compound their rate over the
+    years of each period in one pass: `(1 + rate) ** years` for a rate that
+    is the same in every period (the usual `rate:{number}`), a cumulative
+    sum of `log1p(rate) * years` otherwise (`rate:%costOfEquity`).
+
+    `data.compute` blocks keep the semantics of evaluating every key period
+    by period, in order. `schedule` finds the keys that can nevertheless be
+    computed a whole column at a time and groups the remaining ones, which
+    depend on earlier periods of themselves or of later keys (recurrences
+    like `income:revenue:-1 * (1 + g)`), into the smallest spans that have
+    to be evaluated row by row.
+
+    © Copyright discountingcashflows.com
+"""
+
+import functools
+
+import numpy as np
+
+from .formula import BinOp, Call, Neg, Num, Param, Ref
+
+NAN = np.nan
+
+
+def read(data, key, start, stop):
+    """Values of `key` for the periods [start, stop), NaN outside of the data."""
+    column = data.columns.get(key)
+    if column is None:
+        value = data.scalars.get(key)
+        return np.float64(NAN if value is None else value)
+    low = start - data.first
+    high = stop - data.first
+    if data.scenarios and column.ndim == 1:
+        column = column[:, None]
+    if low >= 0 and high <= len(column):
+        return column[low:high]
+    values = np.full((stop - start,) + column.shape[1:], NAN)
+    clipped_low = max(low, 0)
+    clipped_high = min(high, len(column))
+    if clipped_low < clipped_high:
+        values[clipped_low - low:clipped_high - low] = column[clipped_low:clipped_high]
+    return values
+
+
+def rows(data, values, count):
+    """Broadcast evaluated values to `count` periods (keeping the scenario axis)."""
+    shape = np.shape(values)
+    if data.scenarios:
+        shape = (count, shape[1] if len(shape) == 2 else 1)
+    else:
+        shape = (count,)
+    return values if np.shape(values) == shape else np.broadcast_to(values, shape)
+
+
+def times(data, periods, continuous):
+    """Years between the LTM date and the end of each period."""
+    periods = np.asarray(periods, dtype=float)
+    if not continuous:
+        return periods
+    return np.where(periods > 0, periods - 1 + data.year_fraction, periods)
+
+
+def constant_factors(rate, years):
+    """Growth factors `(1 + rate) ** years` of a rate that is the same in every period.
+
+    `years` are the (non-negative) years of each period, `rate` a number or
+    an array broadcasting against them, e.g. one rate per scenario or per
+    ticker. Rates below -100% give NaN, except for zero years.
+    """
+    base = 1 + np.asarray(rate, dtype=float)
+    factors = np.power(np.where(base >= 0, base, NAN), years)
+    return np.where(years == 0, 1.0, factors)
+
+
+def compounded_factors(rates, steps, axis=0):
+    """Growth factors compounding a rate that varies by period over `steps` years per period.
+
+    `rates` and `steps` broadcast against each other, with the periods on
+    `axis`. The factor of a period is the product of (1 + rate) ** step of
+    every period up to it. Rates below -100% give NaN from that period on.
+    """
+    rates = np.asarray(rates, dtype=float)
+    logs = np.where(rates > -1, np.log1p(np.maximum(rates, -1)), NAN) * steps
+    return np.exp(np.cumsum(logs, axis=axis))
+
+
+def _constant(node):
+    # Rates that do not depend on the period: numbers and (scenario) parameters
+    return isinstance(node, (Num, Param)) or isinstance(node, Neg) and _constant(node.operand)
+
+
+def growth_factors(data, rate, start, stop, continuous, params=None):
+    """Compounded growth factor from period 0 to every period in [start, stop)."""
+    last = stop - 1
+    if last < 1:
+        return rows(data, np.float64(1.0), stop - start)
+    if _constant(rate):
+        # Closed form over the requested periods only
+        years = np.maximum(times(data, np.arange(start, stop), continuous), 0)
+        value = _evaluate(rate, data, start, stop, params)
+        if data.scenarios:
+            years = years[:, None]
+        return rows(data, constant_factors(value, years), stop - start)
+    rates = rows(data, _evaluate(rate, data, 1, last + 1, params), last)
+    steps = np.diff(times(data, np.arange(0, last + 1), continuous))
+    if rates.ndim == 2:
+        steps = steps[:, None]
+    compounded = compounded_factors(rates, steps)
+    factors = np.ones((stop - start,) + compounded.shape[1:])
+    first_forecast = max(start, 1)
+    factors[first_forecast - start:] = compounded[first_forecast - 1:]
+    return factors
+
+
+def _option(node, data, start, default, params):
+    if node is None:
+        return default
+    value = np.asarray(_evaluate(node, data, start, start + 1, params)).flat[0]
+    return default if np.isnan(value) else float(value)
+
+
+def _call(node, data, start, stop, params):
+    if node.name in ("discount", "compound"):
+        values = _evaluate(node.argument, data, start, stop, params)
+        rate = node.options.get("rate", Num(0.0))
+        continuous = bool(_option(node.options.get("continuous"), data, start, 0.0, params))
+        factors = growth_factors(data, rate, start, stop, continuous, params)
+        offset = _option(node.options.get("offset"), data, start, 0.0, params)
+        if offset:
+            factors = factors * (1 + _evaluate(rate, data, start, stop, params)) ** offset
+        if node.name == "discount":
+            return np.where(factors == 0, NAN, values / factors)
+        return values * factors
+
+    if node.name == "growth":
+        values = rows(data, _evaluate(node.argument, data, start - 1, stop, params), stop - start + 1)
+        previous = values[:-1]
+        return np.where(previous == 0, NAN, values[1:] / previous - 1)
+    values = _evaluate(node.argument, data, start, stop, params)
+    if node.name == "sqrt":
+        return np.sqrt(values)
+    if node.name == "abs":
+        return np.abs(values)
+    raise ValueError(f"Unknown function {node.name!r}")
+
+
+def _evaluate(node, data, start, stop, params):
+    if isinstance(node, Ref):
+        return read(data, node.key, start + node.offset, stop + node.offset)
+    if isinstance(node, BinOp):
+        left = _evaluate(node.left, data, start, stop, params)
+        right = _evaluate(node.right, data, start, stop, params)
+        if node.op == "+" or node.op == "-":
+            # A missing term is left out of a sum
+            left_missing = np.isnan(left)
+            right_missing = np.isnan(right)
+            left = np.where(left_missing & ~right_missing, 0.0, left)
+            right = np.where(right_missing & ~left_missing, 0.0, right)
+            return left + right if node.op == "+" else left - right
+        if node.op == "*":
+            return left * right
+        if node.op == "/":
+            return np.where(right == 0, NAN, left / right)
+        return left ** right
+    if isinstance(node, Param):
+        value = params[node.name]
+        if isinstance(value, np.ndarray) and value.ndim:
+            # One value per scenario
+            return np.asarray(value, dtype=float).reshape(1, -1)
+        return np.float64(NAN if value is None else value)
+    if isinstance(node, Num):
+        return np.float64(NAN if node.value is None else node.value)
+    if isinstance(node, Neg):
+        return -_evaluate(node.operand, data, start, stop, params)
+    if isinstance(node, Call):
+        return _call(node, data, start, stop, params)
+    raise TypeError(f"Unknown formula node {node!r}")
+
+
+def evaluate(node, data, start, stop, params=None):
+    """Evaluate an expression tree for the periods [start, stop) as a float64 array.
+
+    `params` maps the names of the `$name` parameters of the tree to their values.
+    """
+    with np.errstate(all="ignore"):
+        values = _evaluate(node, data, start, stop, params)
+    return rows(data, values, stop - start)
+
+
+@functools.lru_cache(maxsize=1024)
+def schedule(keys, plans):
+    """Split a `data.compute` block into column and row evaluation steps.
+
+    Returns a tuple of ("column" | "row", indices) steps. A key can be
+    computed as a whole column unless it reads an earlier period of itself
+    or of a key that comes later in the block, or a later period of a key
+    that is already computed. Such keys, together with every key between
+    them and the key they read, form a span that is evaluated row by row.
+    """
+    position = {key: index for index, key in enumerate(keys)}
+    spans = []
+    for index, plan in enumerate(plans):
+        for key, offset in plan.reads:
+            other = position.get(key)
+            if other is None:
+                continue
+            if offset < 0 and other >= index:
+                spans.append((index, other))
+            elif offset > 0 and other <= index:
+                spans.append((other, index))
+
+    spans.sort()
+    merged = []
+    for low, high in spans:
+        if merged and low <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], high)
+        else:
+            merged.append([low, high])
+
+    steps = []
+    index = 0
+    for low, high in merged:
+        if index < low:
+            steps.append(("column", tuple(range(index, low))))
+        steps.append(("row", tuple(range(low, high + 1))))
+        index = high + 1
+    if index < len(keys):
+        steps.append(("column", tuple(range(index, len(keys)))))
+    return tuple(steps)
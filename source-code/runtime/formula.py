@@ -0,0 +1,441 @@
+"""
+    Formula parser for the `data.get` / `data.compute` expression language.
+
+    A formula is an arithmetic expression over data keys, for example:
+
+        flow:operatingCashFlow / income:revenue
+        income:revenue:-1 * (1 + 0.05)
+        function:discount:flow:freeCashFlow rate:0.08 continuous:true
+
+    Keys are either namespaced statement fields (`income:revenue`) or keys
+    created by `data.compute` (`%taxRate`, `#bookValue`, `nopat`). A trailing
+    integer (`income:revenue:-1`) is a period offset relative to the period
+    being evaluated.
+
+    Missing values propagate as None, except in sums and differences where a
+    single missing term is treated as zero.
+
+    `$name` is a bound parameter whose value is passed separately, e.g.
+    `data.compute({"flow:operatingCashFlow": "income:revenue * $margin"},
+    params={"margin": 0.2})`. The literal numbers of a formula are turned into
+    positional parameters as well, so `income:revenue * 0.2` and
+    `income:revenue * 0.3` share one parsed plan and only differ by the values
+    bound to it.
+
+    © Copyright discountingcashflows.com
+"""
+
+import functools
+import math
+import re
+
+# Namespaces backed by per-period statement data
+PERIODIC_NAMESPACES = ("income", "balance", "flow", "dividend", "quote")
+# Namespaces backed by a single (latest) value
+SCALAR_NAMESPACES = ("profile", "ratio", "treasury", "risk")
+
+FUNCTIONS = ("growth", "sqrt", "abs", "discount", "compound")
+OPTIONS = ("rate", "continuous", "offset")
+
+# Number of distinct formula strings kept compiled
+CACHE_SIZE = 4096
+# Number of distinct formula shapes (formulas without their literals) kept parsed
+PLAN_CACHE_SIZE = 1024
+
+_TOKEN = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<function>function:(?P<function_name>[A-Za-z_]\w*):)
+  | (?P<option>(?P<option_name>rate|continuous|offset):)
+  | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?%?)
+  | (?P<param>\$\w+)
+  | (?P<key>[%#]?[A-Za-z_]\w*(?::[A-Za-z_]\w*)?(?::-?\d+)?)
+  | (?P<op>\*\*|[-+*/()])
+""", re.VERBOSE)
+
+_LITERALS = {
+    "None": None,
+    "none": None,
+    "null": None,
+    "nan": None,
+    "true": 1.0,
+    "True": 1.0,
+    "false": 0.0,
+    "False": 0.0,
+    "inf": math.inf,
+}
+# Literals that are part of the structure of a formula rather than values
+_FLAGS = ("true", "True", "false", "False")
+
+
+class FormulaError(ValueError):
+    """Raised when a formula string cannot be parsed."""
+
+
+class Num:
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __repr__(self):
+        return f"Num({self.value!r})"
+
+
+class Param:
+    """A `$name` parameter bound when the formula is evaluated."""
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return f"Param({self.name!r})"
+
+
+class Ref:
+    """Reference to a data key at a period offset relative to the current period."""
+    __slots__ = ("key", "offset")
+
+    def __init__(self, key, offset=0):
+        self.key = key
+        self.offset = offset
+
+    def __repr__(self):
+        return f"Ref({self.key!r}, {self.offset})"
+
+
+class Neg:
+    __slots__ = ("operand",)
+
+    def __init__(self, operand):
+        self.operand = operand
+
+    def __repr__(self):
+        return f"Neg({self.operand!r})"
+
+
+class BinOp:
+    __slots__ = ("op", "left", "right")
+
+    def __init__(self, op, left, right):
+        self.op = op
+        self.left = left
+        self.right = right
+
+    def __repr__(self):
+        return f"BinOp({self.op!r}, {self.left!r}, {self.right!r})"
+
+
+class Call:
+    """A `function:<name>:<argument>` call with its `rate:`/`continuous:`/`offset:` options."""
+    __slots__ = ("name", "argument", "options")
+
+    def __init__(self, name, argument, options):
+        self.name = name
+        self.argument = argument
+        self.options = options
+
+    def __repr__(self):
+        return f"Call({self.name!r}, {self.argument!r}, {self.options!r})"
+
+
+def parse_number(text):
+    if text.endswith("%"):
+        return float(text[:-1]) / 100
+    return float(text)
+
+
+def split_key(token):
+    """Split `income:revenue:-1` into (`income:revenue`, -1)."""
+    parts = token.split(":")
+    if len(parts) > 1 and re.fullmatch(r"-?\d+", parts[-1]):
+        return ":".join(parts[:-1]), int(parts[-1])
+    return token, 0
+
+
+def tokenize(formula):
+    tokens = []
+    position = 0
+    while position < len(formula):
+        match = _TOKEN.match(formula, position)
+        if match is None:
+            raise FormulaError(f"Unexpected character {formula[position]!r} in formula {formula!r}")
+        position = match.end()
+        kind = match.lastgroup
+        if kind == "space":
+            continue
+        if kind == "function":
+            tokens.append(("function", match.group("function_name")))
+        elif kind == "option":
+            tokens.append(("option", match.group("option_name")))
+        else:
+            tokens.append((kind, match.group(kind)))
+    return tokens
+
+
+class _Parser:
+
+    def __init__(self, formula):
+        self.formula = formula
+        self.tokens = tokenize(formula)
+        self.position = 0
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return (None, None)
+
+    def take(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def error(self, message):
+        return FormulaError(f"{message} in formula {self.formula!r}")
+
+    def parse(self):
+        if not self.tokens:
+            raise self.error("Empty expression")
+        node = self.expression()
+        if self.position != len(self.tokens):
+            raise self.error(f"Unexpected token {self.peek()[1]!r}")
+        return node
+
+    def expression(self):
+        node = self.term()
+        while self.peek() in (("op", "+"), ("op", "-")):
+            op = self.take()[1]
+            node = BinOp(op, node, self.term())
+        return node
+
+    def term(self):
+        node = self.unary()
+        while self.peek() in (("op", "*"), ("op", "/")):
+            op = self.take()[1]
+            node = BinOp(op, node, self.unary())
+        return node
+
+    def unary(self):
+        if self.peek() == ("op", "-"):
+            self.take()
+            return Neg(self.unary())
+        if self.peek() == ("op", "+"):
+            self.take()
+            return self.unary()
+        return self.power()
+
+    def power(self):
+        node = self.atom()
+        if self.peek() == ("op", "**"):
+            self.take()
+            node = BinOp("**", node, self.unary())
+        return node
+
+    def atom(self):
+        kind, text = self.take()
+        if kind == "number":
+            return Num(parse_number(text))
+        if kind == "param":
+            return Param(text[1:])
+        if kind == "key":
+            if text in _LITERALS:
+                return Num(_LITERALS[text])
+            return Ref(*split_key(text))
+        if kind == "function":
+            return self.call(text)
+        if (kind, text) == ("op", "("):
+            node = self.expression()
+            if self.take() != ("op", ")"):
+                raise self.error("Missing closing parenthesis")
+            return node
+        raise self.error("Unexpected end of expression" if kind is None else f"Unexpected token {text!r}")
+
+    def call(self, name):
+        if name not in FUNCTIONS:
+            raise self.error(f"Unknown function {name!r}")
+        argument = self.unary()
+        options = {}
+        while self.peek()[0] == "option":
+            option = self.take()[1]
+            options[option] = self.unary()
+        return Call(name, argument, options)
+
+
+def normalize(formula):
+    """Formulas may be given as strings, numbers or lists of string tokens."""
+    if isinstance(formula, (list, tuple)):
+        return " ".join(str(part) for part in formula)
+    return str(formula)
+
+
+def parse(formula):
+    """Parse a formula into its expression tree."""
+    if isinstance(formula, bool):
+        return Num(float(formula))
+    if isinstance(formula, (int, float)):
+        return Num(float(formula))
+    if formula is None:
+        return Num(None)
+    return _Parser(normalize(formula)).parse()
+
+
+def references(node):
+    """Yield every `Ref` in an expression tree."""
+    if isinstance(node, Ref):
+        yield node
+    elif isinstance(node, Neg):
+        yield from references(node.operand)
+    elif isinstance(node, BinOp):
+        yield from references(node.left)
+        yield from references(node.right)
+    elif isinstance(node, Call):
+        yield from references(node.argument)
+        for option in node.options.values():
+            yield from references(option)
+
+
+def reads(node):
+    """Yield the (key, period offset) pairs an expression reads.
+
+    `function:growth` also reads the previous period of its argument and the
+    `rate:` of `function:discount`/`function:compound` is read for every
+    period from the first forecast year up to the evaluated one.
+    """
+    if isinstance(node, Ref):
+        yield node.key, node.offset
+    elif isinstance(node, Neg):
+        yield from reads(node.operand)
+    elif isinstance(node, BinOp):
+        yield from reads(node.left)
+        yield from reads(node.right)
+    elif isinstance(node, Call):
+        for key, offset in reads(node.argument):
+            yield key, offset
+            if node.name == "growth":
+                yield key, offset - 1
+        for option in node.options.values():
+            for key, offset in reads(option):
+                yield key, offset
+                yield key, min(offset, 0) - 1
+
+
+def parameters(node):
+    """Yield the names of the `$name` parameters of an expression tree."""
+    if isinstance(node, Param):
+        yield node.name
+    elif isinstance(node, Neg):
+        yield from parameters(node.operand)
+    elif isinstance(node, BinOp):
+        yield from parameters(node.left)
+        yield from parameters(node.right)
+    elif isinstance(node, Call):
+        yield from parameters(node.argument)
+        for option in node.options.values():
+            yield from parameters(option)
+
+
+def _source(kind, text):
+    if kind == "function":
+        return f"function:{text}:"
+    if kind == "option":
+        return f"{text}:"
+    return text
+
+
+def shape(formula):
+    """Replace the literal numbers of a formula by positional parameters.
+
+    Returns the formula shape (e.g. `income:revenue * $0`) and the tuple of
+    literal values, in the order of their positions.
+    """
+    parts = []
+    literals = []
+    for kind, text in tokenize(formula):
+        if kind == "number":
+            value = parse_number(text)
+        elif kind == "key" and text in _LITERALS and text not in _FLAGS:
+            value = _LITERALS[text]
+        else:
+            parts.append(_source(kind, text))
+            continue
+        parts.append(f"${len(literals)}")
+        literals.append(value)
+    return " ".join(parts), tuple(literals)
+
+
+class Plan:
+    """A parsed formula shape together with the keys it reads."""
+    __slots__ = ("text", "node", "reads", "parameters")
+
+    def __init__(self, text, node):
+        self.text = text
+        self.node = node
+        self.reads = tuple(dict.fromkeys(reads(node)))
+        self.parameters = tuple(dict.fromkeys(parameters(node)))
+
+    def __repr__(self):
+        return f"Plan({self.text!r})"
+
+
+class Formula:
+    """A compiled formula: a shared `Plan` and the literal values bound to it."""
+    __slots__ = ("text", "plan", "literals")
+
+    def __init__(self, text, plan, literals=()):
+        self.text = text
+        self.plan = plan
+        self.literals = literals
+
+    @property
+    def node(self):
+        return self.plan.node
+
+    @property
+    def reads(self):
+        return self.plan.reads
+
+    def bind(self, params=None):
+        """Map every parameter of the plan to its value."""
+        bound = {str(position): value for position, value in enumerate(self.literals)}
+        if params:
+            bound.update(params)
+        missing = [name for name in self.plan.parameters if name not in bound]
+        if missing:
+            raise FormulaError(f"Unbound parameter ${missing[0]} in formula {self.text!r}")
+        return bound
+
+    def __repr__(self):
+        return f"Formula({self.text!r})"
+
+
+@functools.lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _plan(text):
+    return Plan(text, _Parser(text).parse())
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _compile_text(text):
+    formula_shape, literals = shape(text)
+    if not formula_shape:
+        raise FormulaError(f"Empty expression in formula {text!r}")
+    return Formula(text, _plan(formula_shape), literals)
+
+
+def compile_formula(formula):
+    """Compile a formula, reusing the result for identical formula strings
+    and the parsed plan for formulas that only differ by their numbers."""
+    if isinstance(formula, str):
+        return _compile_text(formula)
+    if isinstance(formula, (list, tuple)):
+        return _compile_text(normalize(formula))
+    if formula is None or isinstance(formula, (bool, int, float)):
+        return Formula(formula, _plan("$0"), (None if formula is None else float(formula),))
+    if hasattr(formula, "__array__"):
+        # One value per scenario (see scenarios.py)
+        return Formula(formula, _plan("$0"), (formula,))
+    return Formula(formula, Plan(formula, parse(formula)))
+
+
+def cache_info():
+    """Hit and miss statistics of the compiled formula and plan caches."""
+    return {"formulas": _compile_text.cache_info(), "plans": _plan.cache_info()}
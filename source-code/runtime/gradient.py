@@ -0,0 +1,110 @@
+"""
+    Sensitivities of a model's final value to its assumptions.
+
+    `run_gradient` returns the derivative of the final value with respect to
+    every assumption of a model, e.g. `beta`, `%market_premium`,
+    `%revenue_growth_rate` or `exit_ebitda_multiple`, from a single run of
+    the script:
+
+        gradient = run_gradient("discounted-free-cash-flow-multiple", "ACME", store)
+        gradient.value     # the final value
+        gradient.gradient  # {"beta": ..., "%discount_rate": ..., ...}
+
+    Each assumption is moved up and down by a small step in two scenarios
+    of the run (see scenarios.py), and its derivative is the central
+    difference of the final values of those scenarios. The step is moved
+    on the value the script gets for the assumption, whether it is the
+    default, computed or overridden, so what depends on it moves with it:
+    the derivative with respect to `beta` goes through the discount rate
+    the script computes from it, while the derivative with respect to
+    `%discount_rate` holds `beta` fixed.
+
+    A step never moves an assumption past its bounds (`set_bounds`): at a
+    bound, e.g. a `%revenue_growth_rate` capped at 25%, the step into the
+    bound is left out and the derivative is the one-sided difference of
+    the unmoved value and the step into the allowed range.
+
+    Every number is moved, ints included (an override such as
+    `exit_ebitda_multiple=12`, or `beta` defaulting to 1); counts of years,
+    flags and missing values have no derivative (None). The run is headless
+    (see runner.py).
+
+    © Copyright discountingcashflows.com
+"""
+
+from dataclasses import asdict, dataclass, field
+
+import numpy as np
+
+from .analysis import assumption_keys
+from .model import plain
+from .runner import execute, load_script, load_ticker
+
+STEP = 1e-5
+
+
+@dataclass
+class GradientResult:
+    """The final value of a model for one ticker and its derivatives by assumption."""
+    model: str
+    ticker: str
+    value: float = None
+    units: str = None
+    gradient: dict = field(default_factory=dict)
+    assumptions: dict = field(default_factory=dict)
+    status: str = "ok"
+    error: str = None
+    warnings: list = field(default_factory=list)
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def directions(keys, step=STEP):
+    """Scenario 0 unmoved, then each key moved up and down by `step` in scenarios 2i + 1 and 2i + 2."""
+    size = 2 * len(keys) + 1
+    result = {}
+    for index, key in enumerate(keys):
+        moves = np.zeros(size)
+        moves[2 * index + 1], moves[2 * index + 2] = step, -step
+        result[key] = moves
+    return result
+
+
+def run_gradient(model, ticker, store, keys=None, assumptions=None, step=STEP):
+    """Evaluate a model and the derivatives of its final value with respect to `keys`.
+
+    `keys` default to every assumption of the model, `assumptions` are
+    fixed overrides, and `step` is the relative size of the steps.
+    """
+    name, path, code = load_script(model)
+    keys = list(assumption_keys(path) if keys is None else keys)
+    ticker_data = load_ticker(store, ticker, path, assumptions, headless=True)
+    with np.errstate(divide="raise"):
+        # A division by zero in the script fails as it does with plain floats, instead of moving on with inf
+        run = execute(name, path, code, ticker_data, assumptions, headless=True, directions=directions(keys, step))
+    result = GradientResult(model=name, ticker=run.ticker, status=run.status, error=run.error,
+                            warnings=run.warnings)
+    if run.status != "ok":
+        return result
+    final_value = run.final_value or {}
+    values = np.broadcast_to(np.asarray(plain(final_value.get("value")), dtype=float), (2 * len(keys) + 1,))
+    result.value = plain(values[0])
+    result.units = final_value.get("units")
+    for index, key in enumerate(keys):
+        if key not in run.assumptions:
+            continue
+        moved = run.assumptions[key]
+        if not isinstance(moved, np.ndarray):
+            # Not moved: a count, a flag or a missing value
+            result.assumptions[key] = moved
+            result.gradient[key] = None
+            continue
+        up, down = 2 * index + 1, 2 * index + 2
+        result.assumptions[key] = plain(moved[0])
+        if moved[up] == moved[down]:
+            # Bounds with nothing between them
+            result.gradient[key] = None
+            continue
+        result.gradient[key] = plain((values[up] - values[down]) / (moved[up] - moved[down]))
+    return result
@@ -0,0 +1,138 @@
+"""
+    Sensitivity grids of a model's final value.
+
+    A grid varies one or two assumptions over lists of values, e.g. the
+    discount rate against the growth in perpetuity:
+
+        grid = run_grid(
+            "discounted-free-cash-flow-perpetuity", "ACME", store,
+            ("%discount_rate", ["7%", "8%", "9%"]),
+            ("%growth_in_perpetuity", ["2%", "2.5%", "3%"]),
+        )
+        grid.values  # 3 x 3 values per share
+        grid.to_table()
+
+    Every cell of the grid is a scenario of a single run of the script (see
+    scenarios.py), so the forecast, terminal value and final value are
+    computed for the whole grid by one broadcasted pass. The run is headless
+    (see runner.py): only the final value is computed.
+
+    Counts of years (`projection_years`, `high_growth_years`, ...) cannot
+    vary by scenario, as the scripts use them as period bounds: an axis of
+    counts is evaluated by one run per value, each a broadcasted run of the
+    other axis.
+
+    © Copyright discountingcashflows.com
+"""
+
+from dataclasses import asdict, dataclass, field
+
+import numpy as np
+
+from .assumptions import WINDOW_ASSUMPTIONS, is_count, parse_value
+from .model import plain
+from .runner import execute, load_script, load_ticker
+
+
+@dataclass
+class GridResult:
+    """Final values of a model over a grid of one or two assumptions."""
+    model: str
+    ticker: str
+    row_key: str
+    row_values: list
+    column_key: str = None
+    column_values: list = field(default_factory=list)
+    values: list = field(default_factory=list)
+    units: str = None
+    status: str = "ok"
+    error: str = None
+    warnings: list = field(default_factory=list)
+
+    def to_table(self):
+        """The grid as a table: one row per value of `row_key`, one column per value of `column_key`."""
+        return {
+            "title": f"{self.row_key} x {self.column_key}" if self.column_key else self.row_key,
+            "row_key": self.row_key,
+            "column_key": self.column_key,
+            "columns": self.column_values,
+            "rows": [
+                {"value": value, "values": values}
+                for value, values in zip(self.row_values, self.values)
+            ],
+            "units": self.units,
+        }
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def _axis(axis):
+    key, values = axis
+    values = [parse_value(value) for value in values]
+    if not values:
+        raise ValueError(f"No values given for {key!r}")
+    return key, values
+
+
+def _runs(key, values):
+    """(indices, override) of the runs over an axis: all of its values at once, or one run per count."""
+    if is_count(key):
+        return [([index], value) for index, value in enumerate(values)]
+    return [(list(range(len(values))), np.asarray(values, dtype=float))]
+
+
+def run_grid(model, ticker, store, rows, columns=None, assumptions=None):
+    """Evaluate a model over `rows` x `columns`, each a (key, values) pair.
+
+    `assumptions` are fixed overrides applied to every cell. Without
+    `columns` the grid has a single column.
+    """
+    row_key, row_values = _axis(rows)
+    column_key, column_values = _axis(columns) if columns is not None else (None, [None])
+    shape = (len(row_values), len(column_values))
+
+    name, path, code = load_script(model)
+    values = np.full(shape, np.nan)
+    results = []
+    # The data loaded for each value of the window assumptions
+    loaded = {}
+    for row_indices, row_value in _runs(row_key, row_values):
+        for column_indices, column_value in _runs(column_key, column_values) if column_key else [([0], None)]:
+            size = len(row_indices) * len(column_indices)
+            overrides = dict(assumptions or {})
+            overrides[row_key] = np.repeat(row_value, len(column_indices)) \
+                if isinstance(row_value, np.ndarray) else row_value
+            if column_key is not None:
+                overrides[column_key] = np.tile(column_value, len(row_indices)) \
+                    if isinstance(column_value, np.ndarray) else column_value
+            if size == 1:
+                # A single cell is an ordinary run
+                overrides = {key: value[0] if isinstance(value, np.ndarray) else value
+                             for key, value in overrides.items()}
+            window = tuple(str(overrides.get(key)) for key in WINDOW_ASSUMPTIONS)
+            if window not in loaded:
+                loaded[window] = load_ticker(store, ticker, path, overrides, headless=True)
+            result = execute(name, path, code, loaded[window], overrides, headless=True)
+            final_value = result.final_value or {}
+            cells = np.broadcast_to(np.asarray(plain(final_value.get("value")), dtype=float), (size,))
+            values[np.ix_(row_indices, column_indices)] = cells.reshape(len(row_indices), len(column_indices))
+            results.append(result)
+
+    failed = [result for result in results if result.status != "ok"]
+    warnings = []
+    for result in results:
+        warnings.extend(warning for warning in result.warnings if warning not in warnings)
+    return GridResult(
+        model=name,
+        ticker=results[0].ticker,
+        row_key=row_key,
+        row_values=row_values,
+        column_key=column_key,
+        column_values=column_values if column_key is not None else [],
+        values=[[plain(value) for value in row] for row in values],
+        units=next((result.final_value["units"] for result in results if result.final_value), None),
+        status=failed[0].status if failed else "ok",
+        error=failed[0].error if failed else None,
+        warnings=warnings,
+    )
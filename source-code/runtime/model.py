@@ -0,0 +1,110 @@
+"""
+    The `model` object injected into the model scripts.
+
+    Instead of drawing anything, every `render_*` call is recorded as
+    structured data so that it can be inspected or serialized. A headless
+    model ignores them and only keeps the final value, warnings and errors.
+
+    © Copyright discountingcashflows.com
+"""
+
+import math
+
+import numpy as np
+
+from .scenarios import tolist
+
+
+def plain(value):
+    """Convert a model value to a JSON friendly number (NaN becomes None).
+
+    Values that vary by scenario are kept as arrays (see `serializable`).
+    """
+    if value is None or isinstance(value, (bool, str)):
+        return value
+    if isinstance(value, np.ndarray) and value.ndim:
+        return value
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return value
+    return None if math.isnan(value) else value
+
+
+def serializable(value):
+    """Replace the scenario arrays nested in dicts and lists by lists."""
+    if isinstance(value, np.ndarray):
+        return tolist(value)
+    if isinstance(value, dict):
+        return {key: serializable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [serializable(item) for item in value]
+    return value
+
+
+class Model:
+    """Collects the outputs of a model run."""
+
+    def __init__(self, data, headless=False):
+        self._data = data
+        self.headless = headless
+        self.final_value = None
+        self.descriptions = []
+        self.results = []
+        self.charts = []
+        self.tables = []
+        self.warnings = []
+        self.errors = []
+
+    def render_description(self, description):
+        if self.headless:
+            return
+        if isinstance(description, dict):
+            self.descriptions.append({
+                "data": description.get("data", ""),
+                "properties": description.get("properties", {}),
+            })
+        else:
+            self.descriptions.append({"data": description, "properties": {}})
+
+    def render_results(self, rows):
+        if self.headless:
+            return
+        for row in rows:
+            value, label, units = (list(row) + [None, None, None])[:3]
+            self.results.append({"label": label, "value": plain(value), "units": units})
+
+    def _render_series(self, spec):
+        start, end = self._data.resolve_period_range(spec.get("start"), spec.get("end"))
+        return {
+            "title": spec.get("properties", {}).get("title"),
+            "periods": list(range(start, end + 1)),
+            "series": [
+                {
+                    "key": key,
+                    "label": label,
+                    "values": [value for _, value in self._data.series(key, start, end)],
+                }
+                for key, label in spec.get("data", {}).items()
+            ],
+            "properties": spec.get("properties", {}),
+        }
+
+    def render_chart(self, spec):
+        if self.headless:
+            return
+        self.charts.append(self._render_series(spec))
+
+    def render_table(self, spec):
+        if self.headless:
+            return
+        self.tables.append(self._render_series(spec))
+
+    def set_final_value(self, spec):
+        self.final_value = {"value": plain(spec.get("value")), "units": spec.get("units")}
+
+    def warn(self, message):
+        self.warnings.append(str(message))
+
+    def error(self, message):
+        self.errors.append(str(message))
@@ -0,0 +1,171 @@
+"""
+    Point-in-time fundamentals, for backtesting the models.
+
+    A point-in-time store is a fixture store (see store.py) that keeps every
+    version of the data with the date it became known:
+
+        - the records of the periodic namespaces carry the date they were
+          filed (`fillingDate`, as in the statements of the API, `filingDate`
+          or `acceptedDate`), and a period may have several records: the
+          one first filed and its restatements
+        - the scalar namespaces, in `_market.json` (`treasury`, `risk`) or in
+          a ticker file (`profile`, ...), may be lists of dated records
+          giving the history of their values
+
+            _market.json    {"treasury": [{"date": "2019-12-31", "year10": 0.0192}, ...],
+                             "risk": [{"date": "2019-12-31", "totalEquityRiskPremium": 0.052}, ...]}
+
+    `as_of` returns the store as it was known at a date, so a model values a
+    company with the data filed by then, in the latest version filed by
+    then:
+
+        store = PointInTimeStore("history")
+        for date in ("2019-03-31", "2020-03-31", "2021-03-31"):
+            run_model("discounted-free-cash-flow-perpetuity", "ACME", store.as_of(date))
+
+    Every record is indexed once by the dates of its versions, and the
+    version of a record known at a date is found by bisection, in
+    O(log versions), when a ticker is loaded: nothing is kept per date, and
+    only the fields the script reads are loaded (see analysis.py). Records
+    without a filing date are taken as known at the end of their period.
+
+    © Copyright discountingcashflows.com
+"""
+
+import bisect
+import json
+import os
+
+from .formula import PERIODIC_NAMESPACES
+from .store import MARKET_FILE, FixtureStore, TickerData
+
+FILING_FIELDS = ("fillingDate", "filingDate", "acceptedDate")
+
+
+def _known(record):
+    """The date a record became known (ISO), or "" if it has no date."""
+    for name in FILING_FIELDS:
+        if record.get(name):
+            # acceptedDate also has the time of the day
+            return str(record[name])[:10]
+    return record.get("date") or ""
+
+
+class _Versions:
+    """The versions of a record, by the date they became known."""
+
+    __slots__ = ("dates", "records")
+
+    def __init__(self):
+        self.dates = []
+        self.records = []
+
+    def add(self, date, record):
+        # After the versions known the same day, which it restates
+        index = bisect.bisect_right(self.dates, date)
+        self.dates.insert(index, date)
+        self.records.insert(index, record)
+
+    def as_of(self, date):
+        """The last version known at `date` (the last one if None), or None."""
+        if date is None:
+            return self.records[-1]
+        index = bisect.bisect_right(self.dates, date)
+        return self.records[index - 1] if index else None
+
+
+class _Index:
+    """The records of a ticker or market document by the date they became known."""
+
+    def __init__(self, document):
+        self.periodic = {}
+        self.scalars = {}
+        for namespace, value in document.items():
+            if namespace in PERIODIC_NAMESPACES:
+                periods = {}
+                for record in value or []:
+                    periods.setdefault(record.get("date") or "", _Versions()).add(_known(record), record)
+                # (period date, versions) from the oldest period to the most recent
+                self.periodic[namespace] = sorted(periods.items())
+            elif isinstance(value, list):
+                history = _Versions()
+                for record in value:
+                    history.add(record.get("date") or "", record)
+                self.scalars[namespace] = history
+            else:
+                self.scalars[namespace] = value
+
+    def document(self, date):
+        """The document as known at `date`, with the records of the periods filed by then."""
+        document = {}
+        for namespace, periods in self.periodic.items():
+            records = (versions.as_of(date) for _, versions in periods)
+            document[namespace] = [record for record in records if record is not None]
+        for namespace, value in self.scalars.items():
+            if isinstance(value, _Versions):
+                record = value.as_of(date) or {}
+                value = {name: item for name, item in record.items() if name != "date"}
+            document[namespace] = value
+        return document
+
+
+class PointInTimeStore:
+    """Directory of per-ticker JSON files with every version of their records (see the module docstring).
+
+    The data is the latest known unless the store is limited to what was
+    known at a date with `as_of`.
+    """
+
+    def __init__(self, root, date=None):
+        self.root = os.fspath(root)
+        self.date = None if date is None else str(date)
+        self._market = None
+        # path -> (version of the file, _Index), shared with the stores returned by `as_of`
+        self._indexes = {}
+
+    def __repr__(self):
+        return f"PointInTimeStore({self.root!r}, {self.date!r})"
+
+    def __getstate__(self):
+        return {"root": self.root, "date": self.date}
+
+    def __setstate__(self, state):
+        self.__init__(state["root"], state["date"])
+
+    _version = FixtureStore._version
+    tickers = FixtureStore.tickers
+
+    def as_of(self, date):
+        """The store as known at `date` (an ISO date or a `datetime.date`)."""
+        store = PointInTimeStore(self.root, date)
+        store._indexes = self._indexes
+        return store
+
+    def _index(self, path):
+        version = self._version(path)
+        cached = self._indexes.get(path)
+        if cached is None or cached[0] != version:
+            with open(path, encoding="utf-8") as file:
+                cached = self._indexes[path] = (version, _Index(json.load(file)))
+        return cached[1]
+
+    @property
+    def market(self):
+        if self._market is None:
+            path = os.path.join(self.root, MARKET_FILE)
+            self._market = self._index(path).document(self.date) if os.path.exists(path) else {}
+        return self._market
+
+    def snapshot(self, ticker):
+        """The `snapshot` a ticker would be loaded with, without loading it."""
+        return (*FixtureStore.snapshot(self, ticker), self.date)
+
+    def load(self, ticker, fields=None, history=None):
+        """Fundamentals of a ticker as known at the date of the store, limited to `fields` and `history` if given."""
+        snapshot = self.snapshot(ticker)
+        document = self._index(os.path.join(self.root, f"{ticker}.json")).document(self.date)
+        if not any(document.get(namespace) for namespace in PERIODIC_NAMESPACES):
+            raise KeyError(f"No data of {ticker!r} as of {self.date}")
+        ticker_data = TickerData.from_json(ticker, document, self.market, fields, history)
+        ticker_data.snapshot = snapshot
+        return ticker_data
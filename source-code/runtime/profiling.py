@@ -0,0 +1,244 @@
+"""
+    Opt-in profiling of model runs.
+
+    A `Profiler` given to `run_model` (or `execute`, `run_suite`,
+    `run_universe`) records a span for every call a script makes to the
+    `data`, `assumptions` and `model` objects:
+
+        profiler = Profiler()
+        run_model("discounted-free-cash-flow-perpetuity", "ACME", store, profiler=profiler)
+        profiler.write_chrome_trace("trace.json")  # open in Perfetto or chrome://tracing
+        print(profiler.format_line_profile())
+
+    A span has the call (e.g. `data.compute`), its subject (the formula,
+    the computed keys, the assumption key or the title of a chart), the
+    period range it covers, the wall time, the memory it allocated and the
+    line of the script it was called from. Memory is traced by
+    `tracemalloc` while a profiled run lasts (unless it was already
+    tracing): `allocated` is the peak of the bytes allocated since the
+    call started, so it counts the temporaries freed before it returns,
+    and `retained` the bytes still allocated when it returned. The spans of a run are nested in a span of
+    the whole run, and the spans of `data.compute` calls contain a
+    `data.compute:column` or `data.compute:row` span for each step of the
+    engine (see engine.schedule), with the keys of the step.
+
+    Only the calls made by the script are recorded, not the calls the API
+    objects make to each other.
+
+    © Copyright discountingcashflows.com
+"""
+
+import contextlib
+import json
+import linecache
+import os
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+
+API = {
+    "data": ("get", "compute", "average", "sum", "min", "max", "count", "cagr", "set_default_range"),
+    "assumptions": ("init", "get", "set", "set_bounds", "set_description"),
+    "model": ("render_description", "render_results", "render_chart", "render_table",
+              "set_final_value", "warn", "error"),
+}
+AGGREGATIONS = ("average", "sum", "min", "max", "count", "cagr")
+SUBJECT_LENGTH = 200
+
+
+@dataclass
+class Span:
+    """A call of the script to the API, or a whole run."""
+    name: str
+    subject: str
+    start: float
+    duration: float
+    allocated: int
+    retained: int
+    periods: tuple = None
+    path: str = None
+    line: int = None
+
+
+def _text(value):
+    text = value if isinstance(value, str) else repr(value)
+    text = " ".join(text.split())
+    return text if len(text) <= SUBJECT_LENGTH else text[:SUBJECT_LENGTH - 3] + "..."
+
+
+def _subject(owner, method, data, args, kwargs):
+    """Subject and period range of an API call."""
+    first = args[0] if args else None
+    if owner == "data" and method == "compute":
+        forecast = kwargs.get("forecast", args[1] if len(args) > 1 else None)
+        periods = (1, int(forecast)) if forecast else (data.first, 0)
+        return _text(", ".join(first or ())), periods
+    if owner == "data" and method in AGGREGATIONS and isinstance(first, str):
+        try:
+            _, start, end = data._range(first)
+        except Exception:
+            return _text(first), None
+        return _text(first), (start, end)
+    if owner == "data":
+        return _text(first), (0, 0) if method == "get" else None
+    if owner == "assumptions":
+        if method == "init":
+            return "", None
+        return _text(", ".join(first) if isinstance(first, dict) else first), None
+    if method in ("render_chart", "render_table") and isinstance(first, dict):
+        return _text(first.get("properties", {}).get("title") or ""), None
+    if method == "render_results":
+        return f"{len(first or ())} rows", None
+    if method == "set_final_value" and isinstance(first, dict):
+        return _text(first.get("units") or ""), None
+    return _text(first if isinstance(first, str) else ""), None
+
+
+class Profiler:
+    """Records the spans of the model runs it is attached to."""
+
+    def __init__(self):
+        self.spans = []
+        self.origin = time.perf_counter()
+        self._depth = 0
+        # Peak of the traced memory of every open span, up to the last `tracemalloc.reset_peak`
+        self._peaks = []
+
+    def _begin(self):
+        current, peak = tracemalloc.get_traced_memory()
+        self._peaks = [max(value, peak) for value in self._peaks]
+        tracemalloc.reset_peak()
+        self._peaks.append(current)
+        return current
+
+    def _end(self, start):
+        """Bytes allocated and retained since the `_begin` that returned `start`."""
+        current, peak = tracemalloc.get_traced_memory()
+        peak = max(self._peaks.pop(), peak)
+        self._peaks = [max(value, peak) for value in self._peaks]
+        return peak - start, current - start
+
+    def _line(self, path):
+        frame = sys._getframe(2)
+        while frame is not None and frame.f_code.co_filename != path:
+            frame = frame.f_back
+        return None if frame is None else frame.f_lineno
+
+    def _wrap(self, path, data, owner, method, function):
+        def profiled(*args, **kwargs):
+            if self._depth:
+                return function(*args, **kwargs)
+            line = self._line(path)
+            self._depth += 1
+            memory = self._begin()
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                duration = time.perf_counter() - start
+                allocated, retained = self._end(memory)
+                self._depth -= 1
+                subject, periods = _subject(owner, method, data, args, kwargs)
+                self.spans.append(Span(f"{owner}.{method}", subject, start - self.origin, duration,
+                                       allocated, retained, periods, path, line))
+        return profiled
+
+    def _wrap_step(self, function):
+        def profiled(step, keys, compiled, bound, start, stop):
+            mode, indices = step
+            memory = self._begin()
+            begin = time.perf_counter()
+            try:
+                return function(step, keys, compiled, bound, start, stop)
+            finally:
+                duration = time.perf_counter() - begin
+                allocated, retained = self._end(memory)
+                self.spans.append(Span(f"data.compute:{mode}", _text(", ".join(keys[index] for index in indices)),
+                                       begin - self.origin, duration, allocated, retained, (start, stop - 1)))
+        return profiled
+
+    def attach(self, path, data, model_api, assumptions_api):
+        """Record the calls made to the API objects of a run of the script at `path`."""
+        for owner, target in (("data", data), ("assumptions", assumptions_api), ("model", model_api)):
+            for method in API[owner]:
+                setattr(target, method, self._wrap(path, data, owner, method, getattr(target, method)))
+        data._compute_step = self._wrap_step(data._compute_step)
+
+    @contextlib.contextmanager
+    def run(self, model, ticker):
+        """Record a span around a run of `model` for `ticker`, tracing memory allocations while it lasts."""
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        memory = self._begin()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            allocated, retained = self._end(memory)
+            if not tracing:
+                tracemalloc.stop()
+            self.spans.append(Span("run", f"{model}/{ticker}", start - self.origin, duration, allocated, retained))
+
+    # Exports
+
+    def to_chrome_trace(self):
+        """The spans in the Chrome trace event format, also read by Perfetto."""
+        process = os.getpid()
+        events = []
+        for span in sorted(self.spans, key=lambda span: (span.start, -span.duration)):
+            args = {"subject": span.subject, "allocated": span.allocated, "retained": span.retained}
+            if span.periods is not None:
+                args["periods"] = f"{span.periods[0]}->{span.periods[1]}"
+            if span.line is not None:
+                args["line"] = f"{os.path.basename(span.path)}:{span.line}"
+            events.append({
+                "name": span.name if span.name == "run" else f"{span.name} {span.subject}"[:80],
+                "cat": span.name.split(".")[0].split(":")[0],
+                "ph": "X",
+                "ts": span.start * 1e6,
+                "dur": span.duration * 1e6,
+                "pid": process,
+                "tid": 1,
+                "args": args,
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path):
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.to_chrome_trace(), file)
+
+    def line_profile(self):
+        """Calls, seconds and bytes allocated and retained per script line, the slowest lines first."""
+        lines = {}
+        for span in self.spans:
+            if span.line is None:
+                continue
+            entry = lines.setdefault((span.path, span.line), {
+                "path": span.path,
+                "line": span.line,
+                "source": linecache.getline(span.path, span.line).strip(),
+                "calls": 0,
+                "seconds": 0.0,
+                "allocated": 0,
+                "retained": 0,
+            })
+            entry["calls"] += 1
+            entry["seconds"] += span.duration
+            entry["allocated"] += span.allocated
+            entry["retained"] += span.retained
+        return sorted(lines.values(), key=lambda entry: entry["seconds"], reverse=True)
+
+    def format_line_profile(self, limit=20):
+        """The slowest `limit` lines of `line_profile` as a text table."""
+        rows = [f"{'ms':>10s} {'calls':>7s} {'KiB':>8s}  line"]
+        for entry in self.line_profile()[:limit]:
+            location = f"{os.path.basename(entry['path'])}:{entry['line']}"
+            rows.append(f"{entry['seconds'] * 1000:10.3f} {entry['calls']:7d} {entry['allocated'] / 1024:8.1f}  "
+                        f"{location} {entry['source'][:80]}")
+        return "\n".join(rows)
+
+    def to_dict(self):
+        return {"spans": [asdict(span) for span in self.spans]}
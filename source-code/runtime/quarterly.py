@@ -0,0 +1,280 @@
+"""
+    Quarterly statements rolled into the LTM period.
+
+    A `QuarterlyStore` wraps another store and keeps, for every ticker, the
+    trailing twelve months of the quarters added to it:
+
+        store = QuarterlyStore(FixtureStore("runtime/fixtures"))
+        store.add_quarter("ACME", "2025-09-30", {
+            "income": {"revenue": 1.2e9, "netIncome": 1.1e8, ...},
+            "flow": {"operatingCashFlow": 2.1e8, "capitalExpenditure": -4e7, ...},
+            "balance": {"totalDebt": 9e8, ...},
+        })
+        run_model("discounted-free-cash-flow-perpetuity", "ACME", store)
+
+    The tickers it loads have the fiscal years of the wrapped store and an
+    LTM period (period 0) made of:
+
+        - the sum of the last four quarters for the flows of the `income`,
+          `flow` and `dividend` namespaces, e.g. `income:revenue`
+        - the average of the last four quarters for the share counts
+        - the value at the end of the last quarter for `balance` and `quote`
+
+    so the scripts read them with the same keys (`data.get("income:revenue")`
+    is the trailing revenue). A key is only rolled once four quarters of it
+    are known; until then, and when one of the four is missing, the LTM
+    value of the wrapped store is kept. A balance item reported as None, or
+    not reported, keeps its value at the end of the last quarter that
+    reported it, or else the LTM value of the wrapped store.
+
+    Once the quarters reach the end of a fiscal year after the last one of
+    the wrapped store, the fiscal years roll too: the quarter ending within
+    `CLOSE_DAYS` of the anniversary of the fiscal year end closes the year,
+    and its LTM values become a new annual period before the LTM period
+    (NaN for the keys the quarters do not report). Quarters that go past a
+    fiscal year end that none of them closes cannot be loaded (ValueError):
+    add the fiscal year to the wrapped store.
+
+    Adding a quarter updates a running sum per key, in constant time
+    whatever the length of the history, and loading a ticker only replaces
+    its last period until a fiscal year closes, so the LTM of many tickers
+    can be refreshed as often as quarters come in. The LTM values of a
+    quarter are only kept when it closes a fiscal year: one snapshot per
+    year, whatever the number of quarters. Until the end of the last fiscal
+    year of the wrapped store is known (the ticker could not be loaded from
+    it when its first quarter was added), the quarters are kept until the
+    first load.
+
+    © Copyright discountingcashflows.com
+"""
+
+import collections
+import datetime
+
+import numpy as np
+
+from .store import _number, year_fraction
+
+QUARTERS = 4
+FLOW_NAMESPACES = ("income", "flow", "dividend")
+BALANCE_NAMESPACES = ("balance", "quote")
+# Flows of shares rather than of money: averaged over the quarters
+AVERAGED = ("income:weightedAverageShsOut", "income:weightedAverageShsOutDil")
+# Days between the end of the quarter closing a fiscal year and the anniversary of the fiscal year end
+CLOSE_DAYS = 45
+
+
+class _Window:
+    """The last `QUARTERS` values of a flow and their running sum."""
+
+    __slots__ = ("values", "total", "missing")
+
+    def __init__(self):
+        self.values = collections.deque(maxlen=QUARTERS)
+        self.total = 0.0
+        self.missing = 0
+
+    def add(self, value):
+        if len(self.values) == QUARTERS:
+            oldest = self.values[0]
+            if oldest is None:
+                self.missing -= 1
+            else:
+                self.total -= oldest
+        self.values.append(value)
+        if value is None:
+            self.missing += 1
+        else:
+            self.total += value
+
+    def sum(self):
+        if len(self.values) < QUARTERS or self.missing:
+            return None
+        return self.total
+
+
+class TrailingTwelveMonths:
+    """The LTM values of one ticker, rolled forward one quarter at a time.
+
+    `fiscal_year_end` is the end of the last fiscal year before the
+    quarters (an ISO date), if known.
+    """
+
+    def __init__(self, fiscal_year_end=None):
+        self.date = None
+        self.quarters = 0
+        self._flows = {}
+        self._balances = {}
+        self.fiscal_year_end = None
+        # (date, LTM values) of the quarters closing the fiscal years after `fiscal_year_end`, one per year
+        self.closed = []
+        # Days between the last of them and the end of its fiscal year
+        self._offset = None
+        # (date, LTM values) of every quarter while `fiscal_year_end` is unknown
+        self.pending = []
+        self._anchor(fiscal_year_end)
+
+    def add(self, date, records):
+        """Add a quarter: `records` maps namespaces to `{field: value}` for the three months ending at `date`."""
+        if self.date is not None and date is not None and date <= self.date:
+            raise ValueError(f"Quarter {date} is not after {self.date}")
+        flows = {}
+        for namespace, record in records.items():
+            for field, value in record.items():
+                if field == "date":
+                    continue
+                key = f"{namespace}:{field}"
+                value = _number(value)
+                if value is not None and np.isnan(value):
+                    # A NaN would stay in the running sum after leaving the window
+                    value = None
+                if namespace in FLOW_NAMESPACES:
+                    flows[key] = value
+                elif namespace in BALANCE_NAMESPACES:
+                    if value is not None:
+                        self._balances[key] = value
+                else:
+                    raise ValueError(f"Unknown periodic namespace {namespace!r}")
+        for key in flows.keys() - self._flows.keys():
+            self._flows[key] = _Window()
+            # The quarters before the first one reporting the key are missing
+            for _ in range(min(self.quarters, QUARTERS)):
+                self._flows[key].add(None)
+        for key, window in self._flows.items():
+            window.add(flows.get(key))
+        self.date = date
+        self.quarters += 1
+        if self.fiscal_year_end is None:
+            self.pending.append((date, self.values()))
+        else:
+            self._close(date)
+
+    def values(self):
+        """The LTM value of every key that has one."""
+        values = dict(self._balances)
+        for key, window in self._flows.items():
+            total = window.sum()
+            if total is not None:
+                values[key] = total / QUARTERS if key in AVERAGED else total
+        return values
+
+    def _elapsed(self, date):
+        """Days between the end of `fiscal_year_end` and `date`, or None if one of them is not a date."""
+        try:
+            return (datetime.date.fromisoformat(date) - datetime.date.fromisoformat(self.fiscal_year_end)).days
+        except (TypeError, ValueError):
+            return None
+
+    def _anchor(self, fiscal_year_end):
+        """Count the fiscal years from `fiscal_year_end`, keeping the quarters that close one of them."""
+        quarters = self.closed + self.pending
+        try:
+            datetime.date.fromisoformat(fiscal_year_end)
+        except (TypeError, ValueError):
+            self.fiscal_year_end, self.closed, self.pending = None, [], quarters
+            return
+        self.fiscal_year_end, self.closed, self.pending, self._offset = fiscal_year_end, [], [], None
+        for date, values in quarters:
+            self._close(date, values)
+
+    def _close(self, date, values=None):
+        """Close the next fiscal year with the quarter ending at `date` if it ends within `CLOSE_DAYS` of it."""
+        elapsed = self._elapsed(date)
+        if elapsed is None:
+            return
+        year = round(elapsed / 365.25)
+        offset = abs(elapsed - year * 365.25)
+        if year < 1 or offset > CLOSE_DAYS:
+            return
+        if year == len(self.closed) + 1:
+            self.closed.append((date, self.values() if values is None else values))
+            self._offset = offset
+        elif year == len(self.closed) and offset < self._offset:
+            # A quarter ending closer to the end of the same fiscal year
+            self.closed[-1] = (date, self.values() if values is None else values)
+            self._offset = offset
+
+    def fiscal_years(self, fiscal_year_end):
+        """(date, LTM values) of the quarters closing the fiscal years after `fiscal_year_end`, oldest first."""
+        if fiscal_year_end != self.fiscal_year_end:
+            self._anchor(fiscal_year_end)
+        elapsed = self._elapsed(self.date)
+        if elapsed is None:
+            return []
+        if elapsed > (len(self.closed) + 1) * 365.25 + CLOSE_DAYS:
+            raise ValueError(f"No quarter closes the fiscal year {len(self.closed) + 1} after {fiscal_year_end}, "
+                             f"the last quarter ends at {self.date}")
+        return list(self.closed)
+
+
+class QuarterlyStore:
+    """A store whose LTM periods roll forward with the quarters added to it (see the module docstring)."""
+
+    def __init__(self, store):
+        self.store = store
+        self.trailing = {}
+
+    def __repr__(self):
+        return f"QuarterlyStore({self.store!r})"
+
+    @property
+    def market(self):
+        return self.store.market
+
+    def tickers(self):
+        return self.store.tickers()
+
+    def snapshot(self, ticker):
+        """The `snapshot` a ticker would be loaded with, without loading it."""
+        snapshot = self.store.snapshot(ticker)
+        trailing = self.trailing.get(ticker)
+        return snapshot if trailing is None else (snapshot, trailing.date, trailing.quarters)
+
+    def add_quarter(self, ticker, date, records):
+        """Add the statements of the quarter of `ticker` ending at `date` (an ISO date)."""
+        trailing = self.trailing.get(ticker)
+        if trailing is None:
+            trailing = self.trailing[ticker] = TrailingTwelveMonths(self._fiscal_year_end(ticker))
+        trailing.add(date, records)
+
+    def _fiscal_year_end(self, ticker):
+        """The end of the last fiscal year of `ticker` in the wrapped store, or None."""
+        try:
+            ticker_data = self.store.load(ticker, fields=frozenset(), history=1)
+        except (KeyError, OSError, ValueError):
+            return None
+        return ticker_data.dates[ticker_data.history - 1] if ticker_data.history else None
+
+    def load(self, ticker, fields=None, history=None):
+        """Fundamentals of a ticker from the wrapped store, with the LTM period rolled to the last quarter."""
+        ticker_data = self.store.load(ticker, fields=fields, history=history)
+        trailing = self.trailing.get(ticker)
+        if trailing is None:
+            return ticker_data
+        last = ticker_data.history
+        years = trailing.fiscal_years(ticker_data.dates[last - 1]) if last else []
+        ltm = trailing.values()
+        keys = set(ticker_data.series) if years else set()
+        keys.update(key for key in ltm if fields is None or key in fields)
+        for key in keys:
+            values = ticker_data.series.get(key)
+            # Copy: the series of a columnar store are read-only views
+            values = np.full(last + 1, np.nan) if values is None else np.array(values, dtype=float)
+            if years:
+                closed = [year.get(key, np.nan) for _, year in years]
+                values = np.concatenate((values[:last], closed, values[last:]))
+                if history is not None:
+                    values = values[-(history + 1):]
+            if key in ltm:
+                values[-1] = ltm[key]
+            ticker_data.series[key] = values
+        if trailing.date is not None:
+            dates = list(ticker_data.dates[:last]) + [date for date, _ in years] + [trailing.date]
+            if history is not None:
+                dates = dates[-(history + 1):]
+            ticker_data.dates = dates
+            ticker_data.history = len(dates) - 1
+            if ticker_data.history:
+                ticker_data.year_fraction = year_fraction(trailing.date, dates[-2])
+        ticker_data.snapshot = (ticker_data.snapshot, trailing.date, trailing.quarters)
+        return ticker_data
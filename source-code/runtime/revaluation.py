@@ -0,0 +1,156 @@
+"""
+    Change-driven revaluation: re-run only the results whose inputs changed.
+
+    The fingerprint of a result hashes everything it depends on: the source
+    of the model script, the assumption overrides, whether the run is
+    headless (a headless result has no results, charts or tables) and, of
+    the ticker's data, only what the script reads according to its read set
+    (see analysis.py), i.e. the values of the fields it reads over the
+    periods it loads, the scalars it reads, the dates and the year fraction. A
+    `FingerprintIndex` keeps the fingerprint of the last result of every
+    model and ticker, and `revalue` only executes the models whose
+    fingerprint changed:
+
+        index = FingerprintIndex("fingerprints.json")
+        with open_writer("changed.ndjson") as writer:
+            writer.write_all(revalue(list(available_models()), store, index, headless=True))
+        index.save()
+
+    A new `treasury:year10` or `risk:totalEquityRiskPremium` changes the
+    fingerprint of every result of the models that read it, for every
+    ticker, while a new dividend for one ticker only changes the ones of
+    the models reading `dividend:adjDividend`, for that ticker. Results
+    that failed are fingerprinted too, so they are not retried until their
+    inputs change; tickers that cannot be loaded are retried every time.
+
+    © Copyright discountingcashflows.com
+"""
+
+import functools
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from .analysis import analyze, union
+from .assumptions import parse_value
+from .runner import ModelResult, execute, load_script, parallel_map, resolve_model
+from .shared import SharedValues
+
+
+def source_hash(path):
+    """SHA-256 of the source of the script at `path`."""
+    return _source_hash(os.path.abspath(path), os.path.getmtime(path))
+
+
+@functools.lru_cache(maxsize=256)
+def _source_hash(path, modified):
+    with open(path, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def normalized(assumptions):
+    """Assumption overrides as canonical JSON, e.g. "2.5%" and 0.025 alike."""
+    values = {}
+    for key, value in (assumptions or {}).items():
+        value = parse_value(value)
+        values[key] = value.tolist() if isinstance(value, np.ndarray) else value
+    return json.dumps(values, sort_keys=True)
+
+
+def fingerprint(path, ticker_data, read_set, assumptions=None, headless=False):
+    """Hash of the script at `path`, the overrides, the mode and the data of `ticker_data` in `read_set`."""
+    digest = hashlib.sha256()
+    digest.update(source_hash(path).encode())
+    digest.update(normalized(assumptions).encode())
+    digest.update(b"headless" if headless else b"full")
+    periods = ticker_data.history + 1
+    if read_set.complete and read_set.history is not None:
+        periods = min(periods, read_set.history + 1)
+    for key in sorted(ticker_data.series):
+        if read_set.complete and key not in read_set.fields:
+            continue
+        digest.update(f"\n{key}\n".encode())
+        digest.update(np.asarray(ticker_data.series[key][-periods:], dtype=float).tobytes())
+    scalars = {
+        key: value for key, value in ticker_data.scalars.items()
+        if not read_set.complete or key in read_set.fields
+    }
+    digest.update(json.dumps([scalars, ticker_data.dates[-periods:], ticker_data.year_fraction, periods],
+                             sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+class FingerprintIndex:
+    """The fingerprints of the last results by model and ticker, kept in a JSON file at `path` if given."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.fingerprints = {}
+        if path is not None and os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                self.fingerprints = json.load(file)
+
+    def __len__(self):
+        return sum(len(tickers) for tickers in self.fingerprints.values())
+
+    def get(self, model, ticker):
+        return self.fingerprints.get(model, {}).get(ticker)
+
+    def set(self, model, ticker, value):
+        self.fingerprints.setdefault(model, {})[ticker] = value
+
+    def save(self):
+        """Write the index to `path`, replacing the previous file only once it is complete."""
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(self.fingerprints, file)
+        os.replace(temporary, self.path)
+
+
+def _revalue(arguments):
+    paths, ticker, store, assumptions, headless, known = arguments
+    read_sets = [analyze(path, assumptions, headless) for path in paths]
+    try:
+        ticker_data = store.load(ticker, **union(read_sets).load_arguments()).frozen()
+    except Exception as error:
+        message = f"{type(error).__name__}: {error}"
+        return [(None, ModelResult(model=_name(path), ticker=ticker, status="error", error=message))
+                for path in paths]
+    shared = SharedValues()
+    outputs = []
+    for path, read_set, previous in zip(paths, read_sets, known):
+        value = fingerprint(path, ticker_data, read_set, assumptions, headless)
+        if value != previous:
+            name, path, code = load_script(path)
+            outputs.append((value, execute(name, path, code, ticker_data, assumptions, shared=shared,
+                                           headless=headless)))
+    return outputs
+
+
+def _name(path):
+    return os.path.basename(path)[:-len(".py")]
+
+
+def revalue(model, store, index, tickers=None, assumptions=None, headless=False, workers=1):
+    """Run a model, or a list of models, for the tickers whose inputs changed since the results in `index`.
+
+    Yields the `ModelResult` of every model and ticker that was executed,
+    in the order of `tickers`, and records its fingerprint in `index`; save
+    the index once the results are stored. Each ticker is loaded once with
+    everything the models read, as in `run_suite`.
+    """
+    models = (model,) if isinstance(model, str) else tuple(model)
+    paths = tuple(resolve_model(model) for model in models)
+    if tickers is None:
+        tickers = store.tickers()
+    jobs = (
+        (paths, ticker, store, assumptions, headless, [index.get(_name(path), ticker) for path in paths])
+        for ticker in tickers
+    )
+    for outputs in (map(_revalue, jobs) if workers <= 1 else parallel_map(_revalue, jobs, workers)):
+        for value, result in outputs:
+            if value is not None:
+                index.set(result.model, result.ticker, value)
+            yield result
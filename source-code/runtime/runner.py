@@ -0,0 +1,336 @@
+"""
+    Executes the model scripts outside of the website.
+
+    The scripts under `valuations/` and `risk-analysis/` are run unmodified:
+    the runner injects the `model`, `data` and `assumptions` globals the
+    website normally provides and collects everything the script produced.
+    They are compiled from `analysis.parse`, which only reads a literal
+    `forecast=0` as a historical `data.compute` block.
+
+    Batch runs that only need the final values can run headless: the
+    `render_*` and `set_description` calls do nothing, the keys computed
+    only for the charts and tables are not computed, and only the data the
+    final value depends on is loaded.
+
+    © Copyright discountingcashflows.com
+"""
+
+import collections
+import contextlib
+import functools
+import itertools
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+
+from .analysis import analyze, parse, union
+from .assumptions import Assumptions
+from .data import Data
+from .model import Model, serializable
+from .scenarios import activate, size_of
+from .shared import SharedValues
+from .slicing import slice_script
+
+SOURCE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_DIRECTORIES = ("valuations", "risk-analysis")
+# Tickers sent to a worker at once, and chunks queued per worker
+CHUNK_SIZE = 16
+CHUNKS_PER_WORKER = 4
+# Phases of a run timed by `execute`
+PHASES = ("init", "historical", "forecast", "render", "script")
+RENDER_METHODS = ("render_description", "render_results", "render_chart", "render_table")
+
+
+def available_models():
+    """Map of model name (file name without `.py`) to script path."""
+    models = {}
+    for directory in MODEL_DIRECTORIES:
+        path = os.path.join(SOURCE_ROOT, directory)
+        for name in sorted(os.listdir(path)):
+            if name.endswith(".py"):
+                models[name[:-len(".py")]] = os.path.join(path, name)
+    return models
+
+
+def resolve_model(model):
+    """Accept either a model name or a path to a script."""
+    if os.path.exists(model):
+        return os.path.abspath(model)
+    models = available_models()
+    name = os.path.basename(model)
+    if name.endswith(".py"):
+        name = name[:-len(".py")]
+    if name not in models:
+        raise KeyError(f"Unknown model {model!r}. Available models: {', '.join(models)}")
+    return models[name]
+
+
+@dataclass
+class ModelResult:
+    """Everything a model script produced for one ticker."""
+    model: str
+    ticker: str
+    status: str = "ok"
+    final_value: dict = None
+    warnings: list = field(default_factory=list)
+    errors: list = field(default_factory=list)
+    results: list = field(default_factory=list)
+    charts: list = field(default_factory=list)
+    tables: list = field(default_factory=list)
+    descriptions: list = field(default_factory=list)
+    assumptions: dict = field(default_factory=dict)
+    output: list = field(default_factory=list)
+    error: str = None
+
+    @property
+    def value(self):
+        return None if self.final_value is None else self.final_value["value"]
+
+    def to_dict(self):
+        """The result as JSON friendly data (scenario values become lists)."""
+        return serializable(asdict(self))
+
+
+def _error_message(error, path):
+    """Describe an exception raised by a script, including the script line."""
+    line = None
+    for frame in traceback.extract_tb(error.__traceback__):
+        if frame.filename == path:
+            line = frame.lineno
+    message = f"{type(error).__name__}: {error}"
+    return message if line is None else f"{message} (line {line})"
+
+
+def load_script(model):
+    """Resolve and compile a model script, returning (name, path, code).
+
+    A script is compiled once per process, and again only once it changes,
+    so running it for many tickers only executes the code object.
+    """
+    path = resolve_model(model)
+    return os.path.basename(path)[:-len(".py")], path, _compile(path, os.path.getmtime(path))
+
+
+@functools.lru_cache(maxsize=64)
+def _compile(path, modified):
+    return compile(parse(path), path, "exec")
+
+
+def read_set(model, assumptions=None, headless=False):
+    """The store fields and periods a model script reads (see analysis.py)."""
+    return analyze(resolve_model(model), assumptions, headless)
+
+
+def load_ticker(store, ticker, path, assumptions=None, headless=False):
+    """Load only the fields and periods of a ticker that the script at `path` reads."""
+    return store.load(ticker, **analyze(path, assumptions, headless).load_arguments())
+
+
+def _timed(function, phases, phase):
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            phases[phase(*args, **kwargs) if callable(phase) else phase] += time.perf_counter() - start
+    return timed
+
+
+def _time_phases(phases, data, model_api, assumptions_api):
+    """Add the time spent in `data.compute` and the rendering calls to `phases`."""
+    data.compute = _timed(
+        data.compute, phases,
+        lambda formulas_by_key, forecast=None, params=None: "forecast" if forecast else "historical",
+    )
+    for method in RENDER_METHODS:
+        setattr(model_api, method, _timed(getattr(model_api, method), phases, "render"))
+    assumptions_api.set_description = _timed(assumptions_api.set_description, phases, "render")
+
+
+def execute(name, path, code, ticker_data, assumptions=None, memo=None, shared=None, headless=False, phases=None,
+            profiler=None, directions=None, collect=None):
+    """Execute a compiled model script against the data of one ticker.
+
+    Assumption overrides given as lists or arrays run the script once for
+    all of their scenarios (see scenarios.py). `shared` is a `SharedValues`
+    cache of LTM values shared with other models of the same ticker. A
+    `headless` run only produces the final value, warnings and errors.
+    The seconds spent in each of the `PHASES` are added to `phases`, a
+    dict, if given, and the calls of the script are recorded by
+    `profiler`, a `Profiler` (see profiling.py), if given. `directions`
+    move assumptions by a small step in some scenarios to differentiate
+    the final value (see assumptions.py and gradient.py). `collect`, if
+    given, is called with the `data` and `assumptions` of a run that
+    succeeded, to read what the script computed (see solver.py).
+    """
+    start = time.perf_counter()
+    result = ModelResult(model=name, ticker=ticker_data.ticker)
+
+    size = size_of(list((assumptions or {}).values()) + list((directions or {}).values()))
+    skip = analyze(path, assumptions, headless=True).display_only if headless else frozenset()
+    data = Data(ticker_data, memo=memo, scenarios=size, shared=shared, skip=skip)
+    model_api = Model(data, headless=headless)
+    assumptions_api = Assumptions(assumptions, headless=headless, directions=directions)
+
+    def capture(*args, sep=" ", end="\n", file=None, flush=False):
+        result.output.append(sep.join(str(arg) for arg in args))
+
+    namespace = {
+        "__name__": "__model__",
+        "__file__": path,
+        "model": model_api,
+        "data": data,
+        "assumptions": assumptions_api,
+        "print": capture,
+    }
+    if phases is not None:
+        for phase in PHASES:
+            phases.setdefault(phase, 0.0)
+        _time_phases(phases, data, model_api, assumptions_api)
+        timed = sum(phases[phase] for phase in PHASES if phase != "init")
+        phases["init"] += time.perf_counter() - start
+        start = time.perf_counter()
+    if profiler is not None:
+        profiler.attach(path, data, model_api, assumptions_api)
+    try:
+        with contextlib.ExitStack() as stack:
+            if size:
+                stack.enter_context(activate(size))
+            if profiler is not None:
+                stack.enter_context(profiler.run(name, ticker_data.ticker))
+            exec(code, namespace)
+            if collect is not None:
+                collect(data, assumptions_api)
+    except Exception as error:
+        result.status = "error"
+        result.error = _error_message(error, path)
+    if phases is not None:
+        script = time.perf_counter() - start
+        phases["script"] += script - (sum(phases[phase] for phase in PHASES if phase != "init") - timed)
+
+    result.final_value = model_api.final_value
+    result.warnings = model_api.warnings
+    result.errors = model_api.errors
+    result.results = model_api.results
+    result.charts = model_api.charts
+    result.tables = model_api.tables
+    result.descriptions = model_api.descriptions
+    result.assumptions = assumptions_api.to_dict()
+    return result
+
+
+def run_model(model, ticker, store, assumptions=None, headless=False, profiler=None, outputs=None):
+    """Run one model script for one ticker and return its `ModelResult`.
+
+    With `outputs`, only the statements that the final value
+    (`"final_value"`) and the results with these labels depend on are run
+    (see slicing.py).
+    """
+    name, path, code = load_script(model)
+    if outputs is not None:
+        # A slice reads no more than a headless run, but renders the results it is asked for
+        ticker_data = load_ticker(store, ticker, path, assumptions, headless=True)
+        return execute(name, path, slice_script(path, outputs), ticker_data, assumptions, profiler=profiler)
+    ticker_data = load_ticker(store, ticker, path, assumptions, headless)
+    return execute(name, path, code, ticker_data, assumptions, headless=headless, profiler=profiler)
+
+
+def run_suite(ticker, store, models=None, assumptions=None, shared=None, headless=False, profiler=None,
+              threads=1):
+    """Run several models (default: all of them) for one ticker, yielding a `ModelResult` per model.
+
+    The ticker is loaded once with everything the models read, into a
+    single read-only copy that every model reads and only copies the
+    columns it computes from (see data.py), and the models share a
+    `SharedValues` cache, so the LTM values they have in common (e.g. the
+    cost of capital inputs) are computed once. With `threads` > 1 the
+    models run concurrently against that copy, in a thread pool, and the
+    results are still yielded in the order of `models`.
+    """
+    if profiler is not None and threads > 1:
+        raise ValueError("A profiler cannot record the runs of several threads")
+    shared = SharedValues() if shared is None else shared
+    scripts = [load_script(model) for model in models or available_models()]
+    read_sets = union(analyze(path, assumptions, headless) for _, path, _ in scripts)
+    ticker_data = store.load(ticker, **read_sets.load_arguments()).frozen()
+
+    def run(script):
+        name, path, code = script
+        return execute(name, path, code, ticker_data, assumptions, shared=shared, headless=headless,
+                       profiler=profiler)
+
+    if threads <= 1:
+        yield from map(run, scripts)
+        return
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        yield from executor.map(run, scripts)
+
+
+def _run(arguments, profiler=None):
+    models, ticker, store, assumptions, headless, outputs = arguments
+    try:
+        if len(models) == 1:
+            return [run_model(models[0], ticker, store, assumptions, headless, profiler, outputs)]
+        return list(run_suite(ticker, store, models, assumptions, headless=headless, profiler=profiler))
+    except Exception as error:
+        # Failures outside the script itself (e.g. unreadable data)
+        message = f"{type(error).__name__}: {error}"
+        return [ModelResult(model=model, ticker=ticker, status="error", error=message) for model in models]
+
+
+def _call_chunk(function, items):
+    return [function(item) for item in items]
+
+
+def parallel_map(function, items, workers):
+    """Yield `function(item)` for every item, in order, computed by a pool of `workers` processes.
+
+    Items are sent to the workers in chunks of `CHUNK_SIZE`, and at most
+    `CHUNKS_PER_WORKER` chunks per worker are queued at a time, so `items`
+    can be a generator of any length.
+    """
+    items = iter(items)
+    chunks = iter(lambda: list(itertools.islice(items, CHUNK_SIZE)), [])
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = collections.deque(
+            executor.submit(_call_chunk, function, chunk)
+            for chunk in itertools.islice(chunks, workers * CHUNKS_PER_WORKER)
+        )
+        while pending:
+            results = pending.popleft().result()
+            for chunk in itertools.islice(chunks, 1):
+                pending.append(executor.submit(_call_chunk, function, chunk))
+            yield from results
+
+
+def run_universe(model, store, tickers=None, assumptions=None, workers=1, headless=False, profiler=None,
+                 outputs=None):
+    """Run a model, or a list of models, for many tickers, yielding one `ModelResult` per model and ticker.
+
+    Several models are run per ticker with `run_suite`. With `workers` > 1
+    the tickers are spread over a process pool and the results are yielded
+    in the order of `tickers`. Only a few chunks of tickers per worker are
+    queued at a time, so the memory used does not grow with the number of
+    tickers as long as the results are consumed (see writers.py). A
+    `profiler` can only record the runs of a single process. `outputs`
+    limit the runs of a single model to some of its outputs (see
+    `run_model`).
+    """
+    models = (model,) if isinstance(model, str) else tuple(model)
+    for name in models:
+        resolve_model(name)
+    if profiler is not None and workers > 1:
+        raise ValueError("A profiler cannot record the runs of several workers")
+    if outputs is not None and len(models) > 1:
+        raise ValueError("Outputs can only be selected for a single model")
+    if tickers is None:
+        tickers = store.tickers()
+    jobs = ((models, ticker, store, assumptions, headless, outputs) for ticker in tickers)
+    if workers <= 1:
+        for job in jobs:
+            yield from _run(job, profiler)
+        return
+    for results in parallel_map(_run, jobs, workers):
+        yield from results
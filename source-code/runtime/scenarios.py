@@ -0,0 +1,90 @@
+"""
+    Running a model for many assumption scenarios in a single pass.
+
+    An assumption override can be an array with one value per scenario.
+    `assumptions.get` then returns a `Scenarios` array, Python arithmetic on
+    it stays element-wise, and when it is interpolated into a formula
+    f-string it formats as a `$name` parameter bound to the array. The
+    formula engine broadcasts such parameters over a second (scenario) axis,
+    so the forecast, terminal value and final value of every scenario are
+    computed by one execution of the unmodified script.
+
+    In a condition, a `Scenarios` array is true if it is true for any
+    scenario, so a warning is emitted when any scenario triggers it.
+
+    © Copyright discountingcashflows.com
+"""
+
+import contextlib
+import contextvars
+
+import numpy as np
+
+_bindings = contextvars.ContextVar("scenario_bindings", default=None)
+
+
+class Scenarios(np.ndarray):
+    """One float value per scenario."""
+
+    def __new__(cls, values):
+        return np.asarray(values, dtype=float).reshape(-1).view(cls)
+
+    def __format__(self, spec):
+        bindings = _bindings.get()
+        if bindings is None or self.ndim != 1 or spec:
+            return format(np.asarray(self).tolist() if self.ndim else float(self), spec)
+        return f"${bindings.name(self)}"
+
+    def __bool__(self):
+        return bool(np.any(np.asarray(self)))
+
+
+class Bindings(dict):
+    """The `Scenarios` arrays interpolated into formulas during one run, by parameter name."""
+
+    def __init__(self, size):
+        super().__init__()
+        self.size = size
+        # Keep a reference to every bound array so that its id stays unique
+        self._names = {}
+
+    def name(self, values):
+        entry = self._names.get(id(values))
+        if entry is None:
+            name = f"scenario{len(self._names)}"
+            entry = self._names[id(values)] = (name, values)
+            self[name] = np.asarray(values)
+        return entry[0]
+
+
+@contextlib.contextmanager
+def activate(size):
+    """Activate scenario bindings for the duration of a model run."""
+    token = _bindings.set(Bindings(size))
+    try:
+        yield _bindings.get()
+    finally:
+        _bindings.reset(token)
+
+
+def current():
+    """The active `Bindings`, or None outside of a scenario run."""
+    return _bindings.get()
+
+
+def tolist(values):
+    """Convert an array of values to nested lists with None for missing values."""
+    values = np.asarray(values, dtype=float)
+    if not np.isnan(values).any():
+        return values.tolist()
+    return np.where(np.isnan(values), None, values).tolist()
+
+
+def size_of(values):
+    """Number of scenarios of the array-valued items of a mapping, or None."""
+    sizes = {np.size(value) for value in values if isinstance(value, (list, tuple, np.ndarray))}
+    if not sizes:
+        return None
+    if len(sizes) > 1:
+        raise ValueError(f"Scenario arrays must all have the same length, got {sorted(sizes)}")
+    return sizes.pop()
@@ -0,0 +1,57 @@
+"""
+    LTM values shared by the models run for the same ticker.
+
+    Several scripts start with the same blocks: the cost of equity (CAPM)
+    in every DDM and excess return model, and the whole WACC computation
+    (`cost_of_debt`, `tax_rate`, `market_cap`, `debt_weight`) in the WACC and
+    both DCF models. Those blocks only call `data.get` on the store data, so
+    `data.get` memoizes its values in a `SharedValues` cache keyed by the
+    ticker and snapshot of its data, the formula and the values bound to
+    it. When the models of a suite run with the same cache (see
+    `runner.run_suite`), each of those values is computed once per ticker.
+
+    Values are only shared for formulas that read nothing but the store
+    data: a formula reading a key that the script computes is always
+    evaluated. The cache can be used by models running in several threads.
+
+    © Copyright discountingcashflows.com
+"""
+
+import threading
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class SharedValues:
+    """Least recently used cache of `data.get` values over unmodified store data."""
+
+    def __init__(self, max_entries=65536):
+        self.max_entries = max_entries
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._values)
+
+    def get(self, key):
+        with self._lock:
+            value = self._values.get(key, MISSING)
+            if value is MISSING:
+                self.misses += 1
+            else:
+                self._values.move_to_end(key)
+                self.hits += 1
+        return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._values[key] = value
+            if len(self._values) > self.max_entries:
+                self._values.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
@@ -0,0 +1,177 @@
+"""
+    Monte Carlo simulation of a model's final value.
+
+    Assumptions are drawn from distributions instead of being fixed:
+
+        simulation = run_simulation(
+            "discounted-free-cash-flow-perpetuity", "ACME", store,
+            {
+                "%discount_rate": {"distribution": "normal", "std": "1%"},
+                "%growth_in_perpetuity": {"distribution": "triangular", "low": "1%", "high": "3.5%"},
+                "%revenue_growth_rate": {"distribution": "uniform", "low": "0%", "high": "8%"},
+            },
+            samples=100000, seed=1,
+        )
+        simulation.percentiles  # {"5": ..., "50": ..., "95": ...}
+        simulation.to_chart()
+
+    Supported distributions and their parameters:
+        - normal: mean, std
+        - lognormal: mean, std (of the value itself, not of its logarithm)
+        - uniform: low, high
+        - triangular: low, mode, high
+    `low`/`high` also truncate normal and lognormal samples. A missing `mean`
+    or `mode` defaults to the value the model computes for the assumption.
+    Distributions of assumptions that the model does not have are ignored,
+    so the same distributions can be used for every model. Counts of years
+    (`projection_years`, ...) cannot be sampled: they bound the periods of
+    the script, which are the same in every scenario.
+
+    The samples are the scenarios of a single run of the script (see
+    scenarios.py), so the forecast recurrences and terminal values are
+    evaluated as array operations over all samples at once. Runs of more
+    than `chunk_size` samples are split into several runs, all of them
+    headless (see runner.py).
+
+    The histogram covers the 0.5th to 99.5th percentiles of the values; the
+    number of samples outside of it is reported as `below` and `above`.
+
+    © Copyright discountingcashflows.com
+"""
+
+from dataclasses import asdict, dataclass, field
+
+import numpy as np
+
+from .assumptions import is_count, parse_value
+from .runner import execute, load_script, load_ticker
+
+PERCENTILES = (5, 10, 25, 50, 75, 90, 95)
+DISTRIBUTIONS = ("normal", "lognormal", "uniform", "triangular")
+HISTOGRAM_RANGE = (0.5, 99.5)
+
+
+@dataclass
+class SimulationResult:
+    """Distribution of the final value of a model for one ticker."""
+    model: str
+    ticker: str
+    samples: int
+    valid_samples: int = 0
+    mean: float = None
+    std: float = None
+    percentiles: dict = field(default_factory=dict)
+    histogram: dict = field(default_factory=dict)
+    units: str = None
+    status: str = "ok"
+    error: str = None
+    warnings: list = field(default_factory=list)
+
+    def to_chart(self, title="Distribution of the Estimated Value"):
+        """The histogram in the form `model.render_chart` records charts."""
+        edges = self.histogram.get("edges", [])
+        return {
+            "title": title,
+            "bins": [(low + high) / 2 for low, high in zip(edges[:-1], edges[1:])],
+            "series": [{"key": "frequency", "label": "Frequency", "values": self.histogram.get("counts", [])}],
+            "properties": {"title": title, "type": "bar", "units": self.units},
+        }
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def _parameter(spec, name, default=None):
+    value = parse_value(spec.get(name, default))
+    if value is None:
+        raise ValueError(f"Missing {name!r} for a {spec.get('distribution', 'normal')} distribution")
+    return value
+
+
+def sample(spec, size, generator, center=None):
+    """Draw `size` values of an assumption from its distribution spec."""
+    if not isinstance(spec, dict):
+        return np.full(size, float(parse_value(spec)))
+    distribution = spec.get("distribution", "normal")
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f"Unknown distribution {distribution!r}, expected one of {', '.join(DISTRIBUTIONS)}")
+    if distribution == "uniform":
+        return generator.uniform(_parameter(spec, "low"), _parameter(spec, "high"), size)
+    if distribution == "triangular":
+        return generator.triangular(_parameter(spec, "low"), _parameter(spec, "mode", center), _parameter(spec, "high"), size)
+    mean = _parameter(spec, "mean", center)
+    std = _parameter(spec, "std")
+    if distribution == "normal":
+        values = generator.normal(mean, std, size)
+    else:
+        # Parameters of the underlying normal distribution from the mean and std of the value
+        sigma = np.sqrt(np.log1p((std / mean) ** 2))
+        values = generator.lognormal(np.log(mean) - sigma ** 2 / 2, sigma, size)
+    low, high = parse_value(spec.get("low")), parse_value(spec.get("high"))
+    if low is not None or high is not None:
+        values = np.clip(values, -np.inf if low is None else low, np.inf if high is None else high)
+    return values
+
+
+def run_simulation(model, ticker, store, distributions, samples=100000, seed=None, assumptions=None,
+                   percentiles=PERCENTILES, bins=50, chunk_size=100000):
+    """Simulate the final value of a model for `samples` draws of the `distributions`.
+
+    `distributions` maps assumption keys to distribution specs, `assumptions`
+    are fixed overrides applied to every sample.
+    """
+    counts = [key for key in distributions if is_count(key)]
+    if counts:
+        raise ValueError(f"Counts of years cannot be sampled: {', '.join(counts)}")
+    name, path, code = load_script(model)
+    fixed = dict(assumptions or {})
+    ticker_data = load_ticker(store, ticker, path, fixed, headless=True)
+    generator = np.random.default_rng(seed)
+
+    # A point estimate gives the assumptions of the model and their computed values
+    point = execute(name, path, code, ticker_data, fixed, headless=True)
+    if point.status != "ok":
+        return SimulationResult(model=name, ticker=point.ticker, samples=samples,
+                                status=point.status, error=point.error, warnings=point.warnings)
+    centers = point.assumptions
+    distributions = {key: spec for key, spec in distributions.items() if key in centers}
+
+    values = []
+    units = None
+    warnings = []
+    for offset in range(0, samples, chunk_size):
+        size = min(chunk_size, samples - offset)
+        overrides = dict(fixed)
+        for key, spec in distributions.items():
+            overrides[key] = sample(spec, size, generator, centers[key])
+        result = execute(name, path, code, ticker_data, overrides, headless=True)
+        if result.status != "ok":
+            return SimulationResult(model=name, ticker=result.ticker, samples=samples,
+                                    status=result.status, error=result.error, warnings=result.warnings)
+        final_value = result.final_value or {}
+        units = final_value.get("units")
+        warnings.extend(warning for warning in result.warnings if warning not in warnings)
+        value = np.asarray(final_value.get("value"), dtype=float)
+        values.append(np.broadcast_to(value, (size,)))
+
+    values = np.concatenate(values) if values else np.empty(0)
+    values = values[np.isfinite(values)]
+    simulation = SimulationResult(model=name, ticker=ticker_data.ticker, samples=samples,
+                                  valid_samples=int(values.size), units=units, warnings=warnings)
+    if values.size:
+        # Keep extreme samples (e.g. a discount rate close to the growth rate) out of the bins
+        low, high = np.percentile(values, HISTOGRAM_RANGE)
+        counts, edges = np.histogram(values, bins=bins, range=(low, high) if high > low else None)
+        simulation.mean = float(values.mean())
+        simulation.std = float(values.std())
+        simulation.percentiles = {
+            str(percentile): float(value)
+            for percentile, value in zip(percentiles, np.percentile(values, percentiles))
+        }
+        simulation.histogram = {
+            "edges": edges.tolist(),
+            "counts": counts.tolist(),
+            "below": int((values < edges[0]).sum()),
+            "above": int((values > edges[-1]).sum()),
+        }
+    return simulation
@@ -0,0 +1,259 @@
+"""
+    Program slices of the model scripts: only the statements some outputs need.
+
+    `slice_script` compiles the part of a script that the requested outputs
+    depend on, the final value (`FINAL_VALUE`) and/or rows of
+    `model.render_results` by label:
+
+        code = slice_script(path, {FINAL_VALUE, "Enterprise Value"})
+        run_model("discounted-free-cash-flow-perpetuity", "ACME", store, outputs={"final_value"})
+
+    The slice is found by walking the top-level statements backwards from
+    the outputs and keeping the statements that define something a kept
+    statement uses: names of the script, keys of `data.compute` blocks (read
+    by the formulas, resolved as in analysis.py) and assumptions set with
+    `assumptions.set` or `set_bounds`. The `data.compute` blocks only keep
+    the keys the slice reads and `model.render_results` only the requested
+    rows, so e.g. the final value of discounted-free-cash-flow-perpetuity
+    neither computes the informational margins nor the CAGRs of the results.
+    The charts, tables, descriptions and printed output are left out.
+
+    What cannot be resolved statically is kept: a formula that cannot be
+    resolved reads every computed key. The `assumptions.init`,
+    `data.set_default_range`, `model.warn` and `model.error` calls and the
+    `raise` statements are always kept, with what they depend on, so a
+    slice warns and fails as the script does, except for failures in the
+    statements it leaves out. Compound statements (`if`, `for`, ...) are
+    kept or left out as a whole.
+
+    © Copyright discountingcashflows.com
+"""
+
+import ast
+import copy
+import functools
+import os
+
+from .analysis import AGGREGATIONS, _Analyzer, _is_call, _Unknown, parse
+
+FINAL_VALUE = "final_value"
+# A computed key or an assumption that cannot be resolved statically
+ANY = None
+GLOBALS = ("data", "assumptions", "model")
+
+
+class _Statement:
+    """What a top-level statement defines, uses and outputs."""
+
+    def __init__(self, node):
+        self.node = node
+        self.defines = set()
+        self.kills = set()
+        self.uses = set()
+        # Ordered as in the script
+        self.outputs = {}
+        self.critical = False
+
+
+class _Slicer:
+
+    def __init__(self, tree):
+        self.analyzer = _Analyzer(tree, {})
+        self.statements = [self.effects(node) for node in tree.body]
+
+    def _key(self, node):
+        try:
+            return self.analyzer.value(node)
+        except _Unknown:
+            return ANY
+
+    def _reads(self, reads):
+        return {("key", key) for key, _ in reads}
+
+    def effects(self, node):
+        statement = _Statement(node)
+        if isinstance(node, ast.Assign) and all(isinstance(target, ast.Name) for target in node.targets):
+            statement.kills = {("name", target.id) for target in node.targets}
+        for child in ast.walk(node):
+            if isinstance(child, ast.Name):
+                if isinstance(child.ctx, ast.Load) and child.id not in GLOBALS:
+                    statement.uses.add(("name", child.id))
+                elif not isinstance(child.ctx, ast.Load):
+                    statement.defines.add(("name", child.id))
+            elif isinstance(child, ast.AugAssign) and isinstance(child.target, ast.Name):
+                statement.uses.add(("name", child.target.id))
+            elif isinstance(child, (ast.FunctionDef, ast.ClassDef)):
+                statement.defines.add(("name", child.name))
+            elif isinstance(child, (ast.Import, ast.ImportFrom)):
+                statement.defines.update(("name", (alias.asname or alias.name).split(".")[0])
+                                         for alias in child.names)
+            elif isinstance(child, ast.Raise):
+                statement.critical = True
+            elif isinstance(child, ast.Call):
+                self._call(child, statement)
+            elif isinstance(child, ast.Attribute) and isinstance(child.value, ast.Name) \
+                    and child.value.id in GLOBALS and not isinstance(child.ctx, ast.Load):
+                statement.critical = True
+        return statement
+
+    def _call(self, node, statement):
+        if _is_call(node, "data", ("get",) + AGGREGATIONS):
+            try:
+                if _is_call(node, "data", ("get",)):
+                    statement.uses |= self._reads(self.analyzer._formula(node.args[0]))
+                else:
+                    statement.uses |= self._reads(self.analyzer._range(node.args[0])[0])
+            except (_Unknown, IndexError):
+                statement.uses.add(("key", ANY))
+        elif _is_call(node, "data", ("compute",)):
+            block = node.args[0] if node.args else None
+            if not isinstance(block, ast.Dict) or any(key is None for key in block.keys):
+                statement.defines.add(("key", ANY))
+                statement.uses.add(("key", ANY))
+                return
+            for key, formula in zip(block.keys, block.values):
+                statement.defines.add(("key", self._key(key)))
+                try:
+                    statement.uses |= self._reads(self.analyzer._formula(formula))
+                except _Unknown:
+                    statement.uses.add(("key", ANY))
+        elif _is_call(node, "assumptions", ("get",)):
+            statement.uses.add(("assumption", self._key(node.args[0]) if node.args else ANY))
+        elif _is_call(node, "assumptions", ("set", "set_bounds")):
+            statement.defines.add(("assumption", self._key(node.args[0]) if node.args else ANY))
+        elif _is_call(node, "assumptions", ("init",)) or _is_call(node, "data", ("set_default_range",)) \
+                or _is_call(node, "model", ("warn", "error")):
+            statement.critical = True
+        elif _is_call(node, "model", ("set_final_value",)):
+            statement.outputs[FINAL_VALUE] = None
+        elif _is_call(node, "model", ("render_results",)):
+            statement.outputs.update(dict.fromkeys(label for label, _ in self._rows(node)))
+        elif isinstance(node.func, ast.Attribute) and isinstance(node.func.value, ast.Name) \
+                and node.func.value.id in ("data", "assumptions") \
+                and node.func.attr not in ("set_description",):
+            # An API call the slice does not know about
+            statement.critical = True
+
+    def _rows(self, node):
+        """(label, row) of the rows of a `render_results` call, with a None label if it is not static."""
+        rows = node.args[0] if node.args else None
+        if not isinstance(rows, (ast.List, ast.Tuple)):
+            return [(None, rows)]
+        labels = []
+        for row in rows.elts:
+            label = None
+            if isinstance(row, (ast.List, ast.Tuple)) and len(row.elts) > 1 \
+                    and isinstance(row.elts[1], ast.Constant):
+                label = row.elts[1].value
+            labels.append((label, row))
+        return labels
+
+    def outputs(self):
+        outputs = []
+        for statement in self.statements:
+            outputs.extend(output for output in statement.outputs if output is not None)
+        return tuple(dict.fromkeys(outputs))
+
+    # Slice
+
+    @staticmethod
+    def _live(defines, live):
+        for kind, key in defines:
+            if kind == "name":
+                if (kind, key) in live:
+                    return True
+            elif key is ANY and any(other == kind for other, _ in live) \
+                    or (kind, key) in live or (kind, ANY) in live:
+                return True
+        return False
+
+    def slice(self, outputs):
+        live = set()
+        body = []
+        for statement in reversed(self.statements):
+            requested = outputs.intersection(statement.outputs)
+            if None in statement.outputs:
+                # Results whose labels are not static may be any of the requested ones
+                requested = requested or outputs - {FINAL_VALUE}
+            if not (statement.critical or requested or self._live(statement.defines, live)):
+                continue
+            node = self._prune(statement.node, outputs, live)
+            if node is not statement.node:
+                statement = self.effects(node)
+            body.append(node)
+            live -= statement.kills
+            live |= statement.uses
+        body.reverse()
+        return ast.Module(body=body, type_ignores=[])
+
+    def _prune(self, node, outputs, live):
+        """The top-level `data.compute` or `render_results` call `node` with only what the slice needs."""
+        if not isinstance(node, ast.Expr):
+            return node
+        call = node.value
+        if _is_call(call, "model", ("render_results",)):
+            rows = self._rows(call)
+            if any(label is None for label, _ in rows):
+                return node
+            call = copy.copy(call)
+            call.args = [copy.copy(call.args[0])] + call.args[1:]
+            call.args[0].elts = [row for label, row in rows if label in outputs]
+            return ast.Expr(value=call, lineno=node.lineno, col_offset=node.col_offset,
+                            end_lineno=node.end_lineno, end_col_offset=node.end_col_offset)
+        if not _is_call(call, "data", ("compute",)) or ("key", ANY) in live:
+            return node
+        block = call.args[0] if call.args else None
+        if not isinstance(block, ast.Dict) or any(key is None for key in block.keys):
+            return node
+        keys = [self._key(key) for key in block.keys]
+        if ANY in keys:
+            return node
+        reads = {}
+        for key, formula in zip(keys, block.values):
+            try:
+                reads.setdefault(key, set()).update(key for key, _ in self.analyzer._formula(formula))
+            except _Unknown:
+                return node
+        # The keys the slice reads, and the keys of the block they are computed from
+        needed = {key for key in keys if ("key", key) in live}
+        pending = list(needed)
+        while pending:
+            for read in reads.get(pending.pop(), ()):
+                if read in reads and read not in needed:
+                    needed.add(read)
+                    pending.append(read)
+        block = copy.copy(block)
+        block.keys, block.values = [], []
+        for key, (key_node, formula) in zip(keys, zip(call.args[0].keys, call.args[0].values)):
+            if key in needed:
+                block.keys.append(key_node)
+                block.values.append(formula)
+        call = copy.copy(call)
+        call.args = [block] + call.args[1:]
+        return ast.Expr(value=call, lineno=node.lineno, col_offset=node.col_offset,
+                        end_lineno=node.end_lineno, end_col_offset=node.end_col_offset)
+
+
+def script_outputs(path):
+    """The outputs of the script at `path` a slice can be asked for: `FINAL_VALUE` and the result labels."""
+    return _script_outputs(os.path.abspath(path), os.path.getmtime(path))
+
+
+@functools.lru_cache(maxsize=64)
+def _script_outputs(path, modified):
+    return _Slicer(parse(path)).outputs()
+
+
+def slice_script(path, outputs):
+    """The code object of the statements of the script at `path` that `outputs` depend on."""
+    outputs = frozenset(outputs)
+    unknown = outputs - set(script_outputs(path))
+    if unknown:
+        raise KeyError(f"Unknown outputs {sorted(unknown)} of {os.path.basename(path)}. "
+                       f"Available outputs: {', '.join(script_outputs(path)) or 'none'}")
+    return _slice_script(os.path.abspath(path), os.path.getmtime(path), outputs)
+
+
+@functools.lru_cache(maxsize=256)
+def _slice_script(path, modified, outputs):
+    return compile(_Slicer(parse(path)).slice(outputs), path, "exec")
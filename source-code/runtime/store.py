@@ -0,0 +1,361 @@
+"""
+    On-disk fundamentals store used by the local runtime.
+
+    A fixture store is a directory with one JSON file per ticker and an
+    optional `_market.json` with the values shared by every ticker:
+
+        fixtures/
+            _market.json    {"treasury": {"year10": 0.042}, "risk": {...}}
+            AAPL.json       {"profile": {...}, "ratio": {...},
+                             "income": [{...}, ...], "balance": [...], ...}
+
+    Periodic namespaces (`income`, `balance`, `flow`, `dividend`, `quote`) are
+    lists of records ordered from the oldest to the most recent. The last
+    record is period 0 (LTM) and the ones before it are periods -1, -2, ...
+    Lists of different lengths are aligned on their last record.
+
+    Scalar namespaces (`profile`, `ratio`, `treasury`, `risk`) are plain
+    objects. A ticker file may override any of the market namespaces.
+
+    A fixture store can be converted into a columnar store, which keeps one
+    float64 matrix of tickers x periods per `namespace:field` in `.npy`
+    files that are memory-mapped when opened (see `ColumnarStore`).
+
+    © Copyright discountingcashflows.com
+"""
+
+import datetime
+import json
+import os
+
+import numpy as np
+
+from .formula import PERIODIC_NAMESPACES, SCALAR_NAMESPACES
+
+MARKET_FILE = "_market.json"
+INDEX_FILE = "index.json"
+
+
+class TickerData:
+    """Fundamentals of a single ticker, aligned on a common period axis.
+
+    `series` maps `namespace:field` to a list (or float64 array) of values
+    for the periods `-history .. 0` and `scalars` maps `namespace:field` to a
+    single value. `dates` lists the ISO date of every period, if known.
+    `year_fraction` is the fraction of a year between the LTM date and the
+    next fiscal year end, which is used by `continuous:true` discounting.
+    `snapshot` is a hashable identifier of the data the ticker was loaded
+    from; it changes when that data changes.
+    """
+
+    def __init__(self, ticker, series, scalars, history, year_fraction=1.0, dates=None, snapshot=None):
+        self.ticker = ticker
+        self.series = series
+        self.scalars = scalars
+        self.history = history
+        self.year_fraction = year_fraction
+        self.dates = dates if dates is not None else [None] * (history + 1)
+        # Identifies the version of the data the ticker was loaded from
+        self.snapshot = snapshot
+
+    @classmethod
+    def from_json(cls, ticker, document, market=None, fields=None, history=None):
+        """Build from a ticker document; `fields` and `history` limit the
+        `namespace:field` keys and the number of periods before the LTM
+        period that are kept."""
+        namespaces = dict(market or {})
+        namespaces.update(document)
+
+        available = 0
+        for namespace in PERIODIC_NAMESPACES:
+            available = max(available, len(namespaces.get(namespace) or []) - 1)
+        history = available if history is None else min(history, available)
+
+        series = {}
+        dates = [None] * (history + 1)
+        for namespace in PERIODIC_NAMESPACES:
+            records = (namespaces.get(namespace) or [])[-(history + 1):]
+            padding = [None] * (history + 1 - len(records))
+            for period, record in enumerate(records, start=len(padding)):
+                if dates[period] is None:
+                    dates[period] = record.get("date")
+            names = []
+            for record in records:
+                names.extend(name for name in record if name not in names)
+            for name in names:
+                key = f"{namespace}:{name}"
+                if name == "date" or fields is not None and key not in fields:
+                    continue
+                series[key] = padding + [_number(record.get(name)) for record in records]
+
+        scalars = {}
+        for namespace in SCALAR_NAMESPACES:
+            for name, value in (namespaces.get(namespace) or {}).items():
+                key = f"{namespace}:{name}"
+                if fields is None or key in fields:
+                    scalars[key] = _number(value)
+
+        year_fraction = _year_fraction(namespaces.get("income") or [])
+        return cls(ticker, series, scalars, history, year_fraction, dates)
+
+    def frozen(self):
+        """A copy whose series are read-only float64 arrays, shared by the runs of several models (see data.py)."""
+        series = {}
+        for key, values in self.series.items():
+            # A view, so that the arrays of this object stay writable
+            values = series[key] = np.asarray(values, dtype=float).view()
+            values.flags.writeable = False
+        return TickerData(self.ticker, series, self.scalars, self.history, self.year_fraction, self.dates,
+                          self.snapshot)
+
+
+def _number(value):
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _year_fraction(records):
+    """Fraction of a year from the LTM date to the next fiscal year end."""
+    if len(records) < 2:
+        return 1.0
+    return year_fraction(records[-1].get("date"), records[-2].get("date"))
+
+
+def year_fraction(ltm_date, fiscal_year_end):
+    """Fraction of a year from `ltm_date` to the fiscal year end after `fiscal_year_end` (ISO dates)."""
+    try:
+        ltm = datetime.date.fromisoformat(ltm_date)
+        fiscal_year_end = datetime.date.fromisoformat(fiscal_year_end)
+    except (TypeError, ValueError):
+        return 1.0
+    elapsed = (ltm - fiscal_year_end).days / 365.25
+    if elapsed <= 0 or elapsed >= 1:
+        return 1.0
+    return 1.0 - elapsed
+
+
+class FixtureStore:
+    """Directory of per-ticker JSON files."""
+
+    def __init__(self, root):
+        self.root = os.fspath(root)
+        self._market = None
+
+    def __repr__(self):
+        return f"FixtureStore({self.root!r})"
+
+    def __getstate__(self):
+        return {"root": self.root}
+
+    def __setstate__(self, state):
+        self.__init__(state["root"])
+
+    @property
+    def market(self):
+        if self._market is None:
+            path = os.path.join(self.root, MARKET_FILE)
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as file:
+                    self._market = json.load(file)
+            else:
+                self._market = {}
+        return self._market
+
+    def _version(self, path):
+        stat = os.stat(path) if os.path.exists(path) else None
+        return None if stat is None else (stat.st_mtime_ns, stat.st_size)
+
+    def tickers(self):
+        return sorted(
+            name[:-len(".json")] for name in os.listdir(self.root)
+            if name.endswith(".json") and name != MARKET_FILE
+        )
+
+    def snapshot(self, ticker):
+        """The `snapshot` a ticker would be loaded with, without loading it."""
+        path = os.path.join(self.root, f"{ticker}.json")
+        if not os.path.exists(path):
+            raise KeyError(f"Ticker {ticker!r} not found in {self.root}")
+        return (self.root, ticker, self._version(path), self._version(os.path.join(self.root, MARKET_FILE)))
+
+    def load(self, ticker, fields=None, history=None):
+        """Fundamentals of a ticker, limited to `fields` and `history` periods if given."""
+        snapshot = self.snapshot(ticker)
+        with open(os.path.join(self.root, f"{ticker}.json"), encoding="utf-8") as file:
+            document = json.load(file)
+        ticker_data = TickerData.from_json(ticker, document, self.market, fields, history)
+        ticker_data.snapshot = snapshot
+        return ticker_data
+
+
+class ColumnarStore:
+    """Memory-mapped columnar fundamentals, written by `write_columnar_store`.
+
+        columnar/
+            index.json              tickers, fields and the period axis
+            _market.json            market values shared by every ticker
+            history.npy             int32 (tickers,) periods before the LTM
+            year_fraction.npy       float64 (tickers,)
+            dates.npy               datetime64[D] (tickers, periods)
+            scalars.npy             float64 (tickers, scalar fields)
+            income.revenue.npy      float64 (tickers, periods), one file per field
+            ...
+
+    The period axis is right-aligned: the last column of every matrix is the
+    LTM period of each ticker and missing values are NaN. The matrices are
+    opened with `mmap_mode="r"` the first time a field is read, so opening
+    the store reads nothing but the index and worker processes share the
+    pages of the operating system cache instead of holding private copies.
+    """
+
+    def __init__(self, root):
+        self.root = os.fspath(root)
+        with open(os.path.join(self.root, INDEX_FILE), encoding="utf-8") as file:
+            index = json.load(file)
+        self.periods = index["periods"]
+        self.fields = index["fields"]
+        self.scalar_fields = index["scalars"]
+        self._tickers = index["tickers"]
+        self._version = os.stat(os.path.join(self.root, INDEX_FILE)).st_mtime_ns
+        self._rows = {ticker: row for row, ticker in enumerate(self._tickers)}
+        self._arrays = {}
+        self._market = None
+
+    def __repr__(self):
+        return f"ColumnarStore({self.root!r})"
+
+    def __getstate__(self):
+        return {"root": self.root}
+
+    def __setstate__(self, state):
+        self.__init__(state["root"])
+
+    def array(self, name):
+        """The memory-mapped matrix of a field (`income:revenue`) or of `history`, `scalars`, ..."""
+        values = self._arrays.get(name)
+        if values is None:
+            path = os.path.join(self.root, f"{name.replace(':', '.')}.npy")
+            values = self._arrays[name] = np.load(path, mmap_mode="r")
+        return values
+
+    market = FixtureStore.market
+
+    def tickers(self):
+        return list(self._tickers)
+
+    def snapshot(self, ticker):
+        """The `snapshot` a ticker would be loaded with, without loading it."""
+        if ticker not in self._rows:
+            raise KeyError(f"Ticker {ticker!r} not found in {self.root}")
+        return (self.root, ticker, self._version)
+
+    def load(self, ticker, fields=None, history=None):
+        """Fundamentals of a ticker, limited to `fields` and `history` periods if given.
+
+        Only the matrices of the requested fields are opened.
+        """
+        row = self._rows.get(ticker)
+        if row is None:
+            raise KeyError(f"Ticker {ticker!r} not found in {self.root}")
+        available = int(self.array("history")[row])
+        history = available if history is None else min(history, available)
+        first = self.periods - 1 - history
+        series = {
+            field: self.array(field)[row, first:]
+            for field in (self.fields if fields is None else [field for field in self.fields if field in fields])
+        }
+
+        scalars = {}
+        for namespace in SCALAR_NAMESPACES:
+            for field, value in (self.market.get(namespace) or {}).items():
+                scalars[f"{namespace}:{field}"] = _number(value)
+        values = self.array("scalars")[row]
+        for column, field in enumerate(self.scalar_fields):
+            if values[column] == values[column]:
+                scalars[field] = float(values[column])
+        if fields is not None:
+            scalars = {key: value for key, value in scalars.items() if key in fields}
+
+        dates = [None if np.isnat(date) else str(date) for date in self.array("dates")[row, first:]]
+        return TickerData(ticker, series, scalars, history, float(self.array("year_fraction")[row]), dates,
+                          snapshot=self.snapshot(ticker))
+
+
+def write_columnar_store(source, root, tickers=None):
+    """Convert the tickers of a store (e.g. a `FixtureStore`) into a `ColumnarStore` at `root`.
+
+    The source is read twice, once to find the fields and the length of the
+    period axis and once to fill the matrices, so that no more than one
+    ticker is held in memory. The index is written last.
+    """
+    tickers = list(source.tickers() if tickers is None else tickers)
+    os.makedirs(root, exist_ok=True)
+
+    market = {
+        f"{namespace}:{field}": _number(value)
+        for namespace in SCALAR_NAMESPACES
+        for field, value in (source.market.get(namespace) or {}).items()
+    }
+    fields = {}
+    scalar_fields = {}
+    periods = 1
+    for ticker in tickers:
+        ticker_data = source.load(ticker)
+        periods = max(periods, ticker_data.history + 1)
+        fields.update(dict.fromkeys(ticker_data.series))
+        # Market values are stored once, in _market.json, unless a ticker overrides them
+        scalar_fields.update(dict.fromkeys(
+            key for key, value in ticker_data.scalars.items() if key not in market or value != market[key]
+        ))
+
+    def create(name, dtype, shape, fill):
+        path = os.path.join(root, f"{name.replace(':', '.')}.npy")
+        values = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+        values[...] = fill
+        return values
+
+    matrices = {field: create(field, np.float64, (len(tickers), periods), np.nan) for field in fields}
+    history = create("history", np.int32, (len(tickers),), 0)
+    year_fraction = create("year_fraction", np.float64, (len(tickers),), 1.0)
+    dates = create("dates", "datetime64[D]", (len(tickers), periods), np.datetime64("NaT"))
+    scalars = create("scalars", np.float64, (len(tickers), len(scalar_fields)), np.nan)
+    scalar_columns = {field: column for column, field in enumerate(scalar_fields)}
+
+    for row, ticker in enumerate(tickers):
+        ticker_data = source.load(ticker)
+        first = periods - 1 - ticker_data.history
+        history[row] = ticker_data.history
+        year_fraction[row] = ticker_data.year_fraction
+        dates[row, first:] = [np.datetime64("NaT") if date is None else np.datetime64(date, "D")
+                              for date in ticker_data.dates]
+        for field, values in ticker_data.series.items():
+            matrices[field][row, first:] = np.array(values, dtype=float)
+        for field, value in ticker_data.scalars.items():
+            if field in scalar_columns and value is not None:
+                scalars[row, scalar_columns[field]] = value
+
+    for values in (*matrices.values(), history, year_fraction, dates, scalars):
+        values.flush()
+    with open(os.path.join(root, MARKET_FILE), "w", encoding="utf-8") as file:
+        json.dump(source.market, file)
+    with open(os.path.join(root, INDEX_FILE), "w", encoding="utf-8") as file:
+        json.dump({
+            "periods": periods,
+            "tickers": tickers,
+            "fields": list(fields),
+            "scalars": list(scalar_fields),
+        }, file)
+    return ColumnarStore(root)
+
+
+def open_store(root):
+    """Open a `ColumnarStore` if `root` has an index, a `FixtureStore` otherwise."""
+    if os.path.exists(os.path.join(root, INDEX_FILE)):
+        return ColumnarStore(root)
+    return FixtureStore(root)
@@ -0,0 +1,12 @@
+import os
+
+import pytest
+
+from runtime import FixtureStore
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(__file__)), "fixtures")
+
+
+@pytest.fixture
+def store():
+    return FixtureStore(FIXTURES)
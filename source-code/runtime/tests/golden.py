@@ -0,0 +1,39 @@
+"""
+    Final values of every model for the fixture tickers, as computed by the
+    reference run of the scripts. None for the models without a final value
+    and the runs that fail (the dividend models for NOVA, which pays none).
+
+    © Copyright discountingcashflows.com
+"""
+
+FINAL_VALUES = {
+    ("annual-margin-report", "ACME"): None,
+    ("annual-margin-report", "NOVA"): None,
+    ("benjamin-grahams-number", "ACME"): 63.47184201276899,
+    ("benjamin-grahams-number", "NOVA"): 36.639498344877865,
+    ("capital-asset-pricing-model", "ACME"): 0.08482,
+    ("capital-asset-pricing-model", "NOVA"): 0.1046,
+    ("discounted-free-cash-flow-multiple", "ACME"): 64.20347986272833,
+    ("discounted-free-cash-flow-multiple", "NOVA"): 118.21666457921077,
+    ("discounted-free-cash-flow-perpetuity", "ACME"): 137.95149035334003,
+    ("discounted-free-cash-flow-perpetuity", "NOVA"): 87.10055833214619,
+    ("discounted-future-market-cap", "ACME"): 37.20232732913811,
+    ("discounted-future-market-cap", "NOVA"): 90.9870492479402,
+    ("return-on-invested-capital-roic", "ACME"): 0.11829146868977355,
+    ("return-on-invested-capital-roic", "NOVA"): 0.0893567711273263,
+    ("simple-dividend-discount-model", "ACME"): 37.119811244523355,
+    ("simple-dividend-discount-model", "NOVA"): None,
+    ("simple-excess-return-model", "ACME"): 82.11808913291023,
+    ("simple-excess-return-model", "NOVA"): 36.978024245190404,
+    ("two-stage-dividend-discount-model", "ACME"): 71.69316522188561,
+    ("two-stage-dividend-discount-model", "NOVA"): None,
+    ("two-stage-excess-return-model", "ACME"): 87.60961371657785,
+    ("two-stage-excess-return-model", "NOVA"): 41.68601282088841,
+    ("weighted-average-cost-of-capital", "ACME"): 0.06643092214556509,
+    ("weighted-average-cost-of-capital", "NOVA"): 0.0902914684564855,
+}
+
+
+def final_value(result):
+    """The final value of a `ModelResult`, or None."""
+    return (result.final_value or {}).get("value")
@@ -0,0 +1,125 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from runtime import FixtureStore, ResultCache
+from runtime import cache as cache_module
+from runtime.runner import resolve_model
+
+from .conftest import FIXTURES
+
+MODEL = "discounted-free-cash-flow-perpetuity"
+
+
+@pytest.fixture
+def root(tmp_path):
+    shutil.copytree(FIXTURES, tmp_path / "fixtures")
+    return tmp_path / "fixtures"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(tmp_path / "cache")
+
+
+@pytest.fixture
+def runs(monkeypatch):
+    """The (models, ticker) of every run that was not answered from the cache."""
+    calls = []
+
+    def counted(arguments):
+        calls.append((arguments[0], arguments[1]))
+        return run(arguments)
+
+    run = cache_module._run
+    monkeypatch.setattr(cache_module, "_run", counted)
+    return calls
+
+
+def entries(cache):
+    return sorted(entry.name for entry in cache._entries())
+
+
+def test_hit(root, cache, runs):
+    store = FixtureStore(root)
+    result = cache.run_model(MODEL, "ACME", store)
+    assert cache.run_model(MODEL, "ACME", store).to_dict() == result.to_dict()
+    assert runs == [((MODEL,), "ACME")]
+    assert len(entries(cache)) == 1
+
+
+def test_new_script(root, tmp_path, cache, runs):
+    store = FixtureStore(root)
+    path = tmp_path / f"{MODEL}.py"
+    shutil.copy(resolve_model(MODEL), path)
+    cache.run_model(str(path), "ACME", store)
+    with open(path, "a", encoding="utf-8") as file:
+        file.write("\n# A new version\n")
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 10 ** 9))
+    cache.run_model(str(path), "ACME", store)
+    assert len(runs) == 2
+
+
+def test_new_data(root, cache, runs):
+    cache.run_model(MODEL, "ACME", FixtureStore(root))
+    path = os.path.join(root, "ACME.json")
+    with open(path, encoding="utf-8") as file:
+        document = json.load(file)
+    document["profile"]["beta"] = 1.5
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(document, file)
+    cache.run_model(MODEL, "ACME", FixtureStore(root))
+    assert len(runs) == 2
+
+
+def test_overrides(root, cache, runs):
+    store = FixtureStore(root)
+    cache.run_model(MODEL, "ACME", store, {"%growth_in_perpetuity": 0.025})
+    cache.run_model(MODEL, "ACME", store, {"%growth_in_perpetuity": "2.5%"})
+    assert len(runs) == 1
+    cache.run_model(MODEL, "ACME", store, {"%growth_in_perpetuity": "3%"})
+    cache.run_model(MODEL, "ACME", store)
+    assert len(runs) == 3
+
+
+def test_headless_and_outputs_are_separate(root, cache, runs):
+    store = FixtureStore(root)
+    full = cache.run_model(MODEL, "ACME", store)
+    headless = cache.run_model(MODEL, "ACME", store, headless=True)
+    sliced = cache.run_model(MODEL, "ACME", store, outputs=["final_value"])
+    assert len(runs) == 3 and len(entries(cache)) == 3
+    assert full.charts and not headless.charts
+    assert headless.value == pytest.approx(full.value) and sliced.value == pytest.approx(full.value)
+    assert cache.run_model(MODEL, "ACME", store).charts
+    assert len(runs) == 3
+
+
+def test_failures_and_scenarios_are_not_stored(root, cache, runs):
+    store = FixtureStore(root)
+    # NOVA pays no dividends
+    assert cache.run_model("simple-dividend-discount-model", "NOVA", store).status == "error"
+    result = cache.run_model(MODEL, "ACME", store, {"%growth_in_perpetuity": [0.02, 0.03]})
+    assert result.status == "ok"
+    assert entries(cache) == []
+    # The failed run runs again
+    cache.run_model("simple-dividend-discount-model", "NOVA", store)
+    assert len(runs) == 3
+
+
+def test_least_recently_used_are_evicted(root, tmp_path):
+    result = ResultCache(tmp_path / "sizing").run_model(MODEL, "ACME", FixtureStore(root))
+    size = len(json.dumps(result.to_dict()).encode())
+    cache = ResultCache(tmp_path / "cache", max_bytes=2.5 * size)
+    first, second, third = ("ab" * 32), ("cd" * 32), ("ef" * 32)
+    cache.put(first, result)
+    cache.put(second, result)
+    # Order the results explicitly, then use the first one again
+    os.utime(cache._path(first), ns=(10 ** 18, 10 ** 18))
+    os.utime(cache._path(second), ns=(11 * 10 ** 17, 11 * 10 ** 17))
+    assert cache.get(first) is not None
+    cache.put(third, result)
+    assert cache.get(second) is None
+    assert cache.get(first) is not None and cache.get(third) is not None
+    assert cache.size <= 2.5 * size
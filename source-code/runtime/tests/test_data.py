@@ -0,0 +1,29 @@
+import ast
+
+import numpy as np
+
+from runtime import Data, read_set
+from runtime.analysis import parse
+from runtime.runner import resolve_model
+
+
+def test_forecast_of_no_periods(store):
+    ticker_data = store.load("ACME")
+    data = Data(ticker_data)
+    history = np.array(ticker_data.series["income:revenue"], dtype=float)
+    data.compute({"income:revenue": "income:revenue:-1 * (1 + 0.05)"}, forecast=0)
+    np.testing.assert_array_equal(data.columns["income:revenue"], history)
+    assert data.last == 0
+
+
+def test_historical_block(store):
+    data = Data(store.load("ACME"))
+    data.compute({"#double": "income:revenue * 2"})
+    assert data.get("#double") == 2 * data.get("income:revenue")
+
+
+def test_literal_forecast_of_zero_is_historical():
+    source = ast.unparse(parse(resolve_model("simple-dividend-discount-model")))
+    assert "forecast=0" not in source
+    # The projection_years=0 overrides read no forecast periods
+    assert read_set("discounted-free-cash-flow-perpetuity", {"projection_years": 0}).forecast == 0
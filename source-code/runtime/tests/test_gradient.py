@@ -0,0 +1,45 @@
+import pytest
+
+from runtime import run_gradient, run_model
+
+from .golden import FINAL_VALUES, final_value
+
+MODEL = "discounted-free-cash-flow-perpetuity"
+STEP = 1e-5
+
+
+def value_at(store, key, value):
+    return final_value(run_model(MODEL, "ACME", store, {key: value}))
+
+
+def test_gradient(store):
+    gradient = run_gradient(MODEL, "ACME", store)
+    assert gradient.value == pytest.approx(FINAL_VALUES[MODEL, "ACME"], rel=1e-9)
+    assert gradient.gradient["projection_years"] is None
+    rate = gradient.assumptions["%discount_rate"]
+    central = (value_at(store, "%discount_rate", rate + STEP) - value_at(store, "%discount_rate", rate - STEP)) \
+        / (2 * STEP)
+    assert gradient.gradient["%discount_rate"] == pytest.approx(central, rel=1e-6)
+
+
+@pytest.mark.parametrize("rate, moved", [(0.25, -STEP), (0.0, STEP)])
+def test_one_sided_at_a_bound(store, rate, moved):
+    # %revenue_growth_rate is bounded to [0%, 25%]
+    gradient = run_gradient(MODEL, "ACME", store, assumptions={"%revenue_growth_rate": rate})
+    assert gradient.status == "ok"
+    key = "%revenue_growth_rate"
+    one_sided = (value_at(store, key, rate + moved) - value_at(store, key, rate)) / moved
+    assert gradient.gradient[key] == pytest.approx(one_sided, rel=1e-6)
+
+
+def test_int_values_are_moved(store):
+    model = "discounted-free-cash-flow-multiple"
+    gradient = run_gradient(model, "ACME", store, assumptions={"exit_ebitda_multiple": "12", "beta": 1})
+    assert gradient.status == "ok"
+    for key, value in (("beta", 1.0), ("exit_ebitda_multiple", 12.0)):
+        assumptions = {"exit_ebitda_multiple": 12, "beta": 1, key: value + STEP}
+        up = final_value(run_model(model, "ACME", store, assumptions))
+        assumptions[key] = value - STEP
+        down = final_value(run_model(model, "ACME", store, assumptions))
+        assert gradient.gradient[key] == pytest.approx((up - down) / (2 * STEP), rel=1e-6)
+    assert gradient.gradient["projection_years"] is None
@@ -0,0 +1,37 @@
+import pytest
+
+from runtime import run_grid, run_model
+
+from .golden import final_value
+
+MODEL = "discounted-free-cash-flow-perpetuity"
+DISCOUNT_RATES = ["7%", "8%", "9%"]
+
+
+def run_cells(model, store, rows, columns):
+    (row_key, row_values), (column_key, column_values) = rows, columns
+    return [
+        [final_value(run_model(model, "ACME", store, {row_key: row, column_key: column})) for column in column_values]
+        for row in row_values
+    ]
+
+
+@pytest.mark.parametrize("model, rows, columns", [
+    (MODEL, ("%discount_rate", DISCOUNT_RATES), ("%growth_in_perpetuity", ["2%", "2.5%", "3%"])),
+    (MODEL, ("projection_years", [3, 5, 7]), ("%discount_rate", DISCOUNT_RATES)),
+    (MODEL, ("%discount_rate", DISCOUNT_RATES), ("historical_years", [5, 10])),
+    ("two-stage-dividend-discount-model", ("high_growth_years", [3, 5]), ("%discount_rate", DISCOUNT_RATES)),
+    ("discounted-free-cash-flow-multiple", ("projection_years", [4, 6]), ("historical_years", [6, 8])),
+])
+def test_grid_equals_a_run_per_cell(store, model, rows, columns):
+    grid = run_grid(model, "ACME", store, rows, columns)
+    assert grid.status == "ok", grid.error
+    assert grid.units == "$"
+    expected = run_cells(model, store, rows, columns)
+    for row, expected_row in zip(grid.values, expected):
+        assert row == pytest.approx(expected_row, rel=1e-9)
+
+
+def test_single_column(store):
+    grid = run_grid(MODEL, "ACME", store, ("projection_years", [5]))
+    assert grid.values == [[pytest.approx(final_value(run_model(MODEL, "ACME", store)), rel=1e-9)]]
@@ -0,0 +1,18 @@
+import pytest
+
+from runtime import run_model
+
+from .golden import FINAL_VALUES, final_value
+
+
+@pytest.mark.parametrize("model, ticker", sorted(FINAL_VALUES))
+def test_headless_final_value(store, model, ticker):
+    result = run_model(model, ticker, store, headless=True)
+    full = run_model(model, ticker, store)
+    assert result.status == full.status
+    assert final_value(result) == pytest.approx(FINAL_VALUES[model, ticker], rel=1e-9)
+
+
+def test_headless_skips_the_presentation(store):
+    result = run_model("discounted-free-cash-flow-perpetuity", "ACME", store, headless=True)
+    assert not result.charts and not result.tables
@@ -0,0 +1,62 @@
+import json
+import math
+import os
+
+import pytest
+
+from runtime import PointInTimeStore, run_model
+from runtime.__main__ import main
+
+HISTORY = os.path.join(os.path.dirname(__file__), "history")
+# The 2020 EPS of 2.0 is restated to 1.5 in a filing of 2021-08-02
+RESTATED = "2021-08-02"
+
+
+@pytest.fixture
+def history():
+    return PointInTimeStore(HISTORY)
+
+
+def test_before_the_restatement(history):
+    ticker_data = history.as_of("2021-03-31").load("PAST")
+    assert ticker_data.series["income:eps"] == [1.8, 2.0]
+    assert ticker_data.scalars["treasury:year10"] == 0.0093
+    assert ticker_data.scalars["risk:totalEquityRiskPremium"] == 0.0472
+
+
+def test_after_the_restatement(history):
+    for date in (RESTATED, "2021-09-30"):
+        ticker_data = history.as_of(date).load("PAST")
+        assert ticker_data.series["income:eps"] == [1.8, 1.5]
+        assert ticker_data.series["income:revenue"] == [1000.0, 1050.0]
+        assert ticker_data.scalars["treasury:year10"] == 0.0147
+    assert history.as_of("2021-08-01").load("PAST").series["income:eps"] == [1.8, 2.0]
+
+
+def test_latest(history):
+    ticker_data = history.load("PAST")
+    assert ticker_data.series["income:eps"] == [1.8, 1.5, 2.2]
+    assert ticker_data.scalars["treasury:year10"] == 0.0152
+    assert ticker_data.scalars["risk:totalEquityRiskPremium"] == 0.0424
+    assert history.as_of("2022-03-31").load("PAST").series == ticker_data.series
+
+
+def test_nothing_filed_yet(history):
+    with pytest.raises(KeyError):
+        history.as_of("2019-06-30").load("PAST")
+
+
+def test_models(history):
+    before = run_model("benjamin-grahams-number", "PAST", history.as_of("2021-03-31"))
+    after = run_model("benjamin-grahams-number", "PAST", history.as_of("2021-09-30"))
+    assert before.value == pytest.approx(math.sqrt(22.5 * 2.0 * 16))
+    assert after.value == pytest.approx(math.sqrt(22.5 * 1.5 * 16))
+
+
+def test_as_of_option(capsys):
+    values = {}
+    for date in ("2021-03-31", "2021-09-30"):
+        assert main(["capital-asset-pricing-model", "PAST", "--store", HISTORY, "--as-of", date, "--headless"]) == 0
+        values[date] = json.loads(capsys.readouterr().out)["final_value"]["value"]
+    assert values["2021-03-31"] == pytest.approx(0.0093 + 1.1 * 0.0472)
+    assert values["2021-09-30"] == pytest.approx(0.0147 + 1.1 * 0.0472)
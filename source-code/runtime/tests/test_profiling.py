@@ -0,0 +1,35 @@
+import tracemalloc
+
+from runtime import Profiler, run_model
+
+MODEL = "discounted-free-cash-flow-perpetuity"
+
+
+def test_spans(store):
+    profiler = Profiler()
+    run_model(MODEL, "ACME", store, profiler=profiler)
+    names = {span.name for span in profiler.spans}
+    assert {"run", "data.compute", "data.get", "model.set_final_value"} <= names
+    assert all(span.allocated >= max(span.retained, 0) for span in profiler.spans)
+    assert sum(entry["allocated"] for entry in profiler.line_profile()) > 0
+
+
+def test_temporaries_are_counted():
+    profiler = Profiler()
+    with profiler.run(MODEL, "ACME"):
+        temporary = bytearray(1 << 20)
+        del temporary
+    span, = profiler.spans
+    assert span.allocated >= 1 << 20
+    assert span.retained < 1 << 16
+
+
+def test_tracing_only_while_profiling(store):
+    run_model(MODEL, "ACME", store, profiler=Profiler())
+    assert not tracemalloc.is_tracing()
+    tracemalloc.start()
+    try:
+        run_model(MODEL, "ACME", store, profiler=Profiler())
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
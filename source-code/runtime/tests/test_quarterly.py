@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from runtime import QuarterlyStore, run_model
+from runtime.quarterly import TrailingTwelveMonths
+
+from .golden import FINAL_VALUES, final_value
+
+QUARTERS = ["2024-12-31", "2025-03-31", "2025-06-30", "2025-09-30", "2025-12-31", "2026-03-31"]
+
+
+def quarter(revenue, total_debt=9e8):
+    return {"income": {"revenue": revenue}, "balance": {"totalDebt": total_debt}}
+
+
+@pytest.fixture
+def quarterly(store):
+    return QuarterlyStore(store)
+
+
+def test_without_quarters(quarterly):
+    model = "discounted-free-cash-flow-perpetuity"
+    assert final_value(run_model(model, "ACME", quarterly)) == pytest.approx(FINAL_VALUES[model, "ACME"], rel=1e-9)
+
+
+def test_trailing_sum(store, quarterly):
+    for index, date in enumerate(QUARTERS[:4]):
+        quarterly.add_quarter("ACME", date, quarter(1e9 * (index + 1)))
+    ticker_data = quarterly.load("ACME")
+    fiscal_years = store.load("ACME")
+    assert ticker_data.dates == fiscal_years.dates[:-1] + ["2025-09-30"]
+    assert ticker_data.series["income:revenue"][-1] == 1e10
+    np.testing.assert_array_equal(ticker_data.series["income:revenue"][:-1],
+                                  np.array(fiscal_years.series["income:revenue"][:-1], dtype=float))
+    assert ticker_data.year_fraction == pytest.approx(0.25, abs=0.01)
+
+
+def test_fiscal_year_rolls(store, quarterly):
+    for index, date in enumerate(QUARTERS[:5]):
+        quarterly.add_quarter("ACME", date, quarter(1e9 * (index + 1)))
+    history = store.load("ACME").history
+    ticker_data = quarterly.load("ACME")
+    assert ticker_data.history == history + 1
+    assert ticker_data.dates[-3:] == ["2024-12-31", "2025-12-31", "2025-12-31"]
+    assert list(ticker_data.series["income:revenue"][-2:]) == [1.4e10, 1.4e10]
+    assert ticker_data.year_fraction == 1.0
+
+    quarterly.add_quarter("ACME", QUARTERS[5], quarter(6e9))
+    ticker_data = quarterly.load("ACME", history=4)
+    assert ticker_data.history == 4
+    assert ticker_data.dates[-3:] == ["2024-12-31", "2025-12-31", "2026-03-31"]
+    assert list(ticker_data.series["income:revenue"][-2:]) == [1.4e10, 1.8e10]
+    assert ticker_data.year_fraction == pytest.approx(0.75, abs=0.01)
+    # Keys the quarters do not report are unknown for the new fiscal year
+    assert np.isnan(ticker_data.series["income:netIncome"][-2])
+    assert run_model("discounted-free-cash-flow-perpetuity", "ACME", quarterly).status == "ok"
+
+
+def test_quarter_closing_the_fiscal_year_is_required(quarterly):
+    for date in QUARTERS[:4] + QUARTERS[5:]:
+        quarterly.add_quarter("ACME", date, quarter(1e9))
+    with pytest.raises(ValueError, match="No quarter closes"):
+        quarterly.load("ACME")
+
+
+def test_balance_reported_as_none(quarterly):
+    quarterly.add_quarter("ACME", QUARTERS[0], quarter(1e9, total_debt=8e8))
+    quarterly.add_quarter("ACME", QUARTERS[1], quarter(1e9, total_debt=None))
+    assert quarterly.load("ACME").series["balance:totalDebt"][-1] == 8e8
+
+
+def test_only_closing_quarters_are_kept(quarterly):
+    dates = [f"{year}-{month}" for year in (2025, 2026, 2027) for month in ("03-31", "06-30", "09-30", "12-31")]
+    for date in dates:
+        quarterly.add_quarter("ACME", date, quarter(1e9))
+    trailing = quarterly.trailing["ACME"]
+    assert [date for date, _ in trailing.closed] == ["2025-12-31", "2026-12-31", "2027-12-31"]
+    assert trailing.pending == []
+    assert quarterly.load("ACME").dates[-4:] == ["2025-12-31", "2026-12-31", "2027-12-31", "2027-12-31"]
+
+
+def test_fiscal_year_end_known_later():
+    trailing = TrailingTwelveMonths()
+    for date in QUARTERS[1:]:
+        trailing.add(date, quarter(1e9))
+    assert len(trailing.pending) == 5
+    assert [date for date, _ in trailing.fiscal_years("2024-12-31")] == ["2025-12-31"]
+    assert trailing.pending == []
+    # The wrapped store now has the fiscal year 2025
+    assert trailing.fiscal_years("2025-12-31") == []
@@ -0,0 +1,69 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from runtime import FingerprintIndex, FixtureStore, available_models, read_set, revalue
+
+from .conftest import FIXTURES
+
+MODELS = sorted(available_models())
+
+
+@pytest.fixture
+def root(tmp_path):
+    shutil.copytree(FIXTURES, tmp_path / "fixtures")
+    return tmp_path / "fixtures"
+
+
+def rewrite(path, change):
+    with open(path, encoding="utf-8") as file:
+        document = json.load(file)
+    change(document)
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(document, file)
+
+
+def ran(results):
+    return sorted((result.model, result.ticker) for result in results)
+
+
+def readers(field, tickers=("ACME", "NOVA"), headless=False):
+    models = [model for model in MODELS if field in read_set(model, headless=headless).fields]
+    return sorted((model, ticker) for model in models for ticker in tickers)
+
+
+def test_unchanged_inputs_are_not_run(root, tmp_path):
+    index = FingerprintIndex(str(tmp_path / "fingerprints.json"))
+    assert len(ran(revalue(MODELS, FixtureStore(root), index))) == 2 * len(MODELS)
+    index.save()
+    index = FingerprintIndex(str(tmp_path / "fingerprints.json"))
+    assert len(index) == 2 * len(MODELS)
+    assert ran(revalue(MODELS, FixtureStore(root), index)) == []
+
+
+def test_new_treasury_yield(root):
+    index = FingerprintIndex()
+    list(revalue(MODELS, FixtureStore(root), index, headless=True))
+    rewrite(os.path.join(root, "_market.json"), lambda document: document["treasury"].update(year10=0.05))
+    results = list(revalue(MODELS, FixtureStore(root), index, headless=True))
+    assert ran(results) == readers("treasury:year10", headless=True)
+    assert {"capital-asset-pricing-model", "discounted-free-cash-flow-perpetuity"} <= {model for model, _ in ran(results)}
+
+
+def test_new_dividend(root):
+    index = FingerprintIndex()
+    list(revalue(MODELS, FixtureStore(root), index))
+    rewrite(os.path.join(root, "ACME.json"), lambda document: document["dividend"][-1].update(adjDividend=2.5))
+    results = list(revalue(MODELS, FixtureStore(root), index))
+    assert ran(results) == readers("dividend:adjDividend", tickers=("ACME",))
+    assert ("simple-dividend-discount-model", "ACME") in ran(results)
+
+
+def test_headless_results_are_not_full_results(root):
+    index = FingerprintIndex()
+    list(revalue(MODELS, FixtureStore(root), index, headless=True))
+    results = list(revalue(MODELS, FixtureStore(root), index))
+    assert len(results) == 2 * len(MODELS)
+    assert any(result.results for result in results)
@@ -0,0 +1,41 @@
+import pytest
+
+from runtime import available_models, run_model, run_suite, run_universe
+
+from .golden import FINAL_VALUES, final_value
+
+
+def test_available_models():
+    assert sorted(available_models()) == sorted({model for model, _ in FINAL_VALUES})
+
+
+@pytest.mark.parametrize("model, ticker", sorted(FINAL_VALUES))
+def test_final_value(store, model, ticker):
+    result = run_model(model, ticker, store)
+    expected = FINAL_VALUES[model, ticker]
+    if expected is None and result.status == "error":
+        assert "does not currently pay dividends" in result.error
+    else:
+        assert result.status == "ok", result.error
+        assert final_value(result) == pytest.approx(expected, rel=1e-9)
+
+
+def test_run_universe(store):
+    results = list(run_universe("discounted-free-cash-flow-perpetuity", store))
+    assert [result.ticker for result in results] == ["ACME", "NOVA"]
+    for result in results:
+        assert final_value(result) == pytest.approx(FINAL_VALUES[result.model, result.ticker], rel=1e-9)
+
+
+@pytest.mark.parametrize("ticker", ["ACME", "NOVA"])
+def test_run_suite_threads(store, ticker):
+    models = sorted(available_models())
+    results = list(run_suite(ticker, store, models=models, threads=4))
+    assert [result.model for result in results] == models
+    for result in results:
+        assert final_value(result) == pytest.approx(FINAL_VALUES[result.model, ticker], rel=1e-9)
+
+
+def test_unknown_model():
+    with pytest.raises(KeyError):
+        run_model("no-such-model", "ACME", None)
@@ -0,0 +1,32 @@
+import pytest
+
+from runtime import Session, run_model
+
+from .golden import FINAL_VALUES, final_value
+
+MODELS = sorted({model for (model, ticker), value in FINAL_VALUES.items() if ticker == "ACME" and value is not None})
+CHANGES = [{"beta": 1.3}, {"%discount_rate": "9%"}, {"projection_years": 7}, {"beta": None}]
+
+
+@pytest.mark.parametrize("headless", [False, True])
+@pytest.mark.parametrize("model", MODELS)
+def test_update(store, model, headless):
+    session = Session(model, "ACME", store, headless=headless)
+    assert final_value(session.run()) == pytest.approx(FINAL_VALUES[model, "ACME"], rel=1e-9)
+    assumptions = {}
+    for changes in CHANGES:
+        result = session.update(changes)
+        assumptions = {key: value for key, value in {**assumptions, **changes}.items() if value is not None}
+        expected = run_model(model, "ACME", store, assumptions)
+        assert result.status == expected.status
+        assert final_value(result) == pytest.approx(final_value(expected), rel=1e-9)
+        if not headless:
+            assert result.results == expected.results
+
+
+def test_update_recomputes_the_discounting(store):
+    session = Session("discounted-free-cash-flow-perpetuity", "ACME", store)
+    session.run()
+    session.update({"beta": 1.3})
+    assert "discountedFreeCashFlow" in session.memo.recomputed
+    assert "income:revenue" not in session.memo.recomputed
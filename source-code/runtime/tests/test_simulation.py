@@ -0,0 +1,16 @@
+import pytest
+
+from runtime import run_simulation
+
+
+def test_simulation(store):
+    simulation = run_simulation("discounted-free-cash-flow-perpetuity", "ACME", store,
+                                {"%discount_rate": {"distribution": "normal", "std": "1%"}}, samples=1000, seed=1)
+    assert simulation.status == "ok"
+    assert simulation.valid_samples == 1000
+
+
+def test_counts_of_years_are_rejected(store):
+    with pytest.raises(ValueError, match="projection_years"):
+        run_simulation("discounted-free-cash-flow-perpetuity", "ACME", store,
+                       {"projection_years": {"distribution": "uniform", "low": 3, "high": 7}})
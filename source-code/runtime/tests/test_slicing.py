@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+from runtime import run_model
+from runtime.__main__ import main
+from runtime.runner import resolve_model
+from runtime.slicing import FINAL_VALUE, script_outputs
+
+from .conftest import FIXTURES
+from .golden import FINAL_VALUES, final_value
+
+MODEL = "discounted-free-cash-flow-perpetuity"
+
+
+@pytest.mark.parametrize("model, ticker", sorted(FINAL_VALUES))
+def test_final_value_slice(store, model, ticker):
+    if FINAL_VALUE not in script_outputs(resolve_model(model)):
+        pytest.skip("no final value")
+    result = run_model(model, ticker, store, outputs={FINAL_VALUE})
+    assert result.status == run_model(model, ticker, store).status
+    assert final_value(result) == pytest.approx(FINAL_VALUES[model, ticker], rel=1e-9)
+
+
+@pytest.mark.parametrize("label", script_outputs(resolve_model(MODEL))[1:])
+def test_result_slice(store, label):
+    full = {row["label"]: row for row in run_model(MODEL, "ACME", store).results}
+    result = run_model(MODEL, "ACME", store, outputs={label})
+    assert result.results == [full[label]]
+    assert result.final_value is None
+
+
+def test_unknown_output(store):
+    with pytest.raises(KeyError, match="Available outputs"):
+        run_model(MODEL, "ACME", store, outputs={"Nothing"})
+
+
+def test_only(capsys):
+    assert main([MODEL, "ACME", "NOVA", "--store", FIXTURES, "--only", FINAL_VALUE]) == 0
+    results = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [result["final_value"]["value"] for result in results] == pytest.approx(
+        [FINAL_VALUES[MODEL, "ACME"], FINAL_VALUES[MODEL, "NOVA"]], rel=1e-9)
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from runtime import implied_discount_rates, run_model, solve
+from runtime.solver import SEGMENTS, find_roots
+
+from .golden import final_value
+
+MODEL = "discounted-free-cash-flow-perpetuity"
+
+
+@pytest.mark.parametrize("ticker", ["ACME", "NOVA"])
+@pytest.mark.parametrize("key", ["%discount_rate", "%growth_in_perpetuity", "%revenue_growth_rate"])
+def test_solve(store, ticker, key):
+    result = solve(MODEL, ticker, store, key)
+    assert result.status == "ok", result.error
+    assert result.target == store.load(ticker).scalars["profile:price"]
+    assert final_value(run_model(MODEL, ticker, store, {key: result.value})) == pytest.approx(result.target, rel=1e-6)
+
+
+def test_number_target(store):
+    result = solve(MODEL, "ACME", store, "%discount_rate", target=100)
+    assert final_value(run_model(MODEL, "ACME", store, {"%discount_rate": result.value})) == pytest.approx(100, rel=1e-6)
+
+
+@pytest.mark.parametrize("model", SEGMENTS)
+def test_implied_discount_rates(store, model):
+    rates = implied_discount_rates(model, store, tickers=["ACME", "NOVA"])
+    assert rates.shape == (2,)
+    for ticker, rate in zip(["ACME", "NOVA"], rates):
+        expected = solve(model, ticker, store, "%discount_rate").value
+        if expected is None:
+            assert np.isnan(rate)
+        else:
+            assert rate == pytest.approx(expected, rel=1e-6)
+            value = final_value(run_model(model, ticker, store, {"%discount_rate": rate}))
+            assert value == pytest.approx(store.load(ticker).scalars["profile:price"], rel=1e-6)
+
+
+def test_implied_discount_rates_without_dividends(store):
+    # NOVA pays no dividends
+    rates = implied_discount_rates("simple-dividend-discount-model", store, tickers=["NOVA"])
+    assert np.isnan(rates[0])
+
+
+def test_implied_discount_rates_of_other_models(store):
+    rates = implied_discount_rates(MODEL, store, tickers=["ACME"], target=100)
+    assert rates[0] == pytest.approx(solve(MODEL, "ACME", store, "%discount_rate", target=100).value)
+
+
+def test_find_roots_next_to_a_pole():
+    def residuals(x, rows, slopes=False):
+        values = 1 / (x - poles[rows]) - targets[rows, None]
+        return (values, -1 / (x - poles[rows]) ** 2) if slopes else values
+
+    poles, targets = np.array([[0.1], [0.2], [0.3]]), np.array([1000.0, 10.0, -1e6])
+    roots, residuals_at_roots, _, _ = find_roots(residuals, np.full(3, -0.5), 0.5, poles=poles)
+    assert roots == pytest.approx(poles[:, 0] + 1 / targets, rel=1e-6)
+    assert np.all(np.abs(residuals_at_roots) <= 1e-6 * np.abs(targets))
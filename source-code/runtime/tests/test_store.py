@@ -0,0 +1,26 @@
+import pytest
+
+from runtime import ColumnarStore, FixtureStore, open_store, run_model, write_columnar_store
+
+from .conftest import FIXTURES
+from .golden import FINAL_VALUES, final_value
+
+
+@pytest.fixture(scope="module")
+def columnar_root(tmp_path_factory):
+    root = tmp_path_factory.mktemp("columnar")
+    write_columnar_store(FixtureStore(FIXTURES), root)
+    return root
+
+
+def test_open_store(columnar_root):
+    store = open_store(str(columnar_root))
+    assert isinstance(store, ColumnarStore)
+    assert sorted(store.tickers()) == ["ACME", "NOVA"]
+
+
+@pytest.mark.parametrize("model, ticker", sorted(FINAL_VALUES))
+def test_columnar_final_value(columnar_root, model, ticker):
+    result = run_model(model, ticker, ColumnarStore(columnar_root))
+    assert result.status == run_model(model, ticker, FixtureStore(FIXTURES)).status
+    assert final_value(result) == pytest.approx(FINAL_VALUES[model, ticker], rel=1e-9)
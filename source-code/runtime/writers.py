@@ -0,0 +1,150 @@
+"""
+    Streaming writers of batch results.
+
+    A writer stores one record per model and ticker as the results are
+    produced, so a universe run never holds more than a batch of them:
+
+        with open_writer("results.parquet") as writer:
+            writer.write_all(run_universe(list(available_models()), store, headless=True))
+
+    A record holds the final value and units set by `model.set_final_value`,
+    the rows of every `model.render_results` call and the warnings and
+    errors of the run:
+
+        {"model": "...", "ticker": "ACME", "status": "ok", "value": 137.95,
+         "units": "$", "results": [{"label": "...", "value": ..., "units": "$"}],
+         "warnings": [], "errors": [], "error": null}
+
+    `NDJSONWriter` appends one JSON line per record. `ParquetWriter` buffers
+    `row_group_size` records and writes them as one row group of a Parquet
+    file; it requires `pyarrow`. Parquet values are single numbers, so
+    scenario runs (see scenarios.py) have to be written as NDJSON.
+
+    © Copyright discountingcashflows.com
+"""
+
+import json
+import os
+
+from .model import serializable
+
+FORMATS = ("ndjson", "parquet")
+
+
+def record(result):
+    """The record of a `ModelResult` written by the writers."""
+    final_value = result.final_value or {}
+    return serializable({
+        "model": result.model,
+        "ticker": result.ticker,
+        "status": result.status,
+        "value": final_value.get("value"),
+        "units": final_value.get("units"),
+        "results": list(result.results),
+        "warnings": list(result.warnings),
+        "errors": list(result.errors),
+        "error": result.error,
+    })
+
+
+class _Writer:
+    """Shared behaviour of the writers: counting records and closing as a context manager."""
+
+    def __init__(self, path):
+        self.path = path
+        self.records = 0
+        self.failed = 0
+
+    def write(self, result):
+        self._write(record(result))
+        self.records += 1
+        self.failed += result.status != "ok"
+
+    def write_all(self, results):
+        """Write every result of an iterable, e.g. the results of `run_universe`."""
+        for result in results:
+            self.write(result)
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class NDJSONWriter(_Writer):
+    """Writes one JSON line per record, flushing every `flush_every` records."""
+
+    def __init__(self, path, append=False, flush_every=100):
+        super().__init__(path)
+        self.flush_every = flush_every
+        self._file = open(path, "a" if append else "w", encoding="utf-8")
+
+    def _write(self, item):
+        self._file.write(json.dumps(item) + "\n")
+        if (self.records + 1) % self.flush_every == 0:
+            self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+class ParquetWriter(_Writer):
+    """Writes the records to a Parquet file, one row group per `row_group_size` records."""
+
+    def __init__(self, path, row_group_size=10000):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("Writing Parquet files requires pyarrow (pip install pyarrow)") from None
+        super().__init__(path)
+        self.row_group_size = row_group_size
+        self._pyarrow = pyarrow
+        row = pyarrow.struct([("label", pyarrow.string()), ("value", pyarrow.float64()), ("units", pyarrow.string())])
+        self.schema = pyarrow.schema([
+            ("model", pyarrow.string()),
+            ("ticker", pyarrow.string()),
+            ("status", pyarrow.string()),
+            ("value", pyarrow.float64()),
+            ("units", pyarrow.string()),
+            ("results", pyarrow.list_(row)),
+            ("warnings", pyarrow.list_(pyarrow.string())),
+            ("errors", pyarrow.list_(pyarrow.string())),
+            ("error", pyarrow.string()),
+        ])
+        self._batch = {name: [] for name in self.schema.names}
+        self._file = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def _write(self, item):
+        if isinstance(item["value"], list):
+            raise ValueError(f"{item['model']}/{item['ticker']}: scenario values cannot be written to Parquet")
+        for name, values in self._batch.items():
+            values.append(item[name])
+        if len(self._batch["model"]) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered records as a row group."""
+        if not self._batch["model"]:
+            return
+        table = self._pyarrow.Table.from_pydict(self._batch, schema=self.schema)
+        self._file.write_table(table)
+        self._batch = {name: [] for name in self.schema.names}
+
+    def close(self):
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+
+def open_writer(path, format=None, **options):
+    """A writer for `path`, in the given `format` or the one of its extension (NDJSON by default)."""
+    if format is None:
+        format = "parquet" if os.path.splitext(path)[1].lower() in (".parquet", ".pq") else "ndjson"
+    if format not in FORMATS:
+        raise ValueError(f"Unknown format {format!r}, expected one of {', '.join(FORMATS)}")
+    return ParquetWriter(path, **options) if format == "parquet" else NDJSONWriter(path, **options)